@@ -1,131 +1,86 @@
 # app.py
 # 실행: streamlit run app.py
 # 설치: pip install streamlit openai
+# 상태 저장: .jinsul_state.db (SQLite, 세션별)
 
+import copy
+import functools
+import html
 import json
-import re
+import os
+import time
 import uuid
-from pathlib import Path
 
+import openai
 import streamlit as st
-from openai import OpenAI
+
+from engine import (
+    FINAL_FOOTER,
+    STAGE_PROMPTS,
+    ConsultationEngine,
+    ConsultationState,
+    content_hash,
+    estimate_tokens,
+)
+from intent_router import RESET
+from llm_cache import ResponseCache, cache_key
+from llm_calls import routed_final_call, routed_llm_call
+from llm_clients import ClientRegistry, key_hash
+from llm_gateway import GatewayError, LLMGateway
+from model_output import PRIORITIES, parse_activities, parse_roadmap, resolve_roadmap, to_jsonable
+from model_routes import STAGE_ROUTES
+from speculative import SPECULATIVE_USER_MESSAGE, SpeculativeExecutor
+from storage import STATE_FIELDS, SessionStore, WriteBehindPersister
+from telemetry import Telemetry
 
 APP_TITLE = "진설이 - 나만의 진로컨설턴트"
-DATA_PATH = Path(".jinsul_state.json")
 
-# Discovery가 너무 길어지지 않도록: 유저 발화 N회 이후 자동 설계 단계로 전환
-MAX_DISCOVERY_TURNS = 4
+# 스트리밍 모드: assistant_message를 토큰이 도착하는 대로 채팅 말풍선에 표시
+STREAM_RESPONSES = True
 
-# ======================
-# Prompt Templates
-# ======================
+# 체크박스/메모 편집은 백그라운드에서 모아서 저장: 편집 후 이 시간(초) 안에는 반드시 기록
+PERSIST_MAX_DELAY = 2.0
+# 이 필드들은 write-behind 저장기를 거쳐서만 기록(편집 순서 보장)
+WRITE_BEHIND_FIELDS = ("activity_status", "roadmap_open")
 
-DISCOVERY_PROMPT = """
-너는 전문 진로 컨설턴트다.
-현재 단계는 [대화 단계]다.
-
-목표:
-- 사용자의 관심사, 강점, 가치관, 선호 환경, 제약 조건을 파악한다.
-- 질문을 통해 정보를 수집한다.
-
-규칙:
-- 진로 계획, 활동 목록, 로드맵을 만들지 마라.
-- 해결책을 제시하지 말고 질문하거나 요약만 한다.
-- 한 번에 질문은 최대 3개까지만 한다.
-- 사용자가 3~4번 정도 응답하면, 불확실점이 남아도 가설 기반으로 설계 단계로 넘어갈 준비를 한다.
-
-출력은 반드시 JSON 한 덩어리로만 한다.
-{
-  "assistant_message": "사용자에게 보여줄 말(질문/요약)",
-  "discovery_summary": {
-    "interests": [],
-    "strengths": [],
-    "values": [],
-    "constraints": [],
-    "uncertain_points": []
-  },
-  "next_action": "ASK_MORE | READY_FOR_DESIGN"
-}
-"""
+# (선택) previous_response_id로 턴을 이어서 새 사용자 메시지만 전송.
+# 단계(프롬프트)가 바뀌거나 체인이 끊기면 전체 컨텍스트 모드로 돌아간다.
+CHAIN_RESPONSES = False
 
-DESIGN_PROMPT = """
-너는 전문 진로 컨설턴트다.
-현재 단계는 [설계 단계]다.
-
-입력으로는 이미 정리된 사용자 정보와 직전 대화가 주어진다.
-
-목표:
-- 사용자에게 맞는 진로 방향 초안을 설계한다.
-- 대화 중간이라도 초안을 제시하고, 사용자의 선택/수정을 유도한다.
-
-규칙:
-- 아직 최종 결정처럼 말하지 마라.
-- 로드맵 배치는 하지 마라.
-- 활동은 '초안'이며, 사용자가 수정 가능하다는 톤으로 제시한다.
-
-출력은 반드시 JSON 한 덩어리로만 한다.
-{
-  "assistant_message": "설계 결과 설명(초안 제시 + 확인 질문)",
-  "career_options": [
-    {
-      "title": "진로 옵션",
-      "fit_reason": "적합 이유",
-      "risk": "리스크",
-      "outlook": "전망"
-    }
-  ],
-  "recommended_direction": "가장 유력한 방향(초안)",
-  "draft_activities": [
-    {
-      "id": "string",
-      "title": "활동",
-      "description": "내용",
-      "priority": "핵심|권장|선택"
-    }
-  ],
-  "next_action": "REFINE | READY_FOR_FINAL"
-}
-"""
+# LLM 응답 캐시: 같은 (모델, 프롬프트, 메시지)면 재호출하지 않음. 디스크 계층은 경로를 주면 사용
+LLM_CACHE_MAX_ENTRIES = 256
+LLM_CACHE_TTL = 60 * 60
+LLM_CACHE_DIR = None  # 예) ".jinsul_llm_cache" — 녹화된 세션 재생용
 
-FINAL_PROMPT = """
-너는 전문 진로 컨설턴트다.
-현재 단계는 [확정 단계]다.
-
-목표:
-- 실행 가능한 진로 계획을 완성한다.
-
-규칙:
-- 활동은 중복 없이 최소 10개 이상.
-- 로드맵은 연도별 상/하반기로 나눈다.
-- roadmap.h1/h2에는 activities의 id를 넣는다.
-
-출력은 반드시 JSON 한 덩어리로만 한다.
-{
-  "assistant_message": "최종 요약 메시지",
-  "career_plan": {
-    "direction": "진로 방향",
-    "strategy": [],
-    "short_term_goals": [],
-    "mid_term_goals": []
-  },
-  "activities": [
-    {
-      "id": "string",
-      "title": "활동",
-      "description": "내용",
-      "priority": "핵심|권장|선택",
-      "links": []
-    }
-  ],
-  "roadmap": [
-    {
-      "year": 2026,
-      "h1": [],
-      "h2": []
-    }
-  ]
-}
-"""
+# 모델 호출 게이트웨이(llm_gateway.py): 프로세스 전체 동시 호출 수/재시도/회로 차단
+LLM_MAX_CONCURRENT = 8
+LLM_MAX_RETRIES = 3
+LLM_BREAKER_THRESHOLD = 5
+LLM_BREAKER_COOLDOWN = 30.0
+# 단계별 모델/추론 강도/최대 출력 토큰/지연 예산과 폴백: model_routes.STAGE_ROUTES
+
+# FINAL을 계획/활동 그룹/로드맵 샤드로 나눠 동시에 생성(final_engine.py)
+SHARDED_FINAL = True
+
+# 확정/초기화/로드맵 보기처럼 결과가 정해진 입력은 모델 호출 전에 로컬에서 처리(intent_router.py)
+LOCAL_INTENT_ROUTER = True
+
+# 최종 계획이 나온 뒤의 수정 요청은 바뀐 부분만 패치 연산으로 받아 적용(model_output.apply_patch)
+FINAL_PATCH_MODE = True
+
+# 단계 전환 직후 다음 단계 응답을 백그라운드에서 미리 생성(speculative.py)
+SPECULATIVE_PREGEN = True
+
+# 활동이 이보다 많으면 행별 위젯 대신 단일 data_editor 그리드(페이지/필터)로 표시
+ACTIVITY_GRID_THRESHOLD = 30
+ACTIVITY_GRID_PAGE_SIZE = 50
+
+# 계측 이벤트(구간 시간/턴별 지연·토큰) JSONL 경로. 없으면 메모리 요약(사이드바 성능 패널)만
+# 벤치마크(bench/bench_e2e.py)는 환경 변수로 경로를 넘긴다
+TELEMETRY_PATH = os.environ.get("JINSUL_TELEMETRY")  # 예) ".jinsul_telemetry.jsonl"
+
+# 채팅 탭은 최근 N개 메시지만 그리고, "이전 대화 더 보기"로 N개씩 늘림
+CHAT_WINDOW_SIZE = 20
 
 PRIORITY_BADGE = {
     "핵심": {"label": "핵심", "color": "#ef4444"},
@@ -137,119 +92,299 @@ PRIORITY_BADGE = {
 # Persistence
 # ======================
 
+@st.cache_resource
+def get_telemetry() -> Telemetry:
+    """구간 시간/턴 지표 수집기(프로세스 전체 공유)."""
+    return Telemetry(TELEMETRY_PATH)
+
+
+def traced(name: str):
+    """함수 실행 시간을 공유 계측기에 span으로 기록."""
+
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_telemetry().span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+
+@st.cache_resource
+def get_store() -> SessionStore:
+    """프로세스 전체에서 공유하는 세션 저장소."""
+    return SessionStore()
+
+
+@st.cache_resource
+def get_persister() -> WriteBehindPersister:
+    """체크박스/메모 편집용 write-behind 저장기(프로세스 전체 공유)."""
+    return WriteBehindPersister(get_store(), max_delay=PERSIST_MAX_DELAY)
+
+
+def get_session_id() -> str:
+    """브라우저 세션 식별자. 새로고침해도 유지되도록 URL 쿼리(?sid=)에 둔다."""
+    sid = st.session_state.get("_sid")
+    if sid:
+        return sid
+    sid = st.query_params.get("sid")
+    if not sid:
+        sid = uuid.uuid4().hex
+        st.query_params["sid"] = sid
+    st.session_state["_sid"] = sid
+    return sid
+
+
+def bind_telemetry():
+    """이후 계측 이벤트에 이 세션 id/단계를 붙인다.
+
+    문맥은 스레드별이고 fragment 재실행은 새 스크립트 스레드에서 돌 수 있어 main과 fragment마다 부른다.
+    """
+    get_telemetry().set_context(session=get_session_id(), stage=st.session_state.get("stage"))
+
+
+@traced("save_state")
 def save_state():
-    snapshot = {
-        "stage": st.session_state.get("stage"),
-        "messages": st.session_state.get("messages"),
-        "discovery": st.session_state.get("discovery"),
-        "discovery_turns": st.session_state.get("discovery_turns"),
-        "career_options": st.session_state.get("career_options"),
-        "recommended_direction": st.session_state.get("recommended_direction"),
-        "career_plan": st.session_state.get("career_plan"),
-        "activities": st.session_state.get("activities"),
-        "roadmap": st.session_state.get("roadmap"),
-        "activity_status": st.session_state.get("activity_status"),
-        "roadmap_open": st.session_state.get("roadmap_open"),
-    }
-    DATA_PATH.write_text(json.dumps(snapshot, ensure_ascii=False))
+    """직전 저장 이후 바뀐 것만 기록: 새 메시지는 append, 필드는 바뀐 것만 upsert."""
+    persisted = st.session_state.setdefault("_persisted", {"messages": 0, "fields": {}})
+    messages = st.session_state.get("messages") or []
+
+    start = persisted["messages"]
+    truncate = len(messages) < start
+    if truncate:
+        start = 0
+
+    changed = {}
+    for k in STATE_FIELDS:
+        value = json.dumps(st.session_state.get(k), ensure_ascii=False, default=to_jsonable)
+        h = hash(value)
+        if persisted["fields"].get(k) != h:
+            changed[k] = value
+            persisted["fields"][k] = h
+
+    for k in WRITE_BEHIND_FIELDS:
+        if k in changed:
+            get_persister().submit(get_session_id(), k, changed.pop(k))
+
+    new_messages = messages[start:]
+    if not new_messages and not changed and not truncate:
+        return
+    get_store().save(get_session_id(), new_messages, start, changed, truncate=truncate)
+    persisted["messages"] = len(messages)
+
+
+def persist_field(name: str):
+    """단일 필드를 write-behind로 저장(렌더 경로에서 디스크를 기다리지 않음)."""
+    value = json.dumps(st.session_state.get(name), ensure_ascii=False, default=to_jsonable)
+    persisted = st.session_state.setdefault("_persisted", {"messages": 0, "fields": {}})
+    persisted["fields"][name] = hash(value)
+    get_persister().submit(get_session_id(), name, value)
 
 
 def load_state():
-    if DATA_PATH.exists():
-        data = json.loads(DATA_PATH.read_text())
-        for k, v in data.items():
-            st.session_state[k] = v
+    """세션당 1회만 저장소에서 st.session_state를 채운다(rerun마다 읽지 않음)."""
+    if st.session_state.get("_hydrated"):
+        return
+    tel = get_telemetry()
+    tel.set_context(session=get_session_id())
+    with tel.span("load_state"):
+        data = get_store().load(get_session_id())
+    persisted_fields = {k: hash(json.dumps(data[k], ensure_ascii=False)) for k in STATE_FIELDS if k in data}
+    # 저장된 dict는 여기서 한 번만 검증해 레코드로 바꾼다
+    with tel.span("parse_records"):
+        if "activities" in data:
+            data["activities"] = parse_activities(data["activities"])
+        if "roadmap" in data:
+            # 예전에 저장된 로드맵은 제목 키가 섞여 있을 수 있음: 여기서 정식 id로(바뀌면 다음 저장 때 반영)
+            data["roadmap"], _, _ = resolve_roadmap(parse_roadmap(data["roadmap"]), data.get("activities") or [])
+    for k, v in data.items():
+        st.session_state[k] = v
+    st.session_state["_persisted"] = {
+        "messages": len(data.get("messages") or []),
+        "fields": persisted_fields,
+    }
+    st.session_state["_hydrated"] = True
 
 # ======================
 # LLM Utils
 # ======================
 
-def extract_json(text: str) -> dict:
-    text = (text or "").strip()
-    try:
-        return json.loads(text)
-    except Exception:
-        m = re.search(r"\{.*\}", text, flags=re.DOTALL)
-        if not m:
-            raise ValueError("JSON 파싱 실패")
-        return json.loads(m.group(0))
-
-
-def llm_call(client, system_prompt, messages):
-    resp = client.responses.create(
-        model="gpt-5-mini",
-        input=[
-            {"role": "system", "content": system_prompt},
-            *messages,
-        ],
-        text={"verbosity": "low"},
+@st.cache_resource
+def get_llm_cache() -> ResponseCache:
+    """프로세스 전체에서 공유하는 LLM 응답 캐시."""
+    return ResponseCache(max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL, disk_dir=LLM_CACHE_DIR)
+
+
+@st.cache_resource
+def get_client_registry() -> ClientRegistry:
+    """API 키별 OpenAI 클라이언트를 재사용(턴마다 새 커넥션 풀을 만들지 않음)."""
+    return ClientRegistry()
+
+
+@st.cache_resource
+def get_gateway() -> LLMGateway:
+    """모든 세션의 모델 호출이 거치는 게이트웨이(동시성 제한/공정 큐/재시도/회로 차단)."""
+    return LLMGateway(
+        max_concurrent=LLM_MAX_CONCURRENT,
+        max_retries=LLM_MAX_RETRIES,
+        breaker_threshold=LLM_BREAKER_THRESHOLD,
+        breaker_cooldown=LLM_BREAKER_COOLDOWN,
     )
-    return extract_json(resp.output_text)
 
 
-def normalize_activities(raw):
-    """activities/draft_activities를 UI가 깨지지 않게 정규화"""
-    if not isinstance(raw, list):
-        return []
-    out = []
-    for a in raw:
-        if not isinstance(a, dict):
-            continue
-        a = dict(a)
-        a.setdefault("id", str(uuid.uuid4()))
-        a.setdefault("title", "")
-        a.setdefault("description", "")
-        a.setdefault("priority", "권장")
-        # FINAL에서만 links가 오지만, UI 일관성 위해 항상 보유
-        links = a.get("links")
-        if not isinstance(links, list):
-            a["links"] = []
-        out.append(a)
-    return out
-
-
-def normalize_roadmap(raw):
-    if not isinstance(raw, list):
-        return []
-    out = []
-    for r in raw:
-        if not isinstance(r, dict):
-            continue
-        rr = dict(r)
-        # year가 문자열로 오면 int 변환 시도
-        y = rr.get("year")
-        if isinstance(y, str) and y.isdigit():
-            rr["year"] = int(y)
-        rr.setdefault("h1", [])
-        rr.setdefault("h2", [])
-        if not isinstance(rr.get("h1"), list):
-            rr["h1"] = []
-        if not isinstance(rr.get("h2"), list):
-            rr["h2"] = []
-        out.append(rr)
-    return out
+def cached_llm_call(
+    api_key,
+    client,
+    system_prompt,
+    messages,
+    stage,
+    on_message=None,
+    previous_response_id=None,
+    meta=None,
+    on_wait=None,
+):
+    """llm_call 앞단의 캐시. 캐시 적중이면 assistant_message를 한 번에 넘긴다.
+
+    같은 키로 진행 중인 호출이 있으면(중복 제출/새로고침) 그 결과를 기다린다.
+    meta에는 response_id와 cache(적중 출처)를 채운다. 모델 설정은 stage의 라우팅 표를 따른다.
+    """
+    key = cache_key(key_hash(api_key), STAGE_ROUTES[stage].cache_tag(), system_prompt, messages, previous_response_id)
+
+    tel = get_telemetry()
+    gateway = get_gateway()
+
+    def _call():
+        call_meta = {}
+        data = gateway.call(
+            lambda: routed_llm_call(
+                client,
+                stage,
+                system_prompt,
+                messages,
+                call_meta,
+                tel,
+                gateway=gateway,
+                on_message=on_message,
+                previous_response_id=previous_response_id,
+            ),
+            on_wait=on_wait,
+            retry=False,
+        )
+        return {"data": data, "response_id": call_meta.get("response_id"), "usage": call_meta.get("usage")}
+
+    return _through_cache(key, _call, on_message, meta)
+
+
+def cached_final_call(api_key, messages, on_message=None, meta=None, on_wait=None):
+    """FINAL 병렬 생성(final_engine) + 같은 캐시. 응답이 여러 개라 response_id는 없음.
+
+    샤드 여러 개를 한 번의 실행으로 보고 게이트웨이 슬롯 하나를 쓴다.
+    """
+    key = cache_key(key_hash(api_key), STAGE_ROUTES["FINAL"].cache_tag(), "FINAL_SHARDED", messages)
+    tel = get_telemetry()
+    gateway = get_gateway()
+
+    def _call():
+        call_meta = {}
+        data = gateway.call(
+            lambda: routed_final_call(api_key, messages, call_meta, tel, on_message, gateway),
+            on_wait=on_wait,
+            retry=False,
+        )
+        return {"data": data, "response_id": None, "usage": call_meta.get("usage")}
+
+    return _through_cache(key, _call, on_message, meta)
+
+
+@st.cache_resource
+def get_engine() -> ConsultationEngine:
+    """단계 기계(engine.py). 설정만 갖고 상태는 st.session_state를 넘겨 쓴다."""
+    return ConsultationEngine(local_intents=LOCAL_INTENT_ROUTER, patch_mode=FINAL_PATCH_MODE)
+
+
+@st.cache_resource
+def get_speculator() -> SpeculativeExecutor:
+    """다음 단계 미리 생성용 스레드 풀(프로세스 전체 공유)."""
+    return SpeculativeExecutor()
+
+
+def start_speculation(api_key, client, stage: str) -> dict:
+    """stage 응답을 '그대로 진행' 입력을 가정하고 백그라운드에서 생성 시작.
+
+    컨텍스트는 지금 스크립트 스레드에서 만들어 넘긴다(백그라운드에선 session_state를 읽지 않음).
+    """
+    messages = [*st.session_state.messages, {"role": "user", "content": SPECULATIVE_USER_MESSAGE}]
+    context, _ = get_engine().context(st.session_state, stage, messages)
+    tel = get_telemetry()
+    gateway = get_gateway()
+    session = get_session_id()
+    if stage == "FINAL" and SHARDED_FINAL:
+        def call():
+            return routed_final_call(api_key, context, {}, tel, gateway=gateway)
+    else:
+        def call():
+            return routed_llm_call(
+                client, stage, STAGE_PROMPTS[stage], context, {}, tel, gateway=gateway
+            )
+
+    def fn():
+        # 풀 스레드는 세션끼리 돌려 쓰므로 시작할 때마다 이 세션으로 계측 문맥을 맞춘다
+        tel.set_context(session=session, stage=stage, speculative=True)
+        # 대기 중인 사용자 요청이 있으면 게이트웨이가 바로 거절(추측 생성이 줄을 막지 않게)
+        return gateway.call(call, background=True, retry=False)
+
+    return get_speculator().start(stage, len(st.session_state.messages), fn)
+
+
+def _through_cache(key, call, on_message, meta):
+    value, source = get_llm_cache().get_or_call(key, call)
+    if meta is not None:
+        meta["response_id"] = value.get("response_id")
+        meta["cache"] = source
+        # 토큰은 실제로 호출한 요청만 쓴 것으로 센다
+        meta["usage"] = value.get("usage") if source == "call" else {}
+    data = copy.deepcopy(value["data"])
+    if source != "call" and on_message is not None:
+        on_message((data.get("assistant_message") or "").strip())
+    return data
 
 # ======================
 # State Init
 # ======================
 
 def init_state():
-    st.session_state.setdefault("stage", "DISCOVERY")
-    st.session_state.setdefault("messages", [])
-    st.session_state.setdefault("discovery", {})
-    st.session_state.setdefault("discovery_turns", 0)
-    st.session_state.setdefault("career_options", [])
-    st.session_state.setdefault("recommended_direction", "")
-    st.session_state.setdefault("career_plan", {})
-    st.session_state.setdefault("activities", [])
-    st.session_state.setdefault("roadmap", [])
-    st.session_state.setdefault("activity_status", {})
+    for key, value in vars(ConsultationState()).items():
+        st.session_state.setdefault(key, value)
     st.session_state.setdefault("roadmap_open", {})
 
 # ======================
 # UI Helpers
 # ======================
 
+def timed_render(name: str):
+    """렌더 함수의 실행 시간(ms)을 session_state["_render_timings"][name]에 기록(계측기에는 render.<name> span)."""
+
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                get_telemetry().record(f"render.{name}", (time.perf_counter() - start) * 1000)
+                timings = st.session_state.setdefault("_render_timings", {})
+                t = timings.setdefault(name, {"runs": 0, "last_ms": 0.0, "max_ms": 0.0})
+                t["runs"] += 1
+                t["last_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                t["max_ms"] = max(t["max_ms"], t["last_ms"])
+
+        return wrapper
+
+    return deco
+
+
 def badge(priority: str) -> str:
     meta = PRIORITY_BADGE.get(priority, PRIORITY_BADGE["권장"])
     return (
@@ -270,213 +405,137 @@ def _priority_rank(priority: str) -> int:
     return 9
 
 
-def _chip_html(title: str, priority: str) -> str:
-    meta = PRIORITY_BADGE.get(priority, PRIORITY_BADGE["권장"])
-    # 칩: 연한 배경 + 컬러 도트 + 제목
-    return (
-        "<span class='j-chip'>"
-        f"<span class='j-chip-dot' style='background:{meta['color']};'></span>"
-        f"<span class='j-chip-text'>{title}</span>"
-        "</span>"
-    )
-
-
-def _ensure_roadmap_css_once():
-    """로드맵/타임라인/칩 UI에 필요한 CSS를 1회만 로드."""
-    if st.session_state.get("_roadmap_css_loaded"):
-        return
-    st.session_state["_roadmap_css_loaded"] = True
-
-    st.markdown(
-        """
-        <style>
-          /* Timeline */
-          .j-tl { position: relative; height: 54px; margin: 10px 0 18px 0; }
-          .j-line { position: absolute; top: 22px; left: 0; right: 0; height: 8px; background: #e5e7eb; border-radius: 999px; }
-          .j-dot { position: absolute; top: 12px; transform: translateX(-50%); text-align: center; }
-          .j-dot-core { width: 14px; height: 14px; border-radius: 999px; background: #111827; border: 3px solid #f9fafb; box-shadow: 0 1px 2px rgba(0,0,0,0.15); margin: 0 auto; }
-          .j-year { margin-top: 6px; font-weight: 900; font-size: 13px; color: #111827; }
-          .j-sub { margin-top: -10px; color: #6b7280; font-size: 13px; }
-          .j-dot-link { text-decoration: none; }
-          .j-dot-link:hover .j-dot-core { transform: scale(1.06); }
-
-          /* Cards */
-          .j-year-card { padding: 14px 14px 10px 14px; border: 1px solid #e5e7eb; border-radius: 16px; margin: 12px 0; background: #ffffff; }
-
-          /* Chips */
-          .j-chip-wrap { display: flex; flex-wrap: wrap; gap: 8px; margin: 6px 0 2px 0; }
-          .j-chip { display: inline-flex; align-items: center; gap: 8px; padding: 8px 10px; border-radius: 999px; background: #f3f4f6; border: 1px solid #e5e7eb; }
-          .j-chip-dot { width: 10px; height: 10px; border-radius: 999px; display: inline-block; }
-          .j-chip-text { font-size: 13px; font-weight: 700; color: #111827; }
-          .j-top-title { font-size: 12px; font-weight: 900; color: #111827; margin: 6px 0 6px 0; }
-          .j-chip-top { background: #fff7ed; border: 1px solid #fed7aa; }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+_ROADMAP_CSS = """
+<style>
+  /* Timeline */
+  .j-tl { position: relative; height: 54px; margin: 10px 0 18px 0; }
+  .j-line { position: absolute; top: 22px; left: 0; right: 0; height: 8px; background: #e5e7eb; border-radius: 999px; }
+  .j-dot { position: absolute; top: 12px; transform: translateX(-50%); text-align: center; }
+  .j-dot-core { width: 14px; height: 14px; border-radius: 999px; background: #111827; border: 3px solid #f9fafb; box-shadow: 0 1px 2px rgba(0,0,0,0.15); margin: 0 auto; }
+  .j-year { margin-top: 6px; font-weight: 900; font-size: 13px; color: #111827; }
+  .j-sub { margin-top: -10px; color: #6b7280; font-size: 13px; }
+  .j-dot-link { text-decoration: none; }
+  .j-dot-link:hover .j-dot-core { transform: scale(1.06); }
+
+  /* Cards */
+  .j-year-card { padding: 14px 14px 10px 14px; border: 1px solid #e5e7eb; border-radius: 16px; margin: 12px 0; background: #ffffff; }
+  .j-halves { display: grid; grid-template-columns: 1fr 1fr; gap: 16px; }
+  .j-half-title { font-size: 16px; font-weight: 800; color: #111827; margin: 4px 0 6px 0; }
+  .j-empty { color: #6b7280; font-size: 13px; }
+
+  /* Chips */
+  .j-chip-wrap { display: flex; flex-wrap: wrap; gap: 8px; margin: 6px 0 2px 0; }
+  .j-chip { display: inline-flex; align-items: center; gap: 8px; padding: 8px 10px; border-radius: 999px; background: #f3f4f6; border: 1px solid #e5e7eb; }
+  .j-chip-dot { width: 10px; height: 10px; border-radius: 999px; display: inline-block; }
+  .j-chip-text { font-size: 13px; font-weight: 700; color: #111827; }
+  .j-top-title { font-size: 12px; font-weight: 900; color: #111827; margin: 6px 0 6px 0; }
+  .j-chip-top { background: #fff7ed; border: 1px solid #fed7aa; }
+</style>
+"""
 
 
-def _render_timeline_header(years: list[int]):
+def _timeline_html(years: list[int]) -> str:
     """긴 가로선(타임라인) + 연도 점. 연도 점 클릭 시 해당 연도 카드로 스크롤."""
-    years = [y for y in years if isinstance(y, int)]
-    years = sorted(list(dict.fromkeys(years)))
+    years = sorted(dict.fromkeys(y for y in years if isinstance(y, int)))
     if not years:
-        return
-
-    _ensure_roadmap_css_once()
+        return ""
 
     n = len(years)
     positions = [50] if n == 1 else [int((i / (n - 1)) * 100) for i in range(n)]
 
     markers = "".join(
-        [
-            (
-                f"<a class='j-dot-link' href='#year-{y}'>"
-                f"<div class='j-dot' style='left:{p}%;'>"
-                f"<div class='j-dot-core'></div><div class='j-year'>{y}</div>"
-                f"</div></a>"
-            )
-            for y, p in zip(years, positions)
-        ]
+        f"<a class='j-dot-link' href='#year-{y}'>"
+        f"<div class='j-dot' style='left:{p}%;'>"
+        f"<div class='j-dot-core'></div><div class='j-year'>{y}</div>"
+        f"</div></a>"
+        for y, p in zip(years, positions)
     )
-
-    st.markdown(
-        f"""
-        <div class='j-tl'>
-          <div class='j-line'></div>
-          {markers}
-        </div>
-        <div class='j-sub'>연도 점을 누르면 해당 연도로 이동해요. 아래에서 상/하반기 계획을 확인할 수 있어요.</div>
-        """,
-        unsafe_allow_html=True,
+    return (
+        f"<div class='j-tl'><div class='j-line'></div>{markers}</div>"
+        "<div class='j-sub'>연도 점을 누르면 해당 연도로 이동해요. 아래에서 상/하반기 계획을 확인할 수 있어요.</div>"
     )
 
 
-def _resolve_activity(act_map: dict, title_map: dict, key):
-    """로드맵 항목이 id가 아닐 수도 있어(모델 실수). id 또는 title로 복구."""
-    if key in act_map:
-        return act_map[key]
-    if isinstance(key, str):
-        k = key.strip()
-        if k in title_map:
-            return title_map[k]
-    return None
-
-
-def _chip_html(title: str, priority: str) -> str:
+def _chip_html(title: str, priority: str, top: bool = False) -> str:
     meta = PRIORITY_BADGE.get(priority, PRIORITY_BADGE["권장"])
-    safe_title = (title or "").strip()
+    cls = "j-chip j-chip-top" if top else "j-chip"
+    # 칩: 연한 배경 + 컬러 도트 + 제목
     return (
-        "<span class='j-chip'>"
+        f"<span class='{cls}'>"
         f"<span class='j-chip-dot' style='background:{meta['color']};'></span>"
-        f"<span class='j-chip-text'>{safe_title}</span>"
+        f"<span class='j-chip-text'>{html.escape(title or '')}</span>"
         "</span>"
     )
 
 
-def render_roadmap():
-    """보기 전용 로드맵: 타임라인 + 연도 카드 + 상/하반기 2열 보드 + Top3 강조 + 칩 + 자동정렬."""
-    st.subheader("로드맵")
+def _half_html(label: str, resolved: list) -> str:
+    if not resolved:
+        return f"<div><div class='j-half-title'>{label}</div><div class='j-empty'>배치된 활동이 없어요.</div></div>"
 
-    roadmap = normalize_roadmap(st.session_state.roadmap)
-    if not roadmap:
-        st.info("아직 로드맵이 없습니다. FINAL 단계에서 생성돼요.")
-        return
+    # Top 3 (핵심 우선, 부족하면 전체에서 보충)
+    top = [a for a in resolved if a.priority == "핵심"]
+    if len(top) < 3:
+        for a in resolved:
+            if a not in top:
+                top.append(a)
+            if len(top) >= 3:
+                break
+    top = top[:3]
 
-    _ensure_roadmap_css_once()
+    return (
+        f"<div><div class='j-half-title'>{label}</div>"
+        "<div class='j-top-title'>이번 반기 Top 3</div>"
+        f"<div class='j-chip-wrap'>{''.join(_chip_html(a.title, a.priority, top=True) for a in top)}</div>"
+        "<div class='j-top-title'>전체 활동</div>"
+        f"<div class='j-chip-wrap'>{''.join(_chip_html(a.title, a.priority) for a in resolved)}</div>"
+        "</div>"
+    )
 
-    activities = normalize_activities(st.session_state.activities)
 
-    # 활동 맵 (id/title)
-    act_map = {a["id"]: a for a in activities if isinstance(a, dict) and a.get("id")}
-    title_map = {}
-    for a in activities:
-        if not isinstance(a, dict):
-            continue
-        t = (a.get("title") or "").strip()
-        if t:
-            title_map[t] = a
+@st.cache_data(max_entries=256, show_spinner=False)
+def _roadmap_html(digest: str, _roadmap: list, _activities: list) -> str:
+    """로드맵 보드 전체(CSS + 타임라인 + 연도 카드)를 HTML 문서 하나로.
 
-    # 타임라인
-    years = [r.get("year") for r in roadmap if isinstance(r, dict) and isinstance(r.get("year"), int)]
-    _render_timeline_header(years)
+    digest(로드맵+활동 내용 해시)가 같으면 캐시에서 바로 돌려준다. 레코드 인자는 해시에서 제외.
+    """
+    # 로드맵 키는 수집 시점에 정식 id로 바뀌어 있음(resolve_roadmap): id 조회만
+    act_map = {a.id: a for a in _activities}
 
     def _resolve_many(items):
-        resolved = []
-        for key in (items or []):
-            a = _resolve_activity(act_map, title_map, key)
-            if a:
-                resolved.append(a)
+        resolved = [act_map[k] for k in items if k in act_map]
         # 우선순위(핵심→권장→선택) + 제목
-        resolved.sort(
-            key=lambda x: (
-                _priority_rank((x.get("priority") or "권장").strip()),
-                (x.get("title") or ""),
-            )
-        )
+        resolved.sort(key=lambda x: (_priority_rank(x.priority), x.title))
         return resolved
 
-    def _chips(resolved, top=False):
-        if not resolved:
-            return ""
-        chips = []
-        for a in resolved:
-            title = (a.get("title") or "").strip()
-            priority = (a.get("priority") or "권장").strip()
-            chip = _chip_html(title, priority)
-            if top:
-                chip = chip.replace("class='j-chip'", "class='j-chip j-chip-top'")
-            chips.append(chip)
-        return "".join(chips)
-
-    # 연도 카드 렌더
-    for r in sorted(roadmap, key=lambda x: x.get("year", 0)):
-        year = r.get("year")
-        if not isinstance(year, int):
-            continue
-
-        # 앵커(타임라인 클릭 스크롤)
-        st.markdown(f"<div id='year-{year}'></div>", unsafe_allow_html=True)
-
-        st.markdown("<div class='j-year-card'>", unsafe_allow_html=True)
-        st.markdown(f"### {year}년")
-
-        h1_resolved = _resolve_many(r.get("h1"))
-        h2_resolved = _resolve_many(r.get("h2"))
-
-        col1, col2 = st.columns(2)
-
-        def _render_half(col, label, resolved):
-            with col:
-                st.markdown(f"#### {label}")
-                if not resolved:
-                    st.caption("배치된 활동이 없어요.")
-                    return
-
-                # Top 3 (핵심 우선, 부족하면 전체에서 보충)
-                top = [a for a in resolved if (a.get("priority") or "").strip() == "핵심"]
-                if len(top) < 3:
-                    for a in resolved:
-                        if a not in top:
-                            top.append(a)
-                        if len(top) >= 3:
-                            break
-                top = top[:3]
-
-                st.markdown("<div class='j-top-title'>이번 반기 Top 3</div>", unsafe_allow_html=True)
-                for a in top:
-                    st.markdown(f"- {badge(a.get('priority','권장'))} **{a.get('title','')}**", unsafe_allow_html=True)
+    cards = []
+    for r in _roadmap:
+        cards.append(
+            # 앵커(타임라인 클릭 스크롤)
+            f"<div id='year-{r.year}'></div>"
+            f"<div class='j-year-card'><h3>{r.year}년</h3><div class='j-halves'>"
+            f"{_half_html('상반기(1~6월)', _resolve_many(r.h1))}"
+            f"{_half_html('하반기(7~12월)', _resolve_many(r.h2))}"
+            "</div></div>"
+        )
+    return _ROADMAP_CSS + _timeline_html([r.year for r in _roadmap]) + "".join(cards)
 
-                st.markdown("<div class='j-top-title'>전체 활동</div>", unsafe_allow_html=True)
-                for a in resolved:
-                    st.markdown(f"- {badge(a.get('priority','권장'))} {a.get('title','')}", unsafe_allow_html=True)
 
+def render_roadmap():
+    """보기 전용 로드맵: 타임라인 + 연도 카드 + 상/하반기 2열 보드 + Top3 강조 + 칩 + 자동정렬.
 
-        _render_half(col1, "상반기(1~6월)", h1_resolved)
-        _render_half(col2, "하반기(7~12월)", h2_resolved)
+    보드 전체를 HTML 한 덩어리로 그려 캐시하므로, 로드맵이 그대로면 rerun 비용은 캐시 조회 1번 + 요소 1개.
+    """
+    st.subheader("로드맵")
 
-        st.markdown("</div>", unsafe_allow_html=True)
+    # 수집 시점에 검증된 레코드(연도순 RoadmapEntry / Activity)를 그대로 사용
+    roadmap = st.session_state.roadmap
+    if not roadmap:
+        st.info("아직 로드맵이 없습니다. FINAL 단계에서 생성돼요.")
+        return
 
+    activities = st.session_state.activities
+    board = _roadmap_html(content_hash(roadmap, activities), roadmap, activities)
+    st.markdown(board, unsafe_allow_html=True)
 
 
 def _build_design_chat_appendix(career_options, recommended_direction, draft_activities) -> str:
@@ -499,24 +558,134 @@ def _build_design_chat_appendix(career_options, recommended_direction, draft_act
     if isinstance(draft_activities, list) and draft_activities:
         parts.append("\n---\n**초안(필요활동 TOP 6)**")
         for a in draft_activities[:6]:
-            if not isinstance(a, dict):
-                continue
-            parts.append(f"- {badge(a.get('priority','권장'))} **{a.get('title','')}**")
+            parts.append(f"- {badge(a.priority)} **{a.title}**")
 
     return "\n".join(parts)
 
+
+def message_markdown(message: dict, catalog: dict) -> str:
+    """저장된 메시지(본문 + 단계 + 참조)를 채팅 표시용 마크다운으로 조립.
+
+    stage가 없는 메시지(이전 형식: 부록이 본문에 붙어 저장됨)는 그대로 보여 준다.
+    """
+    text = message.get("content") or ""
+    stage = message.get("stage")
+    if stage == "DESIGN":
+        options = [catalog["options"][k] for k in message.get("options", ()) if k in catalog["options"]]
+        acts = parse_activities(
+            [catalog["activities"][k] for k in message.get("activities", ()) if k in catalog["activities"]]
+        )
+        text += _build_design_chat_appendix(options, message.get("direction", ""), acts)
+    elif stage == "FINAL":
+        changes = message.get("changes")
+        if changes is not None:
+            text += "\n\n**반영한 변경**\n" + ("".join(f"\n- {c}" for c in changes) or "\n- 없음")
+        if message.get("rejected"):
+            text += "\n\n**반영하지 못한 요청**\n" + "".join(f"\n- {c}" for c in message["rejected"])
+        if message.get("unresolved"):
+            text += "\n\n**로드맵에 배치하지 못한 항목**(활동 목록에 없음)\n" + "".join(
+                f"\n- {k}" for k in message["unresolved"]
+            )
+        if message.get("fuzzy"):
+            text += "\n\n**비슷한 이름으로 배치한 항목**(맞는지 확인해 주세요)\n" + "".join(
+                f"\n- {k}" for k in message["fuzzy"]
+            )
+        text += FINAL_FOOTER
+    return text
+
 # ======================
 # Main
 # ======================
 
+def _on_status_edit(aid: str, field: str):
+    """체크박스/메모 on_change: 상태 반영 후 write-behind 저장."""
+    status = st.session_state.activity_status.setdefault(aid, {"done": False, "memo": ""})
+    status[field] = st.session_state[f"{field}_{aid}"]
+    persist_field("activity_status")
+
+
+def apply_grid_edits(status: dict, ids: list, edited_rows: dict) -> int:
+    """data_editor의 edited_rows({행: {열: 값}})를 activity_status에 한 번에 반영. 바뀐 칸 수 반환."""
+    changed = 0
+    for row, edits in edited_rows.items():
+        row = int(row)
+        if not 0 <= row < len(ids):
+            continue
+        st_row = status.setdefault(ids[row], {"done": False, "memo": ""})
+        for col, field in (("완료", "done"), ("메모", "memo")):
+            if col in edits:
+                value = bool(edits[col]) if field == "done" else (edits[col] or "")
+                if st_row.get(field) != value:
+                    st_row[field] = value
+                    changed += 1
+    return changed
+
+
+def _on_grid_edit(editor_key: str, ids: list):
+    """그리드 편집 묶음을 반영하고 한 번만 저장. 다음 렌더는 새 키(버전)로 깨끗한 편집기를 띄운다."""
+    edits = st.session_state.get(editor_key, {}).get("edited_rows") or {}
+    if apply_grid_edits(st.session_state.activity_status, ids, edits):
+        persist_field("activity_status")
+    st.session_state["_grid_version"] = st.session_state.get("_grid_version", 0) + 1
+
+
+def render_activities_grid(acts: list):
+    """활동이 많을 때: 중요도 필터 + 페이지 + 단일 data_editor(완료/메모만 편집)."""
+    status = st.session_state.activity_status
+
+    ctrl = st.columns([3, 1])
+    priorities = ctrl[0].multiselect("중요도", PRIORITIES, default=list(PRIORITIES), key="grid_priorities")
+    filtered = [a for a in acts if a.priority in priorities]
+    pages = max(1, -(-len(filtered) // ACTIVITY_GRID_PAGE_SIZE))
+    page = ctrl[1].number_input(f"페이지 (/{pages})", min_value=1, max_value=pages, value=1, key="grid_page")
+
+    page_acts = filtered[(page - 1) * ACTIVITY_GRID_PAGE_SIZE:page * ACTIVITY_GRID_PAGE_SIZE]
+    ids = [a.id for a in page_acts]
+    rows = [
+        {
+            "완료": status.get(a.id, {}).get("done", False),
+            "제목": a.title,
+            "중요도": PRIORITY_BADGE.get(a.priority, PRIORITY_BADGE["권장"])["label"],
+            "내용": a.description,
+            "링크": a.links[0] if a.links else None,
+            "메모": status.get(a.id, {}).get("memo", ""),
+        }
+        for a in page_acts
+    ]
+    editor_key = f"grid_{'-'.join(priorities)}_{page}_{st.session_state.get('_grid_version', 0)}"
+    st.data_editor(
+        rows,
+        key=editor_key,
+        on_change=_on_grid_edit,
+        args=(editor_key, ids),
+        disabled=["제목", "중요도", "내용", "링크"],
+        hide_index=True,
+        width="stretch",
+        column_config={
+            "완료": st.column_config.CheckboxColumn("완료", width="small"),
+            "제목": st.column_config.TextColumn("제목", width="medium"),
+            "중요도": st.column_config.TextColumn("중요도", width="small"),
+            "내용": st.column_config.TextColumn("내용", width="large"),
+            "링크": st.column_config.LinkColumn("관련 링크", display_text="열기"),
+            "메모": st.column_config.TextColumn("메모", width="medium"),
+        },
+    )
+    st.caption(f"{len(filtered)}개 중 {len(page_acts)}개 표시 · 완료/메모 칸을 바로 수정할 수 있어요.")
+
+
 def render_activities_table():
     """필요활동: 체크박스-제목-내용-관련링크-메모 (표 형태)"""
     st.subheader("필요활동")
-    acts = normalize_activities(st.session_state.get("activities", []))
+    acts = st.session_state.get("activities", [])
     if not acts:
         st.info("아직 활동이 없습니다. 채팅에서 설계/확정을 진행해 주세요.")
         return
 
+    st.session_state.setdefault("activity_status", {})
+    if len(acts) > ACTIVITY_GRID_THRESHOLD:
+        render_activities_grid(acts)
+        return
+
     # 헤더
     header = st.columns([0.7, 2.2, 4.5, 2.2, 3.2])
     header[0].markdown("**완료**")
@@ -526,71 +695,332 @@ def render_activities_table():
     header[4].markdown("**메모**")
     st.markdown("---")
 
-    st.session_state.setdefault("activity_status", {})
-
     for a in acts:
-        aid = a.get("id") or str(uuid.uuid4())
-        a["id"] = aid
+        aid = a.id
         st.session_state.activity_status.setdefault(aid, {"done": False, "memo": ""})
 
         row = st.columns([0.7, 2.2, 4.5, 2.2, 3.2], vertical_alignment="top")
 
         # 체크
-        st.session_state.activity_status[aid]["done"] = row[0].checkbox(
+        row[0].checkbox(
             label="",
             value=st.session_state.activity_status[aid]["done"],
             key=f"done_{aid}",
+            on_change=_on_status_edit,
+            args=(aid, "done"),
         )
 
         # 제목 + 중요도
-        title = (a.get("title") or "").strip()
-        priority = (a.get("priority") or "권장").strip()
-        row[1].markdown(f"**{title}**<br>{badge(priority)}", unsafe_allow_html=True)
+        row[1].markdown(f"**{a.title}**<br>{badge(a.priority)}", unsafe_allow_html=True)
 
         # 내용
-        row[2].write((a.get("description") or "").strip())
-
-        # 링크
-        links = a.get("links") or []
-        shown = 0
-        if isinstance(links, list):
-            for l in links:
-                if isinstance(l, str) and l.startswith("http"):
-                    shown += 1
-                    row[3].link_button(f"열기 {shown}", l)
-                    if shown >= 3:
-                        break
-        if shown == 0:
+        row[2].write(a.description)
+
+        # 링크(수집 시 http 링크만 남김)
+        for i, link in enumerate(a.links[:3], start=1):
+            row[3].link_button(f"열기 {i}", link)
+        if not a.links:
             row[3].caption("—")
 
         # 메모
-        st.session_state.activity_status[aid]["memo"] = row[4].text_area(
+        row[4].text_area(
             label="",
             value=st.session_state.activity_status[aid]["memo"],
             key=f"memo_{aid}",
             height=80,
             placeholder="예) 마감/진행상황/참고 링크",
+            on_change=_on_status_edit,
+            args=(aid, "memo"),
         )
 
         st.markdown("---")
 
 
 
+@st.cache_data(max_entries=2000, show_spinner=False)
+def _message_markdown(digest: str, _message: dict, _catalog: dict) -> str:
+    """메시지 하나의 표시용 마크다운. 참조 키가 내용 해시라 메시지 해시만으로 캐시해도 된다."""
+    return message_markdown(_message, _catalog)
+
+
+def render_transcript():
+    """최근 CHAT_WINDOW_SIZE개(더 보기를 누르면 그만큼씩 더)만 그린다."""
+    messages = st.session_state.messages
+    window = st.session_state.get("_chat_window", CHAT_WINDOW_SIZE)
+    hidden = max(0, len(messages) - window)
+    if hidden:
+        st.button(
+            f"이전 대화 더 보기 ({hidden}개)",
+            key="chat_load_earlier",
+            on_click=lambda: st.session_state.update(_chat_window=window + CHAT_WINDOW_SIZE),
+        )
+
+    catalog = st.session_state.ref_catalog
+    for m in messages[hidden:]:
+        with st.chat_message(m["role"]):
+            key = content_hash(json.dumps(m, ensure_ascii=False, sort_keys=True))
+            st.markdown(_message_markdown(key, m, catalog), unsafe_allow_html=True)
+
+
+@st.fragment
+@timed_render("chat")
+def render_chat():
+    """채팅 탭. 독립 fragment라 대화 한 턴은 필요할 때만 다른 탭까지 다시 그린다."""
+    bind_telemetry()
+    render_transcript()
+
+    user_input = st.chat_input("자유롭게 이야기해 주세요")
+    api_key = st.session_state.get("api_key")
+
+    if user_input and not api_key:
+        st.warning("사이드바에 OpenAI API Key를 먼저 입력해줘!")
+
+    if user_input and api_key:
+        turn_start = time.perf_counter()
+        tel = get_telemetry()
+        tel.set_context(stage=st.session_state.stage)
+        client = get_client_registry().get(api_key)
+        before = (st.session_state.stage, list(st.session_state.activities), list(st.session_state.roadmap))
+
+        # 유저 메시지 기록 + 로컬 의도 판별/단계별 프롬프트 선택(engine.py)
+        engine = get_engine()
+        plan = engine.begin_turn(st.session_state, user_input)
+        if plan.intent:
+            skipped = st.session_state.setdefault("_skipped_calls", {})
+            skipped[plan.intent] = skipped.get(plan.intent, 0) + 1
+            tel.record("router.skip", (time.perf_counter() - turn_start) * 1000, intent=plan.intent)
+        if plan.intent == RESET:
+            reset_session()
+            st.rerun()
+        if plan.mode is None:
+            # 로드맵 보기: 엔진이 저장된 로드맵으로 답까지 기록
+            save_state()
+            tel.turn("LOCAL", (time.perf_counter() - turn_start) * 1000, intent=plan.intent)
+            rerun_chat()
+        call_stage, call_mode, prompt = plan.stage, plan.mode, plan.prompt
+        tel.set_context(stage=call_stage)
+
+        # 모델 입력: 체인 모드면 새 사용자 메시지만, 아니면 정리된 상태 + 최근 대화(토큰 예산 내)
+        chain = st.session_state.get("_response_chain") if CHAIN_RESPONSES else None
+        if (
+            chain
+            and chain["stage"] == call_mode
+            and chain["messages"] == len(st.session_state.messages) - 1
+        ):
+            previous_response_id = chain["id"]
+            context = [{"role": "user", "content": user_input}]
+            sent = estimate_tokens(user_input)
+            full = sum(estimate_tokens(m.get("content")) for m in st.session_state.messages)
+            ctx_stats = {"full": full, "sent": sent, "saved": max(0, full - sent)}
+        else:
+            previous_response_id = None
+            context, ctx_stats = engine.context(st.session_state, call_stage)
+        totals = st.session_state.setdefault("_context_stats", {"calls": 0, "saved": 0})
+        totals["calls"] += 1
+        totals["saved"] += ctx_stats["saved"]
+        totals["last"] = ctx_stats
+
+        # 모델 호출: 스트리밍이면 토큰이 오는 대로 말풍선에 표시, 아니면 스피너
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
+            meta = {}
+
+            def on_wait(position, eta):
+                placeholder.markdown(f"요청이 몰려 순서를 기다리고 있어요 ⏳ (대기 {position}번째 · 약 {eta:.0f}초)")
+
+            def _call(context, previous_response_id):
+                if call_mode == "FINAL" and SHARDED_FINAL:
+                    placeholder.markdown("최종 계획을 만들고 있어요 🛠️")
+                    return cached_final_call(
+                        api_key,
+                        context,
+                        on_message=(lambda text: placeholder.markdown(text + " ▌")) if STREAM_RESPONSES else None,
+                        meta=meta,
+                        on_wait=on_wait,
+                    )
+                if STREAM_RESPONSES:
+                    placeholder.markdown("생각중이에요 🤔")
+                    return cached_llm_call(
+                        api_key,
+                        client,
+                        prompt,
+                        context,
+                        on_message=lambda text: placeholder.markdown(text + " ▌"),
+                        previous_response_id=previous_response_id,
+                        meta=meta,
+                        stage=call_mode,
+                        on_wait=on_wait,
+                    )
+                with st.spinner("생각중이에요 🤔"):
+                    return cached_llm_call(
+                        api_key,
+                        client,
+                        prompt,
+                        context,
+                        previous_response_id=previous_response_id,
+                        meta=meta,
+                        stage=call_mode,
+                        on_wait=on_wait,
+                    )
+
+            # 단계 전환 때 미리 만들어 둔 응답: 단순 동의 입력이면 그대로 사용
+            data = None
+            speculated = False
+            spec = st.session_state.pop("_speculation", None)
+            if spec:
+                placeholder.markdown("생각중이에요 🤔")
+                data = get_speculator().resolve(
+                    spec, call_mode, len(st.session_state.messages) - 1, user_input
+                )
+                speculated = data is not None
+
+            try:
+                try:
+                    if data is None:
+                        data = _call(context, previous_response_id)
+                except (openai.NotFoundError, openai.BadRequestError):
+                    if not previous_response_id:
+                        raise
+                    # 체인이 끊김(만료/삭제된 응답): 전체 컨텍스트로 다시 시도
+                    st.session_state.pop("_response_chain", None)
+                    context, _ = engine.context(st.session_state, call_stage)
+                    data = _call(context, None)
+            except Exception as e:
+                placeholder.empty()
+                st.session_state.pop("_response_chain", None)
+                # 답 없는 사용자 메시지/라우터가 확정으로 넘긴 단계가 남지 않게 이번 턴을 되돌린다
+                engine.rollback(st.session_state, plan)
+                st.error(str(e) if isinstance(e, GatewayError) else f"모델 응답 처리 오류: {e}")
+                st.caption(f"보내신 메시지는 기록하지 않았어요. 다시 보내 주세요: {user_input}")
+                return
+
+            # 상태 반영 + assistant 메시지 저장(본문과 참조만, 부록/완료 안내는 표시할 때 조립)
+            with tel.span("apply_turn"):
+                record = engine.apply_response(st.session_state, plan, data)
+            placeholder.markdown(message_markdown(record, st.session_state.ref_catalog), unsafe_allow_html=True)
+
+        if CHAIN_RESPONSES and meta.get("response_id"):
+            st.session_state["_response_chain"] = {
+                "stage": call_mode,
+                "id": meta["response_id"],
+                "messages": len(st.session_state.messages),
+            }
+
+        if SPECULATIVE_PREGEN and st.session_state.stage != call_stage:
+            st.session_state["_speculation"] = start_speculation(api_key, client, st.session_state.stage)
+
+        save_state()
+        tel.turn(
+            call_mode,
+            (time.perf_counter() - turn_start) * 1000,
+            usage=meta.get("usage"),
+            cache=meta.get("cache") or ("speculative" if speculated else None),
+        )
+        # 채팅 밖(사이드바 단계/필요활동/로드맵)에 보이는 것이 바뀐 경우에만 앱 전체를 다시 그림
+        if (st.session_state.stage, st.session_state.activities, st.session_state.roadmap) != before:
+            st.rerun()
+        rerun_chat()
+
+
+def rerun_chat():
+    """채팅 fragment만 다시 실행."""
+    try:
+        st.rerun(scope="fragment")
+    except st.errors.StreamlitAPIException:
+        # fragment 재실행이 아닌 전체 실행 중(첫 렌더 직후 입력 등)에는 fragment 범위를 쓸 수 없다
+        st.rerun()
+
+
+def reset_session():
+    """세션 상태와 저장된 기록을 모두 지운다(사이드바 버튼/채팅의 초기화 요청)."""
+    get_persister().flush()
+    get_store().delete(get_session_id())
+    st.session_state.clear()
+
+
+@st.fragment
+@timed_render("activities")
+def render_activities_fragment():
+    """필요활동 탭. 체크/메모 편집은 이 fragment만 다시 실행한다."""
+    bind_telemetry()
+    render_activities_table()
+
+
+@st.fragment
+@timed_render("roadmap")
+def render_roadmap_fragment():
+    bind_telemetry()
+    render_roadmap()
+
+
+def render_perf_panel():
+    """프로세스 전체 계측 요약: 단계별 턴 지연(p50/p95)·턴당 토큰, 단계·모델별 호출, 구간별 p50/p95."""
+    summary = get_telemetry().summary()
+    if not summary["turns"] and not summary["spans"]:
+        st.caption("아직 기록된 계측이 없어요.")
+        return
+    if summary["turns"]:
+        st.markdown("**단계별 턴**")
+        st.dataframe(
+            [{"단계": stage, **row} for stage, row in summary["turns"].items()],
+            hide_index=True,
+            width="stretch",
+        )
+    if summary["models"]:
+        st.markdown("**단계·모델별 호출**(라우팅 표 조정용, 비용은 USD 추정)")
+        st.dataframe(
+            [{"단계/모델": name, **row} for name, row in summary["models"].items()],
+            hide_index=True,
+            width="stretch",
+        )
+    st.markdown("**구간별 시간(ms)**")
+    st.dataframe(
+        [{"구간": name, **row} for name, row in summary["spans"].items()],
+        hide_index=True,
+        width="stretch",
+    )
+
+
 def main():
     st.set_page_config(APP_TITLE, "🧭", layout="wide")
     load_state()
     init_state()
+    bind_telemetry()
 
     st.title(APP_TITLE)
 
     with st.sidebar:
-        api_key = st.text_input("OpenAI API Key", type="password")
+        st.text_input("OpenAI API Key", type="password", key="api_key")
         st.markdown(f"**현재 단계:** {st.session_state.stage}")
+        ctx_totals = st.session_state.get("_context_stats")
+        if ctx_totals and ctx_totals.get("last"):
+            last = ctx_totals["last"]
+            st.caption(
+                f"컨텍스트 토큰(추정): 이번 {last['sent']:,} / 전체 {last['full']:,} · "
+                f"누적 절감 {ctx_totals['saved']:,}"
+            )
+        cache_stats = get_llm_cache().stats
+        if any(cache_stats.values()):
+            st.caption(
+                "응답 캐시: "
+                f"적중 {cache_stats['hits'] + cache_stats['disk_hits']} · 미스 {cache_stats['misses']} · "
+                f"중복 제출 병합 {cache_stats['deduped']}"
+            )
         
+        with st.expander("디버그", expanded=False):
+            st.json({
+                "openai_clients": get_client_registry().stats(),
+                "llm_gateway": get_gateway().stats(),
+                "speculative": get_speculator().rates(),
+                "skipped_calls": st.session_state.get("_skipped_calls", {}),
+                "render_ms": st.session_state.get("_render_timings", {}),
+            })
+
+        if st.toggle("성능 패널", key="perf_panel"):
+            render_perf_panel()
+
         if st.button("전체 초기화"):
-            st.session_state.clear()
-            if DATA_PATH.exists():
-                DATA_PATH.unlink()
+            reset_session()
             st.rerun()
 
     tab_chat, tab_act, tab_road = st.tabs(["채팅", "필요활동", "로드맵"])
@@ -599,100 +1029,19 @@ def main():
     # Chat Tab
     # ------------------
     with tab_chat:
-        for m in st.session_state.messages:
-            with st.chat_message(m["role"]):
-                st.markdown(m["content"], unsafe_allow_html=True)
-
-        user_input = st.chat_input("자유롭게 이야기해 주세요")
-
-        if user_input and not api_key:
-            st.warning("사이드바에 OpenAI API Key를 먼저 입력해줘!")
-
-        if user_input and api_key:
-            client = OpenAI(api_key=api_key)
-
-            # 유저 메시지 기록
-            st.session_state.messages.append({"role": "user", "content": user_input})
-
-            # discovery 길이 제한을 위한 카운트
-            if st.session_state.stage == "DISCOVERY":
-                st.session_state.discovery_turns += 1
-
-            # 단계별 프롬프트
-            if st.session_state.stage == "DISCOVERY":
-                prompt = DISCOVERY_PROMPT
-            elif st.session_state.stage == "DESIGN":
-                prompt = DESIGN_PROMPT
-            else:
-                prompt = FINAL_PROMPT
-
-            # 모델 호출 + 스피너
-            with st.chat_message("assistant"):
-                with st.spinner("생각중이에요 🤔"):
-                    try:
-                        data = llm_call(client, prompt, st.session_state.messages)
-                    except Exception as e:
-                        st.error(f"모델 응답 처리 오류: {e}")
-                        return
-
-                    msg = (data.get("assistant_message") or "").strip()
-
-                    # DESIGN 단계: 초안을 채팅에서도 바로 보이게 첨부
-                    if st.session_state.stage == "DESIGN":
-                        career_options = data.get("career_options", [])
-                        recommended_direction = data.get("recommended_direction", "")
-                        draft_activities = normalize_activities(data.get("draft_activities", []))
-                        appendix = _build_design_chat_appendix(career_options, recommended_direction, draft_activities)
-                        if appendix:
-                            msg = msg + appendix
-
-                    # FINAL 단계: 생성 완료 안내
-                    if st.session_state.stage == "FINAL":
-                        msg = msg + "\n\n---\n✅ **필요활동**과 **로드맵**을 업데이트했어요. 위 탭에서 바로 확인할 수 있어요."
-
-                    st.markdown(msg, unsafe_allow_html=True)
-
-            # assistant 메시지 저장
-            st.session_state.messages.append({"role": "assistant", "content": msg})
-
-            # 단계별 상태 반영
-            if st.session_state.stage == "DISCOVERY":
-                st.session_state.discovery = data.get("discovery_summary", st.session_state.discovery)
-
-                if data.get("next_action") == "READY_FOR_DESIGN" or st.session_state.discovery_turns >= MAX_DISCOVERY_TURNS:
-                    st.session_state.stage = "DESIGN"
-
-            elif st.session_state.stage == "DESIGN":
-                st.session_state.career_options = data.get("career_options", st.session_state.career_options)
-                st.session_state.recommended_direction = data.get("recommended_direction", st.session_state.recommended_direction)
-                st.session_state.activities = normalize_activities(data.get("draft_activities", st.session_state.activities))
-                # ✅ DESIGN → FINAL 전환 조건: 모델 신호 + 사용자 확정 발화(예: "이대로 진행해")
-                confirm_re = r"(이대로\s*(진행|가자)|확정|최종|결정|진행해|이대로\s*좋아|좋아요|좋아|오케이|ok|OK|go)"
-                user_confirmed = bool(re.search(confirm_re, user_input or "", flags=re.IGNORECASE))
-                model_ready = (data.get("next_action") == "READY_FOR_FINAL")
-
-                if model_ready or user_confirmed:
-                    st.session_state.stage = "FINAL"
-
-            elif st.session_state.stage == "FINAL":
-                st.session_state.career_plan = data.get("career_plan", st.session_state.career_plan)
-                st.session_state.activities = normalize_activities(data.get("activities", st.session_state.activities))
-                st.session_state.roadmap = normalize_roadmap(data.get("roadmap", st.session_state.roadmap))
-
-            save_state()
-            st.rerun()
+        render_chat()
 
     # ------------------
     # Activities Tab
     # ------------------
     with tab_act:
-        render_activities_table()
+        render_activities_fragment()
 
     # ------------------
     # Roadmap Tab
     # ------------------
     with tab_road:
-        render_roadmap()
+        render_roadmap_fragment()
 
 
 if __name__ == "__main__":
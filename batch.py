@@ -0,0 +1,181 @@
+# batch.py
+# 배치 상담 CLI: 미리 적어 둔 학생 답변(JSONL)으로 상담 여러 건을 동시에 끝까지 진행하고 최종 계획을 JSONL로 쓴다
+# 실행: python batch.py cohort.jsonl -o plans.jsonl [--workers 8] [--max-concurrent 8]
+#       OPENAI_API_KEY(또는 --api-key) 필요. 가짜 서버로 처리량을 잴 때:
+#       python bench/fake_openai.py --port 8765 &
+#       OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python batch.py cohort.jsonl -o plans.jsonl
+#
+# 입력 한 줄: {"id": "s-001", "profile": "고2, 데이터 분석에 관심", "answers": ["...", "...", "이대로 진행해"]}
+#   - profile(선택)은 첫 사용자 발화로 보낸다. answers는 순서대로 한 턴씩
+#   - 답변이 끝났는데 최종 계획(로드맵)이 없으면 "이대로 진행해"로 확정될 때까지 몇 턴 더 보낸다
+# 출력 한 줄(끝난 순서): {"id", "ok", "stage", "turns", "calls", "skipped_calls", "ms", "plan" | "error"}
+# 상담 하나는 작업 스레드 하나에서 진행하고(상태 공유 없음), 모델 호출은 공유 게이트웨이(llm_gateway.py)가
+# 동시 호출 수를 제한한다. 끝나면 처리량과 상담당 지연 p50/p95를 stderr에 요약한다.
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from engine import ConsultationEngine, ConsultationState
+from llm_calls import routed_final_call, routed_llm_call
+from llm_clients import ClientRegistry
+from llm_gateway import LLMGateway
+from telemetry import Telemetry, percentile
+
+FINALIZE_MESSAGE = "이대로 진행해"
+# 답변이 끝난 뒤 확정을 위해 더 보낼 최대 턴(DISCOVERY가 남아 있으면 DESIGN을 거쳐야 하므로 여유 있게)
+MAX_FINALIZE_TURNS = 6
+
+
+def read_jobs(path: str) -> list:
+    """입력 JSONL → [{"id", "answers"}]. profile은 첫 답변으로 합친다."""
+    if path == "-":
+        # stdin은 닫지 않는다
+        return _parse_jobs(sys.stdin)
+    with open(path, encoding="utf-8") as f:
+        return _parse_jobs(f)
+
+
+def _parse_jobs(lines) -> list:
+    jobs = []
+    for n, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        row = json.loads(line)
+        answers = [str(a) for a in row.get("answers") or [] if str(a).strip()]
+        profile = row.get("profile")
+        if isinstance(profile, dict):
+            profile = json.dumps(profile, ensure_ascii=False)
+        if profile:
+            answers.insert(0, str(profile))
+        jobs.append({"id": str(row.get("id", n)), "answers": answers})
+    return jobs
+
+
+class BatchRunner:
+    """상담 한 건 = 작업 스레드 하나. 엔진/클라이언트/게이트웨이/계측기는 모든 작업이 공유."""
+
+    def __init__(self, api_key: str, engine: ConsultationEngine, gateway: LLMGateway, telemetry: Telemetry,
+                 sharded_final: bool = True):
+        self.api_key = api_key
+        self.engine = engine
+        self.gateway = gateway
+        self.telemetry = telemetry
+        self.sharded_final = sharded_final
+        self.client = ClientRegistry().get(api_key)
+
+    def call(self, plan, context, counts: dict) -> dict:
+        """engine.turn의 호출 함수: 단계별 라우팅 표대로 모델을 부른다(스트리밍 없이)."""
+        tel = self.telemetry
+        meta = {}
+        start = time.perf_counter()
+        if plan.mode == "FINAL" and self.sharded_final:
+            data = self.gateway.call(
+                lambda: routed_final_call(self.api_key, context, meta, tel, gateway=self.gateway), retry=False
+            )
+        else:
+            data = self.gateway.call(
+                lambda: routed_llm_call(
+                    self.client, plan.mode, plan.prompt, context, meta, tel, gateway=self.gateway
+                ),
+                retry=False,
+            )
+        counts["calls"] += 1
+        tel.turn(plan.mode, (time.perf_counter() - start) * 1000, usage=meta.get("usage"))
+        return data
+
+    def run(self, job: dict) -> dict:
+        state = ConsultationState()
+        # 작업 스레드는 여러 상담을 돌려 쓰므로 이전 상담의 단계가 남지 않게 둘 다 맞춘다
+        self.telemetry.set_context(session=job["id"], stage=state.stage)
+        counts = {"turns": 0, "calls": 0, "skipped_calls": 0}
+
+        def turn(text):
+            plan = self.engine.turn(state, text, lambda plan, context: self.call(plan, context, counts))
+            counts["turns"] += 1
+            # 모델 없이 끝난 턴(초기화/로드맵 보기)만. 확정(CONFIRM)은 같은 턴에 FINAL을 부르므로 세지 않는다
+            if plan.mode is None:
+                counts["skipped_calls"] += 1
+            self.telemetry.set_context(stage=state.stage)
+
+        start = time.perf_counter()
+        try:
+            for answer in job["answers"]:
+                turn(answer)
+            for _ in range(MAX_FINALIZE_TURNS):
+                if state.roadmap:
+                    break
+                turn(FINALIZE_MESSAGE)
+        except Exception as e:
+            return dict(
+                id=job["id"], ok=False, stage=state.stage, **counts,
+                ms=round((time.perf_counter() - start) * 1000, 1), error=f"{type(e).__name__}: {e}",
+            )
+        return dict(
+            id=job["id"], ok=bool(state.roadmap), stage=state.stage, **counts,
+            ms=round((time.perf_counter() - start) * 1000, 1), plan=state.plan(),
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="학생 답변 JSONL로 상담을 일괄 진행해 최종 계획 JSONL을 만든다")
+    ap.add_argument("input", help="입력 JSONL(-면 stdin)")
+    ap.add_argument("-o", "--output", default="-", help="출력 JSONL(기본 stdout)")
+    ap.add_argument("--workers", type=int, default=8, help="동시에 진행할 상담 수")
+    ap.add_argument("--max-concurrent", type=int, default=None, help="동시 모델 호출 수(기본 --workers)")
+    ap.add_argument("--max-retries", type=int, default=3)
+    ap.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"))
+    ap.add_argument("--no-sharded-final", action="store_true", help="FINAL을 샤드 병렬 없이 한 번에 생성")
+    ap.add_argument("--no-local-intents", action="store_true", help="확정/초기화/로드맵 보기도 모델로 보냄")
+    ap.add_argument("--no-patch", action="store_true", help="FINAL 뒤 수정 요청도 전체 재생성")
+    ap.add_argument("--telemetry", default=os.environ.get("JINSUL_TELEMETRY"), help="계측 이벤트 JSONL 경로")
+    args = ap.parse_args()
+    if not args.api_key:
+        ap.error("OPENAI_API_KEY 또는 --api-key가 필요합니다")
+
+    jobs = read_jobs(args.input)
+    engine = ConsultationEngine(local_intents=not args.no_local_intents, patch_mode=not args.no_patch)
+    gateway = LLMGateway(max_concurrent=args.max_concurrent or args.workers, max_retries=args.max_retries)
+    telemetry = Telemetry(args.telemetry)
+    runner = BatchRunner(args.api_key, engine, gateway, telemetry, sharded_final=not args.no_sharded_final)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output != "-" else sys.stdout
+    results = []
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="consult") as pool:
+            for future in as_completed([pool.submit(runner.run, job) for job in jobs]):
+                result = future.result()
+                results.append(result)
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    wall = time.perf_counter() - start
+
+    ms = [r["ms"] for r in results]
+    failed = [r for r in results if not r["ok"]]
+    turns = sum(r["turns"] for r in results)
+    print(
+        f"상담 {len(results)}건 (실패 {len(failed)}) · {wall:.1f}초 · "
+        f"{len(results) / wall if wall else 0:.2f}건/초 · {turns / wall if wall else 0:.2f}턴/초",
+        file=sys.stderr,
+    )
+    print(
+        f"상담당 p50 {percentile(ms, 0.5) / 1000:.2f}초 · p95 {percentile(ms, 0.95) / 1000:.2f}초 · "
+        f"모델 호출 {sum(r['calls'] for r in results)}회 · 로컬 처리 {sum(r['skipped_calls'] for r in results)}회",
+        file=sys.stderr,
+    )
+    print(f"게이트웨이: {gateway.stats()}", file=sys.stderr)
+    for r in failed[:5]:
+        print(f"  실패 {r['id']}: {r.get('error') or '최종 계획 없음'}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
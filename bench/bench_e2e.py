@@ -0,0 +1,220 @@
+# bench/bench_e2e.py
+# 오프라인 e2e 벤치마크: 가짜 Responses 서버(fake_openai.py) + Streamlit AppTest로 상담 한 번을 끝까지 진행
+# 실행: python bench/bench_e2e.py [--runs 3] [--ttft 0.05] [--chunk-delay 0.002]
+#       python bench/bench_e2e.py --update-baseline   # 이 머신의 기준선 다시 기록
+#
+# DISCOVERY(4턴) → DESIGN(수정 2턴) → 확정(같은 턴에 FINAL 생성) → 수정 패치 2턴을 입력하고, 턴마다
+#   wall    입력부터 화면 갱신(rerun 포함)이 끝날 때까지
+#   llm     llm.network + llm.parse (+ FINAL 샤드 실행 llm.final) 합계
+#   persist save_state 합계
+#   render  탭 렌더(render.*) 합계에서 llm/persist를 뺀 값(채팅 fragment가 턴 처리를 감싸므로)
+#   mem     tracemalloc 현재/턴 중 최대(KB, 프로세스 전체)
+# 를 잰다. 구간 시간은 앱의 계측 이벤트(JINSUL_TELEMETRY JSONL)에서 이 세션 것만 모은다.
+# 첫 상담(warmup)은 import/첫 연결 비용이라 버리고, 나머지는 턴별 중앙값을 쓴다.
+# 기준선(bench/baselines/e2e.json)보다 tolerance 넘게 나빠지면 종료 코드 1. 기준선은 머신마다 다르므로 CI 머신에서 --update-baseline으로 만든다.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+APP_PATH = BENCH_DIR.parent / "app.py"
+BASELINE_PATH = BENCH_DIR / "baselines" / "e2e.json"
+sys.path.insert(0, str(BENCH_DIR))
+
+from fake_openai import Latency, start_server  # noqa: E402
+
+SCRIPT = (
+    "요즘 데이터 분석 공부를 혼자 하고 있어요.",
+    "숫자로 문제를 풀 때 제일 재미있어요. 엑셀로 가계부도 자동화해 봤어요.",
+    "사람들 앞에서 발표하는 건 조금 부담스러워요.",
+    "평일엔 학교 때문에 바쁘고 주말에만 시간이 나요.",
+    "두 번째 옵션을 조금 더 자세히 알고 싶어요.",
+    "주말에만 할 수 있는 활동 위주로 바꿔 주세요.",
+    "이대로 진행해",
+    "로드맵을 조금 더 여유 있게 잡아 주세요.",
+    "2027 하반기에 인턴 하나 더 넣어줘",
+)
+METRICS = ("wall_ms", "render_ms", "persist_ms", "llm_ms", "mem_kb", "peak_kb")
+# 작은 값의 흔들림으로 실패하지 않게 두는 절대 여유(ms/KB)
+SLACK = {"wall_ms": 50.0, "render_ms": 20.0, "persist_ms": 5.0, "llm_ms": 20.0, "mem_kb": 512.0, "peak_kb": 1024.0}
+
+
+def _read_events(path: Path, offset: int):
+    """offset 이후에 추가된 이벤트와 새 offset."""
+    if not path.exists():
+        return [], offset
+    with path.open(encoding="utf-8") as f:
+        f.seek(offset)
+        chunk = f.read()
+        offset = f.tell()
+    return [json.loads(line) for line in chunk.splitlines() if line.strip()], offset
+
+
+def _span_total(events, sid: str, match) -> float:
+    # 추측 생성(speculative)은 백그라운드라 턴 시간에 넣지 않는다
+    return sum(
+        e["ms"]
+        for e in events
+        if e.get("kind") == "span" and e.get("session") == sid and not e.get("speculative") and match(e["name"])
+    )
+
+
+def run_consultation(telemetry_path: Path, timeout: float) -> list:
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    at.run()
+    at.sidebar.text_input[0].input("sk-bench").run()
+    sid = at.session_state["_sid"]
+    _, offset = _read_events(telemetry_path, 0)
+    # 같은 프로세스에서 여러 번 돌려도 앱 응답 캐시에 걸리지 않게 입력을 실행마다 다르게
+    # (컨텍스트는 최근 메시지만 보내므로 모든 턴에 붙인다)
+    nonce = uuid.uuid4().hex[:6]
+
+    rows = []
+    for i, text in enumerate(SCRIPT):
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        at.chat_input[0].set_value(f"{text} ({nonce})").run()
+        wall = (time.perf_counter() - start) * 1000
+        if at.exception:
+            raise RuntimeError(f"{i + 1}번째 턴 예외: {at.exception}")
+        if at.error:
+            raise RuntimeError(f"{i + 1}번째 턴 오류: {[e.value for e in at.error]}")
+        current, peak = tracemalloc.get_traced_memory()
+        events, offset = _read_events(telemetry_path, offset)
+        llm = _span_total(events, sid, lambda n: n in ("llm.network", "llm.parse", "llm.final"))
+        persist = _span_total(events, sid, lambda n: n == "save_state")
+        render = _span_total(events, sid, lambda n: n.startswith("render."))
+        # 단계는 앱이 실제로 처리한 것(확정 입력은 같은 턴에 FINAL, 이후 수정은 FINAL_PATCH)
+        turns = [e for e in events if e.get("kind") == "turn" and e.get("session") == sid]
+        rows.append({
+            "turn": i + 1,
+            "stage": turns[-1]["stage"] if turns else "?",
+            "wall_ms": wall,
+            "render_ms": max(0.0, render - llm - persist),
+            "persist_ms": persist,
+            "llm_ms": llm,
+            "mem_kb": current / 1024,
+            "peak_kb": peak / 1024,
+        })
+
+    assert at.session_state["stage"] == "FINAL", at.session_state["stage"]
+    assert len(at.session_state["messages"]) == 2 * len(SCRIPT)
+    return rows
+
+
+def median_rows(runs: list) -> list:
+    out = []
+    for turn_rows in zip(*runs):
+        row = {"turn": turn_rows[0]["turn"], "stage": turn_rows[0]["stage"]}
+        for m in METRICS:
+            row[m] = round(statistics.median(r[m] for r in turn_rows), 1)
+        out.append(row)
+    return out
+
+
+def summarize(rows: list) -> dict:
+    """회귀 비교 대상: 단계별 wall 합계 + 전체 합계 + 최대 메모리."""
+    out = {}
+    for stage in dict.fromkeys(r["stage"] for r in rows):
+        out[f"{stage}.wall_ms"] = round(sum(r["wall_ms"] for r in rows if r["stage"] == stage), 1)
+    for m in ("wall_ms", "render_ms", "persist_ms", "llm_ms"):
+        out[f"total.{m}"] = round(sum(r[m] for r in rows), 1)
+    out["max.mem_kb"] = round(max(r["mem_kb"] for r in rows), 1)
+    out["max.peak_kb"] = round(max(r["peak_kb"] for r in rows), 1)
+    return out
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for key, base in baseline.items():
+        if key not in summary:
+            continue
+        limit = base * (1 + tolerance) + SLACK[key.split(".", 1)[1]]
+        if summary[key] > limit:
+            regressions.append(f"{key}: {summary[key]:,.1f} > 기준 {base:,.1f} (허용 {limit:,.1f})")
+    return regressions
+
+
+def print_rows(rows: list):
+    print(f"{'턴':>3} {'단계':<10}" + "".join(f"{m:>12}" for m in METRICS))
+    for r in rows:
+        print(f"{r['turn']:>3} {r['stage']:<10}" + "".join(f"{r[m]:>12,.1f}" for m in METRICS))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--warmup", type=int, default=1, help="결과에서 뺄 첫 상담 수")
+    ap.add_argument("--ttft", type=float, default=0.05, help="가짜 서버 첫 토큰 지연(초)")
+    ap.add_argument("--chunk-delay", type=float, default=0.002, help="가짜 서버 청크 간 지연(초)")
+    ap.add_argument("--payloads", help="녹화 응답 JSONL(없으면 합성)")
+    ap.add_argument("--tolerance", type=float, default=0.3, help="기준선 대비 허용 비율")
+    ap.add_argument("--baseline", default=str(BASELINE_PATH))
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    args = ap.parse_args()
+
+    server, base_url, server_stats = start_server(latency=Latency(args.ttft, args.chunk_delay), payloads=args.payloads)
+    workdir = Path(tempfile.mkdtemp(prefix="jinsul-bench-"))
+    telemetry_path = workdir / "telemetry.jsonl"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["JINSUL_TELEMETRY"] = str(telemetry_path)
+    os.chdir(workdir)  # 상태 DB(.jinsul_state.db)를 임시 디렉터리에
+
+    tracemalloc.start()
+    try:
+        for _ in range(args.warmup):
+            run_consultation(telemetry_path, args.timeout)
+        runs = [run_consultation(telemetry_path, args.timeout) for _ in range(args.runs)]
+    finally:
+        server.shutdown()
+    rows = median_rows(runs)
+    summary = summarize(rows)
+
+    print(f"상담 {args.runs}회(턴별 중앙값), 가짜 서버 요청 {server_stats['requests']}건 {server_stats['by_stage']}")
+    print_rows(rows)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+    config = {
+        "ttft": args.ttft,
+        "chunk_delay": args.chunk_delay,
+        "payloads": args.payloads,
+        "warmup": args.warmup,
+        "turns": len(SCRIPT),
+    }
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(
+            json.dumps({"config": config, "summary": summary}, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+        )
+        print(f"기준선 저장: {baseline_path}")
+        return
+    if not baseline_path.exists():
+        print("기준선 없음: --update-baseline으로 먼저 기록하세요.")
+        return
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    if baseline.get("config") != config:
+        print(f"기준선 설정이 달라 비교하지 않음: {baseline.get('config')} != {config}")
+        return
+    regressions = compare(summary, baseline["summary"], args.tolerance)
+    if regressions:
+        print("성능 회귀:")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    print(f"기준선 대비 회귀 없음(허용 {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench/bench_extract_json.py
+# extract_json 마이크로 벤치마크: 기존 try/정규식/재시도 방식 vs JsonObjectScanner
+# 실행: python bench/bench_extract_json.py [--repeat 200]
+#
+# 입력은 녹화한 모델 출력이 아니라 이 스크립트가 만드는 합성 FINAL 응답(--activities개 활동)을
+# 모델 출력에서 자주 보는 모양으로 감싼 것이다:
+#   clean(그대로 JSON), fenced(```json 펜스), prose(앞뒤 설명 + 중괄호가 든 산문),
+#   truncated(중간에 끊긴 출력), 그리고 각 경우를 청크 스트림으로 넣는 streamed.
+# 숫자는 구현끼리 비교용이다(실제 응답 길이/모양 분포를 반영하지 않음).
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from model_output import JsonObjectScanner, extract_json  # noqa: E402
+
+
+def legacy_extract_json(text: str) -> dict:
+    """변경 전 구현(비교용)."""
+    text = (text or "").strip()
+    try:
+        return json.loads(text)
+    except Exception:
+        m = re.search(r"\{.*\}", text, flags=re.DOTALL)
+        if not m:
+            raise ValueError("JSON 파싱 실패")
+        return json.loads(m.group(0))
+
+
+def _synthetic_payload(n_activities: int) -> dict:
+    acts = [
+        {
+            "id": f"act-{i}",
+            "title": f"활동 {i} {{중괄호}} \"인용\"",
+            "description": "설명 " * 20 + "\\ 백슬래시",
+            "priority": ["핵심", "권장", "선택"][i % 3],
+            "links": [f"https://example.com/{i}"],
+        }
+        for i in range(n_activities)
+    ]
+    return {
+        "assistant_message": "최종 계획입니다. {괄호} 포함",
+        "career_plan": {"direction": "소프트웨어 엔지니어", "strategy": ["a", "b"]},
+        "activities": acts,
+        "roadmap": [{"year": 2026 + y, "h1": [a["id"] for a in acts[::2]], "h2": []} for y in range(3)],
+    }
+
+
+def synthetic_samples(n_activities: int) -> dict:
+    body = json.dumps(_synthetic_payload(n_activities), ensure_ascii=False, indent=2)
+    return {
+        "clean": body,
+        "fenced": f"```json\n{body}\n```",
+        "prose": f"좋아요! 아래는 계획이에요 {{참고}}.\n{body}\n\n추가로 {{궁금한 점}}이 있으면 말해 주세요.",
+        "truncated": body[: len(body) // 2],
+    }
+
+
+def _run(fn, text):
+    try:
+        return fn(text)
+    except ValueError:
+        return None
+
+
+def _stream(text, chunk=24):
+    scanner = JsonObjectScanner()
+    for i in range(0, len(text), chunk):
+        if scanner.feed(text[i:i + chunk]) is not None:
+            break
+    return scanner.result
+
+
+def bench(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        _run(fn, text)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--activities", type=int, default=40)
+    args = ap.parse_args()
+
+    expected = _synthetic_payload(args.activities)
+    print(f"합성 FINAL 응답(활동 {args.activities}개)")
+    print(f"{'case':<10} {'bytes':>7} {'legacy µs':>10} {'scanner µs':>11} {'stream µs':>10}  legacy/scanner correct")
+    for name, text in synthetic_samples(args.activities).items():
+        want = None if name == "truncated" else expected
+        legacy_ok = _run(legacy_extract_json, text) == want
+        scanner_ok = _run(extract_json, text) == want and _stream(text) == want
+        print(
+            f"{name:<10} {len(text.encode()):>7} "
+            f"{bench(legacy_extract_json, text, args.repeat):>10.1f} "
+            f"{bench(extract_json, text, args.repeat):>11.1f} "
+            f"{bench(_stream, text, args.repeat):>10.1f}  "
+            f"{legacy_ok}/{scanner_ok}"
+        )
+
+
+if __name__ == "__main__":
+    main()
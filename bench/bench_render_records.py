@@ -0,0 +1,135 @@
+# bench/bench_render_records.py
+# 렌더 전 데이터 경로 벤치마크(활동 200개): 매 rerun 재정규화(dict) vs 수집 시 1회 검증한 레코드
+# 실행: python bench/bench_render_records.py [--activities 200] [--repeat 200]
+#
+# 두 탭(필요활동/로드맵)이 rerun마다 하는 일 중 Streamlit 위젯 호출을 뺀 부분
+# (정규화 → id/제목 맵 → 반기별 해석·정렬 → 표시 문자열)을 그대로 재현해 비교한다.
+
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from model_output import parse_activities, parse_roadmap  # noqa: E402
+
+RANK = {"핵심": 0, "권장": 1, "선택": 2}
+
+
+# ---- 변경 전: 렌더마다 dict 복사 + 기본값 채우기 ----
+
+def legacy_normalize_activities(raw):
+    out = []
+    for a in raw:
+        if not isinstance(a, dict):
+            continue
+        a = dict(a)
+        a.setdefault("id", str(uuid.uuid4()))
+        a.setdefault("title", "")
+        a.setdefault("description", "")
+        a.setdefault("priority", "권장")
+        if not isinstance(a.get("links"), list):
+            a["links"] = []
+        out.append(a)
+    return out
+
+
+def legacy_normalize_roadmap(raw):
+    out = []
+    for r in raw:
+        rr = dict(r)
+        y = rr.get("year")
+        if isinstance(y, str) and y.isdigit():
+            rr["year"] = int(y)
+        rr.setdefault("h1", [])
+        rr.setdefault("h2", [])
+        out.append(rr)
+    return out
+
+
+def legacy_rerun(raw_acts, raw_roadmap):
+    out = []
+    acts = legacy_normalize_activities(raw_acts)
+    for a in acts:
+        title = (a.get("title") or "").strip()
+        priority = (a.get("priority") or "권장").strip()
+        desc = (a.get("description") or "").strip()
+        links = [l for l in a.get("links") or [] if isinstance(l, str) and l.startswith("http")][:3]
+        out.append((title, priority, desc, links))
+    roadmap = legacy_normalize_roadmap(raw_roadmap)
+    activities = legacy_normalize_activities(raw_acts)
+    act_map = {a["id"]: a for a in activities if isinstance(a, dict) and a.get("id")}
+    title_map = {(a.get("title") or "").strip(): a for a in activities}
+    for r in sorted(roadmap, key=lambda x: x.get("year", 0)):
+        for half in ("h1", "h2"):
+            resolved = [act_map.get(k) or title_map.get(str(k).strip()) for k in r.get(half) or []]
+            resolved = [a for a in resolved if a]
+            resolved.sort(key=lambda x: (RANK.get((x.get("priority") or "권장").strip(), 9), x.get("title") or ""))
+            out.append([(a.get("title") or "").strip() for a in resolved])
+    return out
+
+
+# ---- 변경 후: 검증된 레코드를 그대로 ----
+
+def records_rerun(acts, roadmap):
+    out = []
+    for a in acts:
+        out.append((a.title, a.priority, a.description, a.links[:3]))
+    act_map = {a.id: a for a in acts}
+    title_map = {a.title: a for a in acts if a.title}
+    for r in roadmap:
+        for half in (r.h1, r.h2):
+            resolved = [a for a in (act_map.get(k) or title_map.get(k) for k in half) if a]
+            resolved.sort(key=lambda x: (RANK.get(x.priority, 9), x.title))
+            out.append([a.title for a in resolved])
+    return out
+
+
+def sample(n):
+    acts = [
+        {
+            "id": f"act-{i}",
+            "title": f"  활동 {i} ",
+            "description": "설명 " * 15,
+            "priority": ["핵심", "권장", "선택"][i % 3],
+            "links": [f"https://example.com/{i}", "not-a-link"],
+        }
+        for i in range(n)
+    ]
+    years = 4
+    roadmap = [
+        {"year": str(2026 + y), "h1": [a["id"] for a in acts[y::years * 2]], "h2": [a["id"] for a in acts[y + years::years * 2]]}
+        for y in range(years)
+    ]
+    return acts, roadmap
+
+
+def timed(fn, *args, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--activities", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    raw_acts, raw_roadmap = sample(args.activities)
+    acts, roadmap = parse_activities(raw_acts), parse_roadmap(raw_roadmap)
+    assert records_rerun(acts, roadmap)[args.activities:] == legacy_rerun(raw_acts, raw_roadmap)[args.activities:]
+
+    before = timed(legacy_rerun, raw_acts, raw_roadmap, repeat=args.repeat)
+    ingest = timed(lambda: (parse_activities(raw_acts), parse_roadmap(raw_roadmap)), repeat=args.repeat)
+    after = timed(records_rerun, acts, roadmap, repeat=args.repeat)
+    print(f"activities={args.activities}")
+    print(f"  rerun (before, dict 재정규화): {before:7.3f} ms")
+    print(f"  rerun (after, 레코드)        : {after:7.3f} ms  ({before / after:.1f}x)")
+    print(f"  ingest 1회 검증               : {ingest:7.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# bench/bench_session_memory.py
+# 세션당 메모리/저장 크기 비교(30턴 상담): 부록을 붙인 표시용 본문 저장 vs 본문 + 참조 저장
+# 실행: python bench/bench_session_memory.py [--turns 30] [--discovery 4] [--design 16]
+#
+# DISCOVERY → DESIGN(초안 반복 수정) → FINAL(보완 요청) 순으로 대화를 흉내 낸다.
+# 변경 전 메시지는 화면에 보이던 그대로(초안 부록 + 배지 HTML + 완료 안내)를 본문에 붙여 저장했고,
+# 변경 후에는 본문/단계/참조 키만 저장하고 참조 대상은 세션의 ref_catalog에 한 번만 둔다.
+# 두 방식이 같은 화면을 그리는지도 함께 확인한다.
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import FINAL_FOOTER, _build_design_chat_appendix, message_markdown  # noqa: E402
+from engine import design_refs  # noqa: E402
+from model_output import parse_activities  # noqa: E402
+
+PRIORITIES = ("핵심", "권장", "선택")
+
+
+def deep_size(obj, seen=None) -> int:
+    """컨테이너를 따라가며 sys.getsizeof 합계(같은 객체는 한 번만)."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(v, seen) for v in obj)
+    return size
+
+
+def design_payload(turn: int) -> dict:
+    """DESIGN 응답 흉내: 옵션/활동은 대부분 이전 턴과 같고 조금씩만 바뀐다."""
+    options = [
+        {
+            "title": f"진로 옵션 {i + 1}" + (" (수정)" if i == turn % 3 and turn > 2 else ""),
+            "fit_reason": "관심 분야와 강점이 잘 맞고 관련 경험을 이어 갈 수 있음",
+            "risk": "진입 경쟁이 치열하고 포트폴리오 준비 기간이 필요함",
+            "outlook": "향후 5년간 수요가 꾸준히 늘어날 것으로 예상",
+        }
+        for i in range(3)
+    ]
+    acts = [
+        {
+            "id": f"a{i + 1}",
+            "title": f"준비 활동 {i + 1}" + (f" v{turn // 4}" if i < 2 else ""),
+            "description": "설명",
+            "priority": PRIORITIES[i % 3],
+        }
+        for i in range(6)
+    ]
+    return {
+        "assistant_message": "말씀해 주신 내용을 반영해 초안을 다듬었어요. 어떤 부분을 더 바꿔 볼까요? " * 2,
+        "career_options": options,
+        "recommended_direction": "데이터 분석 직무로 시작해 도메인 전문성을 쌓는 방향",
+        "draft_activities": acts,
+    }
+
+
+def simulate(turns: int, discovery: int, design: int):
+    legacy = []
+    records = []
+    catalog = {"options": {}, "activities": {}}
+    for t in range(turns):
+        user = {"role": "user", "content": f"{t}번째 답변이에요. 조금 더 자세히 이야기하면 이런 상황이에요."}
+        legacy.append(dict(user))
+        records.append(dict(user))
+        if t < discovery:
+            text = "좋아요. 그럼 평소에 가장 몰입했던 경험은 무엇이었나요?"
+            legacy.append({"role": "assistant", "content": text})
+            records.append({"role": "assistant", "content": text, "stage": "DISCOVERY"})
+        elif t < discovery + design:
+            data = design_payload(t)
+            text = data["assistant_message"].strip()
+            acts = parse_activities(data["draft_activities"])
+            appendix = _build_design_chat_appendix(data["career_options"], data["recommended_direction"], acts)
+            legacy.append({"role": "assistant", "content": text + appendix})
+            record = {"role": "assistant", "content": text, "stage": "DESIGN"}
+            record.update(design_refs(catalog, data["career_options"], data["recommended_direction"], acts))
+            records.append(record)
+        else:
+            text = "요청하신 대로 최종 계획을 보완했어요. 활동 순서와 일정도 함께 조정했어요."
+            legacy.append({"role": "assistant", "content": text + FINAL_FOOTER})
+            records.append({"role": "assistant", "content": text, "stage": "FINAL"})
+    return legacy, records, catalog
+
+
+def stored_bytes(messages, extra=None) -> int:
+    """SessionStore가 쓰는 것과 같은 직렬화(메시지 행 + 필드)의 UTF-8 바이트 수."""
+    total = sum(len(json.dumps(m, ensure_ascii=False).encode("utf-8")) for m in messages)
+    if extra is not None:
+        total += len(json.dumps(extra, ensure_ascii=False).encode("utf-8"))
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, default=30)
+    ap.add_argument("--discovery", type=int, default=4)
+    ap.add_argument("--design", type=int, default=16)
+    args = ap.parse_args()
+
+    legacy, records, catalog = simulate(args.turns, args.discovery, args.design)
+
+    same = all(
+        message_markdown(r, catalog) == (l["content"] if r["role"] == "assistant" else r["content"])
+        for l, r in zip(legacy, records)
+    )
+    print(f"{args.turns}턴({len(legacy)}개 메시지), 표시 결과 동일: {same}")
+    print(f"{'':>16}{'변경 전':>12}{'변경 후':>12}{'절감':>8}")
+    rows = [
+        ("세션 메모리(B)", deep_size(legacy), deep_size(records) + deep_size(catalog)),
+        ("저장 크기(B)", stored_bytes(legacy), stored_bytes(records, catalog)),
+    ]
+    for name, before, after in rows:
+        print(f"{name:>16}{before:>12,}{after:>12,}{1 - after / before:>8.0%}")
+    print(f"카탈로그: 옵션 {len(catalog['options'])}개, 활동 {len(catalog['activities'])}개")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# bench/check_fallback.py
+# 단계 폴백 점검: 기본 모델(gpt-5-mini)만 503을 내는 가짜 서버로 단계 호출을 보내 폴백 모델(gpt-5-nano)이 답하는지 본다
+# 실행: python bench/check_fallback.py [--max-retries 3]
+#
+# 앱/배치와 같은 모양으로 부른다: 바깥 gateway.call(retry=False)이 슬롯만 잡고, 시도마다 gateway.retry가
+# 재시도를 다 쓴 뒤 call_with_fallback이 폴백 모델로 넘긴다. 단계마다
+#   - 결과가 왔는지
+#   - 기본 모델 요청 수 = 시도 1 + 재시도 max_retries(FINAL은 샤드 수만큼 곱해질 수 있음), 폴백 모델 요청이 있는지
+#   - 계측기에 fallback=True 성공 호출이 남았는지
+# 를 확인한다. 하나라도 틀리면 종료 코드 1.
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+from fake_openai import start_server  # noqa: E402
+
+STAGES = ("DISCOVERY", "DESIGN", "FINAL")
+MESSAGES = [{"role": "user", "content": "고2, 데이터 분석에 관심이 있어요"}]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-retries", type=int, default=3)
+    args = ap.parse_args()
+
+    server, base_url, stats = start_server(fail_models={"gpt-5-mini"})
+    os.environ["OPENAI_BASE_URL"] = base_url
+
+    from llm_calls import routed_final_call, routed_llm_call
+    from llm_clients import ClientRegistry
+    from llm_gateway import LLMGateway
+    from model_routes import DEFAULT_MODEL, FALLBACK_MODEL
+    from telemetry import Telemetry
+
+    api_key = "fake"
+    client = ClientRegistry().get(api_key)
+    failed = 0
+    try:
+        for stage in STAGES:
+            # 단계마다 새 게이트웨이/계측기: 차단기·호출 기록이 단계끼리 섞이지 않게
+            gateway = LLMGateway(max_retries=args.max_retries, base_delay=0.01, max_delay=0.05)
+            tel = Telemetry()
+            with stats["lock"]:
+                stats["by_model"].clear()
+            meta = {}
+            if stage == "FINAL":
+                call = lambda: routed_final_call(api_key, MESSAGES, meta, tel, gateway=gateway)  # noqa: E731
+            else:
+                call = lambda: routed_llm_call(client, stage, "점검", MESSAGES, meta, tel, gateway=gateway)  # noqa: E731
+            try:
+                data = gateway.call(call, retry=False)
+            except Exception as e:
+                data, error = None, f"{type(e).__name__}: {e}"
+            else:
+                error = None
+
+            by_model = dict(stats["by_model"])
+            models = tel.summary()["models"]
+            fallback_ok = models.get(f"{stage}/{FALLBACK_MODEL}", {}).get("fallback_rate") == 1.0
+            primary = by_model.get(DEFAULT_MODEL, 0)
+            ok = (
+                isinstance(data, dict)
+                and primary >= 1 + args.max_retries
+                and by_model.get(FALLBACK_MODEL, 0) >= 1
+                and fallback_ok
+            )
+            failed += not ok
+            print(
+                f"{'ok ' if ok else 'BAD'} {stage:<9} 요청 {by_model} · 게이트웨이 {gateway.stats()['retries']}회 재시도"
+                + (f" · 오류 {error}" if error else "")
+            )
+    finally:
+        server.shutdown()
+
+    if failed:
+        print(f"{failed}건 실패")
+        return 1
+    print("모두 통과")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# bench/check_intent_regex.py
+# 로컬 의도 판별/추측 생성 동의 판별 정규식 점검: 판별 결과 + 긴 맞장구 입력("네네네…")에서의 시간
+# 실행: python bench/check_intent_regex.py [--length 2000] [--limit-ms 50]
+#
+# 판별은 모델 호출 전(추측 생성이 있으면 그 결과를 쓸지 정할 때도) 스크립트 스레드에서 돈다.
+# 되풀이 안에 또 되풀이("(네+…)*")를 두면 맞지 않는 긴 입력에서 역추적이 길이에 지수로 늘어
+# 프로세스 전체가 멈추므로, 긴 입력 하나가 limit-ms 안에 끝나는지 본다. 판별이 기대와 다르거나 시간을 넘기면 종료 코드 1.
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from intent_router import CONFIRM, RESET, SHOW_ROADMAP, route  # noqa: E402
+from speculative import is_acknowledgement  # noqa: E402
+
+# (단계, 입력, 기대 의도)
+CASES = (
+    ("DESIGN", "좋아, 이대로 진행해", CONFIRM),
+    ("DESIGN", "네네네 진행해 주세요", CONFIRM),
+    ("DESIGN", "응 응, 좋아요", CONFIRM),
+    ("DESIGN", "네", None),
+    ("DESIGN", "좋아요. 근데 두 번째 옵션이 궁금해요", None),
+    ("DISCOVERY", "좋아, 이대로 진행해", None),
+    ("FINAL", "처음부터 다시", RESET),
+    ("FINAL", "로드맵 보여줘", SHOW_ROADMAP),
+    ("FINAL", "로드맵", SHOW_ROADMAP),
+    ("FINAL", "로드맵 다시 보여줘", SHOW_ROADMAP),
+    ("FINAL", "로드맵 다시", None),
+    ("FINAL", "로드맵 다시 짜 줘", None),
+)
+# (입력, 단순 동의인지)
+ACK_CASES = (
+    ("네", True),
+    ("네네 좋아요", True),
+    ("응응, 진행해 주세요", True),
+    ("좋아요 부탁해요", True),
+    ("네, 근데 주말 활동이 더 있으면 좋겠어요", False),
+)
+
+# 맞지 않는 긴 맞장구: 끝까지 읽은 뒤에야 실패하므로 역추적이 가장 많이 일어나는 모양
+REPEATS = ("네", "응", "네 ", "좋아 ", "어")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--length", type=int, default=2000, help="맞장구 되풀이 횟수")
+    ap.add_argument("--limit-ms", type=float, default=50.0, help="입력 하나의 허용 시간")
+    args = ap.parse_args()
+
+    failed = 0
+    for stage, text, want in CASES:
+        got = route(stage, text)
+        ok = got == want
+        failed += not ok
+        print(f"{'ok ' if ok else 'BAD'} {stage:<9} {text!r:<30} → {got} (기대 {want})")
+    for text, want in ACK_CASES:
+        got = is_acknowledgement(text)
+        ok = got == want
+        failed += not ok
+        print(f"{'ok ' if ok else 'BAD'} {'ACK':<9} {text!r:<30} → {got} (기대 {want})")
+
+    checks = {
+        "DESIGN": lambda text: route("DESIGN", text),
+        "FINAL": lambda text: route("FINAL", text),
+        "ACK": is_acknowledgement,
+    }
+    for unit in REPEATS:
+        for name, check in checks.items():
+            text = unit * args.length + " 그런데 질문"
+            start = time.perf_counter()
+            check(text)
+            ms = (time.perf_counter() - start) * 1000
+            ok = ms <= args.limit_ms
+            failed += not ok
+            print(f"{'ok ' if ok else 'BAD'} {name:<9} {unit!r}×{args.length:<6} {ms:8.2f} ms")
+
+    if failed:
+        print(f"{failed}건 실패")
+        return 1
+    print("모두 통과")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,350 @@
+# bench/fake_openai.py
+# 로컬 가짜 Responses 엔드포인트(POST /v1/responses): 실제 API 비용/네트워크 없이 앱 성능을 재기 위한 것
+# 실행: python bench/fake_openai.py [--port 8765] [--ttft 0.3] [--chunk-delay 0.01] [--payloads recorded.jsonl]
+#       [--fail-model gpt-5-mini]
+#       → 앱은 OPENAI_BASE_URL=http://127.0.0.1:8765/v1 로 띄운다
+#
+# - 단계는 요청의 text.format 이름(discovery/design/final/final_plan/final_activities_*/final_roadmap/final_patch)으로 구분
+# - 기본은 합성 응답. --payloads로 녹화 응답(JSONL: {"stage": ..., "payload": {...}})을 주면 단계별로 돌려가며 재생
+# - stream=true면 SSE(response.created → output_text.delta … → response.completed), 아니면 Response JSON
+# - 지연: 첫 토큰까지 ttft초, 이후 chunk_chars글자마다 chunk_delay초
+# - 사용자 입력에 [user:태그]가 있으면 assistant_message와 활동 제목 끝에 그대로 붙여 돌려준다
+#   (부하 테스트에서 세션끼리 상태가 섞이지 않았는지 확인하는 용도)
+# - --fail-model로 준 모델 요청에는 503을 돌려준다(단계 폴백/재시도 점검용)
+
+import argparse
+import datetime
+import itertools
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PRIORITIES = ("핵심", "권장", "선택")
+_ACTIVITY_SHARD_RE = re.compile(r"우선순위가 '(\S+)'인 활동만 (\d+)개")
+_USER_TAG_RE = re.compile(r"\[user:[\w-]+\]")
+
+
+class Latency:
+    def __init__(self, ttft: float = 0.0, chunk_delay: float = 0.0, chunk_chars: int = 24):
+        self.ttft = ttft
+        self.chunk_delay = chunk_delay
+        self.chunk_chars = chunk_chars
+
+
+def _stage(body: dict) -> str:
+    fmt = (body.get("text") or {}).get("format") or {}
+    name = fmt.get("name") or ""
+    if name.startswith("final_activities"):
+        return "final_activities"
+    if name in ("discovery", "design", "final"):
+        return name.upper()
+    if name:
+        return name
+    prompt = _system_prompt(body)
+    for marker, stage in (("[대화 단계]", "DISCOVERY"), ("[설계 단계]", "DESIGN"), ("[확정 단계]", "FINAL")):
+        if marker in prompt:
+            return stage
+    return "DISCOVERY"
+
+
+def _system_prompt(body: dict) -> str:
+    for m in body.get("input") or []:
+        if isinstance(m, dict) and m.get("role") in ("system", "developer"):
+            return str(m.get("content") or "")
+    return str(body.get("instructions") or "")
+
+
+def _state_context(body: dict) -> dict:
+    """앱이 보낸 [지금까지 정리된 사용자 정보] JSON(없으면 빈 dict)."""
+    for m in body.get("input") or []:
+        content = str(m.get("content") or "") if isinstance(m, dict) else ""
+        if content.startswith("[지금까지 정리된 사용자 정보]"):
+            try:
+                return json.loads(content.split("\n", 1)[1])
+            except (IndexError, ValueError):
+                return {}
+    return {}
+
+
+def _echo_user_tag(payload: dict, body: dict) -> dict:
+    tags = [
+        t
+        for m in body.get("input") or []
+        if isinstance(m, dict) and m.get("role") == "user"
+        for t in _USER_TAG_RE.findall(str(m.get("content") or ""))
+    ]
+    if not tags:
+        return payload
+    tag = tags[-1]
+    payload = dict(payload)
+    if "assistant_message" in payload:
+        payload["assistant_message"] = f"{payload['assistant_message']} {tag}"
+    for key in ("activities", "draft_activities"):
+        if isinstance(payload.get(key), list):
+            payload[key] = [dict(a, title=f"{a.get('title', '')} {tag}") for a in payload[key]]
+    return payload
+
+
+def _activities(prefix: str, priority: str, count: int) -> list:
+    return [
+        {
+            "id": f"{prefix}-{i}",
+            "title": f"{priority} 준비 활동 {i}",
+            "description": "기간과 목표를 정해 꾸준히 진행하고 결과물을 포트폴리오로 정리",
+            "priority": priority,
+            "links": ["https://example.com/guide"],
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def _roadmap(ids: list) -> list:
+    year = datetime.date.today().year
+    return [
+        {"year": year + i, "h1": ids[i::4], "h2": ids[i + 2::4]}
+        for i in range(2)
+    ]
+
+
+def synthetic_payload(stage: str, body: dict) -> dict:
+    """요청 모양(단계/샤드 지시)에 맞는 합성 응답."""
+    prompt = _system_prompt(body)
+    if stage == "DISCOVERY":
+        return {
+            "assistant_message": "좋아요. 그 경험에서 가장 재미있었던 순간은 언제였나요? 구체적으로 알려 주세요.",
+            "discovery_summary": {
+                "interests": ["데이터 분석", "문제 해결"],
+                "strengths": ["꼼꼼함", "끈기"],
+                "values": ["성장"],
+                "constraints": ["주말만 가능"],
+            },
+            "next_action": "ASK_MORE",
+        }
+    if stage == "DESIGN":
+        return {
+            "assistant_message": "지금까지 이야기를 바탕으로 세 가지 방향을 정리했어요. 어떤 점을 더 다듬어 볼까요?",
+            "career_options": [
+                {
+                    "title": f"진로 옵션 {i}",
+                    "fit_reason": "관심사와 강점이 잘 맞음",
+                    "risk": "진입 경쟁이 치열함",
+                    "outlook": "수요가 꾸준히 늘어나는 분야",
+                }
+                for i in range(1, 4)
+            ],
+            "recommended_direction": "데이터 분석 직무로 시작해 도메인 전문성을 쌓는 방향",
+            "draft_activities": _activities("a", "핵심", 2) + _activities("b", "권장", 2) + _activities("c", "선택", 2),
+            "next_action": "REFINE",
+        }
+    if stage == "final_plan":
+        return {
+            "assistant_message": "최종 계획을 정리했어요. 필요활동과 로드맵 탭에서 확인해 주세요.",
+            "career_plan": {
+                "direction": "데이터 분석가",
+                "strategy": ["기초 통계 다지기", "프로젝트 경험 쌓기"],
+                "short_term_goals": ["자격증 취득"],
+                "mid_term_goals": ["인턴십"],
+            },
+        }
+    if stage == "final_activities":
+        m = _ACTIVITY_SHARD_RE.search(prompt)
+        priority, count = (m.group(1), int(m.group(2))) if m else ("권장", 4)
+        prefix = ((body.get("text") or {}).get("format") or {}).get("name", "").rsplit("_", 1)[-1] or "act"
+        return {"activities": _activities(prefix, priority, count)}
+    if stage == "final_roadmap":
+        listed = prompt.split("활동 목록:", 1)[-1].split("출력은", 1)[0]
+        try:
+            ids = [a["id"] for a in json.loads(listed)]
+        except (ValueError, TypeError, KeyError):
+            ids = []
+        return {"roadmap": _roadmap(ids)}
+    if stage == "final_patch":
+        # 활동 하나 추가 + 첫 활동을 마지막 해 상반기로 이동(빈 값 = 그대로)
+        state = _state_context(body)
+        acts, roadmap = state.get("activities") or [], state.get("roadmap") or []
+        year = roadmap[-1]["year"] if roadmap else datetime.date.today().year
+        blank = {"title": "", "description": "", "priority": "", "links": []}
+        ops = [{
+            "op": "add",
+            "id": f"p-{uuid.uuid4().hex[:6]}",
+            "title": f"하반기 인턴십 지원 {uuid.uuid4().hex[:4]}",
+            "description": "지원 공고를 정리하고 포트폴리오를 맞춰 제출",
+            "priority": "권장",
+            "links": ["https://example.com/intern"],
+            "year": year,
+            "half": "h2",
+        }]
+        if acts:
+            ops.append({"op": "move", "id": acts[0]["id"], **blank, "year": year, "half": "h1"})
+        return {"assistant_message": "요청하신 대로 인턴십을 추가하고 일정을 조정했어요.", "operations": ops}
+    activities = [a for i, p in enumerate(PRIORITIES) for a in _activities(f"f{i}", p, 4)]
+    return {
+        "assistant_message": "최종 계획을 정리했어요.",
+        "career_plan": {"direction": "데이터 분석가", "strategy": [], "short_term_goals": [], "mid_term_goals": []},
+        "activities": activities,
+        "roadmap": _roadmap([a["id"] for a in activities]),
+    }
+
+
+class PayloadSource:
+    """녹화 응답이 있으면 단계별로 순환 재생, 없으면 합성."""
+
+    def __init__(self, recorded_path=None):
+        self._recorded = {}
+        self._lock = threading.Lock()
+        if recorded_path:
+            by_stage = {}
+            with open(recorded_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        by_stage.setdefault(row["stage"], []).append(row["payload"])
+            self._recorded = {k: itertools.cycle(v) for k, v in by_stage.items()}
+
+    def get(self, stage: str, body: dict) -> dict:
+        with self._lock:
+            it = self._recorded.get(stage)
+            if it is not None:
+                return next(it)
+        return synthetic_payload(stage, body)
+
+
+def _response_object(rid: str, body: dict, text: str, status: str) -> dict:
+    input_chars = len(json.dumps(body.get("input") or [], ensure_ascii=False))
+    return {
+        "id": rid,
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": body.get("model"),
+        "status": status,
+        "error": None,
+        "output": [
+            {
+                "id": f"msg_{rid}",
+                "type": "message",
+                "role": "assistant",
+                "status": status,
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ]
+        if text
+        else [],
+        "usage": {
+            "input_tokens": input_chars // 4,
+            "output_tokens": len(text) // 4,
+            "total_tokens": input_chars // 4 + len(text) // 4,
+        },
+    }
+
+
+def make_handler(source: PayloadSource, latency: Latency, stats: dict, fail_models=()):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/responses"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            stage = _stage(body)
+            model = body.get("model") or ""
+            with stats["lock"]:
+                stats["requests"] += 1
+                stats["by_stage"][stage] = stats["by_stage"].get(stage, 0) + 1
+                stats["by_model"][model] = stats["by_model"].get(model, 0) + 1
+            if model in fail_models:
+                self._error(503, f"{model} 과부하(가짜)")
+                return
+            text = json.dumps(_echo_user_tag(source.get(stage, body), body), ensure_ascii=False)
+            rid = f"resp_{uuid.uuid4().hex[:16]}"
+            time.sleep(latency.ttft)
+            if body.get("stream"):
+                self._stream(rid, body, text)
+            else:
+                time.sleep(latency.chunk_delay * (len(text) // max(1, latency.chunk_chars)))
+                self._json(_response_object(rid, body, text, "completed"))
+
+        def _error(self, status: int, message: str):
+            self._json({"error": {"message": message, "type": "server_error", "code": None}}, status)
+
+        def _json(self, obj: dict, status: int = 200):
+            data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, rid: str, body: dict, text: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            seq = itertools.count()
+
+            def send(etype: str, **fields):
+                event = {"type": etype, "sequence_number": next(seq), **fields}
+                payload = json.dumps(event, ensure_ascii=False)
+                self.wfile.write(f"event: {etype}\ndata: {payload}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            send("response.created", response=_response_object(rid, body, "", "in_progress"))
+            step = max(1, latency.chunk_chars)
+            for i in range(0, len(text), step):
+                if latency.chunk_delay:
+                    time.sleep(latency.chunk_delay)
+                send(
+                    "response.output_text.delta",
+                    item_id=f"msg_{rid}",
+                    output_index=0,
+                    content_index=0,
+                    delta=text[i : i + step],
+                    logprobs=[],
+                )
+            send("response.completed", response=_response_object(rid, body, text, "completed"))
+
+    return Handler
+
+
+def start_server(port: int = 0, latency: Latency | None = None, payloads=None, fail_models=()):
+    """백그라운드 스레드에서 서버 시작. 반환: (server, base_url, stats)."""
+    stats = {"requests": 0, "by_stage": {}, "by_model": {}, "lock": threading.Lock()}
+    handler = make_handler(PayloadSource(payloads), latency or Latency(), stats, frozenset(fail_models))
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1", stats
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--ttft", type=float, default=0.3, help="첫 토큰까지 지연(초)")
+    ap.add_argument("--chunk-delay", type=float, default=0.01, help="청크 사이 지연(초)")
+    ap.add_argument("--chunk-chars", type=int, default=24)
+    ap.add_argument("--payloads", help="녹화 응답 JSONL")
+    ap.add_argument("--fail-model", action="append", default=[], help="이 모델 요청은 503(여러 번 줄 수 있음)")
+    args = ap.parse_args()
+
+    server, base_url, stats = start_server(
+        args.port, Latency(args.ttft, args.chunk_delay, args.chunk_chars), args.payloads, args.fail_model
+    )
+    print(f"가짜 Responses 엔드포인트: {base_url}  (앱: OPENAI_BASE_URL={base_url})")
+    try:
+        while True:
+            time.sleep(5)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"요청 {stats['requests']}건: {stats['by_stage']} {stats['by_model']}")
+
+
+if __name__ == "__main__":
+    main()
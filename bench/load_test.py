@@ -0,0 +1,283 @@
+# bench/load_test.py
+# 다중 세션 부하 테스트: 실행 중인 Streamlit 서버에 가상 사용자 N명이 동시에 상담(DISCOVERY→DESIGN→FINAL)을 진행
+# 실행: python bench/load_test.py [--users 20] [--think 0.5] [--ttft 0.3] [--chunk-delay 0.01]
+#       (가짜 Responses 서버와 `streamlit run app.py`를 임시 디렉터리에서 직접 띄운다)
+#       python bench/load_test.py --url http://127.0.0.1:8501 --db /앱/작업/디렉터리/.jinsul_state.db
+#       (이미 OPENAI_BASE_URL=가짜 서버로 떠 있는 앱에 붙는 경우. bench/fake_openai.py 참고)
+# 필요: pip install websockets
+#
+# 가상 사용자는 브라우저처럼 /_stcore/stream 웹소켓으로 BackMsg(rerun_script)를 보내고
+# 스크립트 실행이 끝날 때(script_finished)까지 ForwardMsg를 읽는다. 채팅 입력은 fragment 재실행으로 보낸다.
+# 보고: 처리량(턴/초), 턴 지연 p50/p95/p99(단계별), 오류율, 상태 격리 검사
+#   - 저장소(SQLite)의 각 세션 messages가 그 사용자가 보낸 입력과 답만으로 이뤄졌는지
+#   - activities 제목에 다른 사용자 태그가 섞이지 않았는지(가짜 서버가 입력의 [user:태그]를 응답에 되돌려 줌)
+#   - 마지막 화면(transcript)에 다른 사용자 태그가 보이지 않는지
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+APP_PATH = BENCH_DIR.parent / "app.py"
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from fake_openai import Latency, start_server  # noqa: E402
+from storage import SessionStore  # noqa: E402
+from telemetry import percentile as pct  # noqa: E402
+from streamlit.proto.BackMsg_pb2 import BackMsg  # noqa: E402
+from streamlit.proto.ClientState_pb2 import ClientState  # noqa: E402
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg  # noqa: E402
+from streamlit.proto.WidgetStates_pb2 import WidgetState, WidgetStates  # noqa: E402
+
+try:
+    import websockets
+except ImportError:  # pragma: no cover - 부하 테스트 전용 의존성
+    sys.exit("websockets 패키지가 필요합니다: pip install websockets")
+
+SCRIPT = (
+    "요즘 데이터 분석 공부를 혼자 하고 있어요.",
+    "숫자로 문제를 풀 때 제일 재미있어요.",
+    "사람들 앞에서 발표하는 건 조금 부담스러워요.",
+    "평일엔 바쁘고 주말에만 시간이 나요.",
+    "두 번째 옵션을 조금 더 자세히 알고 싶어요.",
+    "이대로 진행해",
+    "로드맵을 조금 더 여유 있게 잡아 주세요.",
+    "2027 하반기에 인턴 하나 더 넣어줘",
+)
+# 입력 n번째 턴이 처리되는 단계(DISCOVERY 4턴 후 자동 전환, "이대로 진행해"는 같은 턴에 FINAL 생성,
+# 이후 수정은 패치 모드)
+STAGES = ("DISCOVERY",) * 4 + ("DESIGN", "FINAL") + ("FINAL_PATCH",) * 2
+API_KEY_LABEL = "OpenAI API Key"
+_TAG_RE = re.compile(r"\[user:([\w-]+)\]")
+
+_FINISHED = {
+    ForwardMsg.FINISHED_SUCCESSFULLY,
+    ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+    ForwardMsg.FINISHED_WITH_COMPILE_ERROR,
+}
+
+
+class StreamlitSession:
+    """웹소켓 하나 = 브라우저 탭 하나."""
+
+    def __init__(self, ws, query_string: str):
+        self.ws = ws
+        self.query_string = query_string
+        self.widgets = {}  # 이름 -> (widget id, fragment id)
+        self.markdown = []
+        self.errors = []
+
+    async def rerun(self, widget_states=(), fragment_id: str = "", timeout: float = 120.0):
+        """rerun_script를 보내고 (st.rerun 연쇄를 포함해) 실행이 끝날 때까지 메시지를 읽는다."""
+        states = WidgetStates(widgets=list(widget_states))
+        client_state = ClientState(query_string=self.query_string, widget_states=states, fragment_id=fragment_id)
+        await self.ws.send(BackMsg(rerun_script=client_state).SerializeToString())
+        self.markdown = []
+        self.errors = []
+        async with asyncio.timeout(timeout):
+            while True:
+                msg = ForwardMsg()
+                msg.ParseFromString(await self.ws.recv())
+                kind = msg.WhichOneof("type")
+                if kind == "delta":
+                    self._on_delta(msg.delta)
+                elif kind == "script_finished" and msg.script_finished in _FINISHED:
+                    return
+
+    def _on_delta(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        el = delta.new_element
+        kind = el.WhichOneof("type")
+        if kind == "text_input" and el.text_input.label == API_KEY_LABEL:
+            self.widgets["api_key"] = (el.text_input.id, delta.fragment_id)
+        elif kind == "chat_input":
+            self.widgets["chat"] = (el.chat_input.id, delta.fragment_id)
+        elif kind == "markdown":
+            self.markdown.append(el.markdown.body)
+        elif kind == "exception":
+            self.errors.append(el.exception.message)
+        elif kind == "alert" and el.alert.format == el.alert.ERROR:
+            self.errors.append(el.alert.body)
+
+
+async def run_user(ws_url: str, index: int, run_id: str, think: float, timeout: float) -> dict:
+    tag = f"{run_id}-{index}"
+    sid = f"load{run_id}{index:04d}"
+    result = {"sid": sid, "tag": tag, "sent": [], "turns": [], "errors": [], "transcript": ""}
+    try:
+        async with websockets.connect(ws_url, subprotocols=["streamlit"], max_size=None, open_timeout=timeout) as ws:
+            sess = StreamlitSession(ws, f"sid={sid}")
+            await sess.rerun(timeout=timeout)
+            key_id, _ = sess.widgets["api_key"]
+            api_key = WidgetState(id=key_id, string_value=f"sk-load-{index}")
+            await sess.rerun([api_key], timeout=timeout)
+            for i, text in enumerate(SCRIPT):
+                text = f"{text} [user:{tag}]"
+                chat_id, fragment_id = sess.widgets["chat"]
+                chat = WidgetState(id=chat_id)
+                chat.chat_input_value.data = text
+                start = time.perf_counter()
+                await sess.rerun([api_key, chat], fragment_id=fragment_id, timeout=timeout)
+                ms = (time.perf_counter() - start) * 1000
+                result["turns"].append({"stage": STAGES[i], "ms": ms, "ok": not sess.errors})
+                result["errors"].extend(sess.errors)
+                if not sess.errors:
+                    result["sent"].append(text)
+                if think:
+                    await asyncio.sleep(think)
+            result["transcript"] = "\n".join(sess.markdown)
+    except Exception as e:
+        result["errors"].append(f"{type(e).__name__}: {e}")
+    return result
+
+
+def check_isolation(store: SessionStore, result: dict) -> list:
+    """한 사용자 세션의 저장 상태/화면에 다른 사용자 것이 섞였는지."""
+    problems = []
+    data = store.load(result["sid"])
+    messages = data.get("messages") or []
+    users = [m.get("content") for m in messages if m.get("role") == "user"]
+    if users != result["sent"]:
+        problems.append(f"messages(user) 불일치: 저장 {len(users)}개 / 보냄 {len(result['sent'])}개")
+    if len(messages) != 2 * len(users):
+        problems.append(f"답 없는 메시지: 전체 {len(messages)}개, 사용자 {len(users)}개")
+    for m in messages:
+        foreign = {t for t in _TAG_RE.findall(str(m.get("content"))) if t != result["tag"]}
+        if foreign:
+            problems.append(f"다른 사용자 메시지: {sorted(foreign)}")
+    for a in data.get("activities") or []:
+        foreign = {t for t in _TAG_RE.findall(str(a.get("title"))) if t != result["tag"]}
+        if foreign:
+            problems.append(f"다른 사용자 활동: {a.get('title')}")
+    foreign = {t for t in _TAG_RE.findall(result["transcript"]) if t != result["tag"]}
+    if foreign:
+        problems.append(f"화면에 다른 사용자 태그: {sorted(foreign)}")
+    return problems
+
+
+def report(results: list, elapsed: float, store: SessionStore) -> bool:
+    turns = [t for r in results for t in r["turns"]]
+    ok = [t for t in turns if t["ok"]]
+    failed_users = [r for r in results if r["errors"]]
+    print(f"사용자 {len(results)}명, 턴 {len(turns)}개, 경과 {elapsed:.1f}초")
+    print(f"처리량: {len(ok) / elapsed:.2f} 턴/초, 완료 상담 {len(results) - len(failed_users)}건")
+    # 첫 턴도 못 보낸 사용자(접속 실패 등)는 실패한 턴 하나로 센다
+    attempted = len(turns) + sum(1 for r in results if not r["turns"])
+    print(f"오류율: {1 - len(ok) / max(1, attempted):.1%}")
+    print(f"{'단계':<10}{'턴':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for stage in (*dict.fromkeys(STAGES), "전체"):
+        ms = [t["ms"] for t in ok if stage == "전체" or t["stage"] == stage]
+        if ms:
+            print(
+                f"{stage:<10}{len(ms):>6}{pct(ms, 0.5):>10,.0f}{pct(ms, 0.95):>10,.0f}"
+                f"{pct(ms, 0.99):>10,.0f}{max(ms):>10,.0f}"
+            )
+    if ok:
+        print(f"평균 {statistics.mean(t['ms'] for t in ok):,.0f}ms")
+
+    corrupted = 0
+    for r in results:
+        problems = check_isolation(store, r)
+        if problems:
+            corrupted += 1
+            print(f"[격리 위반] {r['sid']}: {problems[:3]}")
+    for r in failed_users[:5]:
+        print(f"[오류] {r['sid']}: {r['errors'][:2]}")
+    print(f"상태 격리: {'통과' if not corrupted else f'위반 {corrupted}건'}")
+    return not corrupted and not failed_users
+
+
+def _wait_healthy(base_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/_stcore/health", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f"Streamlit 서버가 {timeout:.0f}초 안에 뜨지 않음: {base_url}")
+
+
+def start_app(port: int, llm_base_url: str, workdir: Path) -> subprocess.Popen:
+    env = dict(os.environ, OPENAI_BASE_URL=llm_base_url)
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", str(APP_PATH),
+        "--server.headless=true",
+        f"--server.port={port}",
+        "--server.fileWatcherType=none",
+        "--browser.gatherUsageStats=false",
+    ]
+    return subprocess.Popen(cmd, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def run_load(ws_url: str, users: int, ramp: float, think: float, timeout: float) -> list:
+    run_id = uuid.uuid4().hex[:6]
+
+    async def delayed(i):
+        await asyncio.sleep(ramp * i / max(1, users))
+        return await run_user(ws_url, i, run_id, think, timeout)
+
+    return await asyncio.gather(*(delayed(i) for i in range(users)))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--ramp", type=float, default=2.0, help="사용자 전원이 접속하기까지 걸리는 시간(초)")
+    ap.add_argument("--think", type=float, default=0.5, help="턴 사이 사용자 대기(초)")
+    ap.add_argument("--timeout", type=float, default=120.0, help="턴 하나의 최대 대기(초)")
+    ap.add_argument("--url", help="이미 떠 있는 앱 주소(없으면 직접 띄움)")
+    ap.add_argument("--db", help="--url을 쓸 때 앱의 상태 DB 경로(격리 검사용)")
+    ap.add_argument("--port", type=int, default=8599)
+    ap.add_argument("--ttft", type=float, default=0.3, help="가짜 서버 첫 토큰 지연(초)")
+    ap.add_argument("--chunk-delay", type=float, default=0.01, help="가짜 서버 청크 간 지연(초)")
+    args = ap.parse_args()
+
+    app_proc = None
+    fake = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+        if not args.db:
+            sys.exit("--url을 쓰면 --db(앱의 .jinsul_state.db 경로)도 필요합니다.")
+        db_path = Path(args.db)
+    else:
+        fake, llm_base_url, fake_stats = start_server(latency=Latency(args.ttft, args.chunk_delay))
+        workdir = Path(tempfile.mkdtemp(prefix="jinsul-load-"))
+        app_proc = start_app(args.port, llm_base_url, workdir)
+        base_url = f"http://127.0.0.1:{args.port}"
+        db_path = workdir / ".jinsul_state.db"
+
+    try:
+        _wait_healthy(base_url, 60)
+        ws_url = base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        start = time.perf_counter()
+        results = asyncio.run(run_load(ws_url, args.users, args.ramp, args.think, args.timeout))
+        elapsed = time.perf_counter() - start
+    finally:
+        if app_proc:
+            app_proc.terminate()
+            app_proc.wait(timeout=10)
+        if fake:
+            fake.shutdown()
+
+    if fake:
+        print(f"가짜 서버 요청 {fake_stats['requests']}건 {fake_stats['by_stage']}")
+    passed = report(results, elapsed, SessionStore(db_path))
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
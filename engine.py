@@ -0,0 +1,526 @@
+# engine.py
+# 상담 진행 엔진(UI 비의존): 단계 기계(DISCOVERY → DESIGN → FINAL), 프롬프트 선택, 모델 입력 조립, 응답 반영
+# - 상태는 속성으로 읽고 쓰는 평범한 객체: ConsultationState(배치 CLI) 또는 st.session_state(앱)
+# - 모델 호출은 하지 않는다: begin_turn()으로 이번 턴의 호출 모드/프롬프트를 정하고,
+#   호출 결과(dict)를 apply_response()로 반영한다. 호출을 함수로 넘기면 turn()이 한 턴을 끝까지 진행
+# - 확정/초기화/로드맵 보기는 모델 없이 처리(intent_router.py)
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+
+from intent_router import CONFIRM, RESET, SHOW_ROADMAP, roadmap_markdown
+from intent_router import route as route_intent
+from model_output import apply_patch, parse_activities, parse_roadmap, resolve_roadmap
+
+# Discovery가 너무 길어지지 않도록: 유저 발화 N회 이후 자동 설계 단계로 전환
+MAX_DISCOVERY_TURNS = 4
+
+# 모델에 보내는 컨텍스트: 최근 N개 메시지 원문 + 정리된 상태, 대략적인 토큰 예산
+CONTEXT_MAX_MESSAGES = 6
+CONTEXT_TOKEN_BUDGET = 4000
+
+# DESIGN 초안 참조 목록(ref_catalog)의 종류(options/activities)별 최대 항목 수.
+# 넘으면 가장 오래 안 보인 참조부터 버린다(그 참조만 가진 오래된 메시지는 초안 부록 없이 본문만 보인다)
+REF_CATALOG_MAX = 200
+
+# 모델이 확정 신호를 주지 않아도 DESIGN 응답 뒤 FINAL로 넘어가는 사용자 발화(문장 안 어디든)
+_CONFIRM_RE = re.compile(r"(이대로\s*(진행|가자)|확정|최종|결정|진행해|이대로\s*좋아|좋아요|좋아|오케이|ok|go)", re.IGNORECASE)
+
+# ======================
+# Prompt Templates
+# ======================
+
+DISCOVERY_PROMPT = """
+너는 전문 진로 컨설턴트다.
+현재 단계는 [대화 단계]다.
+
+목표:
+- 사용자의 관심사, 강점, 가치관, 선호 환경, 제약 조건을 파악한다.
+- 질문을 통해 정보를 수집한다.
+
+규칙:
+- 진로 계획, 활동 목록, 로드맵을 만들지 마라.
+- 해결책을 제시하지 말고 질문하거나 요약만 한다.
+- 한 번에 질문은 최대 3개까지만 한다.
+- 사용자가 3~4번 정도 응답하면, 불확실점이 남아도 가설 기반으로 설계 단계로 넘어갈 준비를 한다.
+
+출력은 반드시 JSON 한 덩어리로만 한다.
+{
+  "assistant_message": "사용자에게 보여줄 말(질문/요약)",
+  "discovery_summary": {
+    "interests": [],
+    "strengths": [],
+    "values": [],
+    "constraints": [],
+    "uncertain_points": []
+  },
+  "next_action": "ASK_MORE | READY_FOR_DESIGN"
+}
+"""
+
+DESIGN_PROMPT = """
+너는 전문 진로 컨설턴트다.
+현재 단계는 [설계 단계]다.
+
+입력으로는 이미 정리된 사용자 정보와 직전 대화가 주어진다.
+
+목표:
+- 사용자에게 맞는 진로 방향 초안을 설계한다.
+- 대화 중간이라도 초안을 제시하고, 사용자의 선택/수정을 유도한다.
+
+규칙:
+- 아직 최종 결정처럼 말하지 마라.
+- 로드맵 배치는 하지 마라.
+- 활동은 '초안'이며, 사용자가 수정 가능하다는 톤으로 제시한다.
+
+출력은 반드시 JSON 한 덩어리로만 한다.
+{
+  "assistant_message": "설계 결과 설명(초안 제시 + 확인 질문)",
+  "career_options": [
+    {
+      "title": "진로 옵션",
+      "fit_reason": "적합 이유",
+      "risk": "리스크",
+      "outlook": "전망"
+    }
+  ],
+  "recommended_direction": "가장 유력한 방향(초안)",
+  "draft_activities": [
+    {
+      "id": "string",
+      "title": "활동",
+      "description": "내용",
+      "priority": "핵심|권장|선택"
+    }
+  ],
+  "next_action": "REFINE | READY_FOR_FINAL"
+}
+"""
+
+FINAL_PROMPT = """
+너는 전문 진로 컨설턴트다.
+현재 단계는 [확정 단계]다.
+
+목표:
+- 실행 가능한 진로 계획을 완성한다.
+
+규칙:
+- 활동은 중복 없이 최소 10개 이상.
+- 로드맵은 연도별 상/하반기로 나눈다.
+- roadmap.h1/h2에는 activities의 id를 넣는다.
+
+출력은 반드시 JSON 한 덩어리로만 한다.
+{
+  "assistant_message": "최종 요약 메시지",
+  "career_plan": {
+    "direction": "진로 방향",
+    "strategy": [],
+    "short_term_goals": [],
+    "mid_term_goals": []
+  },
+  "activities": [
+    {
+      "id": "string",
+      "title": "활동",
+      "description": "내용",
+      "priority": "핵심|권장|선택",
+      "links": []
+    }
+  ],
+  "roadmap": [
+    {
+      "year": 2026,
+      "h1": [],
+      "h2": []
+    }
+  ]
+}
+"""
+
+FINAL_PATCH_PROMPT = """
+너는 전문 진로 컨설턴트다.
+현재 단계는 [확정 단계]의 수정 요청이다. 최종 계획은 이미 완성되어 있다.
+
+목표:
+- 사용자가 요청한 만큼만 계획을 고친다. 계획/활동/로드맵 전체를 다시 쓰지 않는다.
+
+규칙:
+- [지금까지 정리된 사용자 정보]의 activities(id/제목/우선순위)와 roadmap(연도별 h1=상반기, h2=하반기 활동 id)이 현재 계획이다.
+- 바꿀 부분만 operations로 낸다. 바꿀 것이 없으면 operations는 [].
+- add: 새 활동. 기존과 겹치지 않는 id, title/description/priority/links를 채우고 배치할 year/half를 준다.
+- update: 기존 활동(id)에서 바꿀 필드만 채운다. 그대로 둘 문자열은 "", links는 [].
+- remove: 기존 활동(id)을 지운다.
+- move: 기존 활동(id)을 year/half로 옮긴다.
+- 배치를 바꾸지 않으면 year는 0, half는 "".
+
+출력은 반드시 JSON 한 덩어리로만 한다.
+{
+  "assistant_message": "무엇을 바꿨는지 짧게",
+  "operations": [
+    {
+      "op": "add|update|remove|move",
+      "id": "string",
+      "title": "",
+      "description": "",
+      "priority": "핵심|권장|선택|",
+      "links": [],
+      "year": 0,
+      "half": "h1|h2|"
+    }
+  ]
+}
+"""
+
+FINAL_FOOTER = "\n\n---\n✅ **필요활동**과 **로드맵**을 업데이트했어요. 위 탭에서 바로 확인할 수 있어요."
+
+STAGE_PROMPTS = {
+    "DISCOVERY": DISCOVERY_PROMPT,
+    "DESIGN": DESIGN_PROMPT,
+    "FINAL": FINAL_PROMPT,
+    "FINAL_PATCH": FINAL_PATCH_PROMPT,
+}
+
+# ======================
+# Context
+# ======================
+
+# 이전 형식 메시지(부록이 본문에 붙어 저장됨)에서 표시용 부분의 시작 표식(모델에는 보내지 않음)
+_APPENDIX_MARKERS = (
+    "**초안(진로 옵션)**",
+    "**현재 가장 유력한 방향(초안):**",
+    "**초안(필요활동 TOP 6)**",
+    FINAL_FOOTER.strip(),
+)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def strip_presentation(text: str) -> str:
+    """채팅 표시용 부록(초안 목록/완료 안내)과 HTML 배지를 걷어낸 본문만 남긴다."""
+    text = text or ""
+    cut = min((i for i in (text.find(m) for m in _APPENDIX_MARKERS) if i >= 0), default=-1)
+    if cut >= 0:
+        text = text[:cut].rstrip().removesuffix("---")
+    return _HTML_TAG_RE.sub("", text).strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """대략적인 토큰 수(ASCII는 4글자당 1, 한글 등은 글자당 1)."""
+    text = text or ""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def _compact_state(stage: str, state) -> dict:
+    """이미 추출된 상태를 단계에 필요한 만큼만 간결하게."""
+    ctx = {}
+    if state.get("discovery"):
+        ctx["discovery"] = state.get("discovery")
+    if stage in ("DESIGN", "FINAL"):
+        options = [
+            {k: o.get(k) for k in ("title", "fit_reason", "risk") if o.get(k)}
+            for o in (state.get("career_options") or [])
+            if isinstance(o, dict)
+        ]
+        if options:
+            ctx["career_options"] = options
+        if state.get("recommended_direction"):
+            ctx["recommended_direction"] = state.get("recommended_direction")
+        acts = [
+            {"id": a.id, "title": a.title, "priority": a.priority}
+            for a in (state.get("activities") or [])
+        ]
+        if acts:
+            ctx["activities"] = acts
+    if stage == "FINAL" and state.get("roadmap"):
+        # 수정 요청(패치 모드)이 기존 배치를 보고 옮길 수 있게
+        ctx["roadmap"] = [r.to_dict() for r in state.get("roadmap")]
+    return ctx
+
+
+def build_context(stage: str, state, messages, max_messages=CONTEXT_MAX_MESSAGES, budget=CONTEXT_TOKEN_BUDGET):
+    """모델 입력 메시지 조립: 정리된 상태(JSON) + 최근 메시지(표시용 HTML 제거), 토큰 예산 내.
+
+    반환: (input_messages, stats) — stats는 full/sent/saved 토큰 추정치.
+    """
+    full_tokens = sum(estimate_tokens(m.get("content")) for m in messages)
+
+    ctx = _compact_state(stage, state)
+    head = []
+    if ctx:
+        head.append({
+            "role": "system",
+            "content": "[지금까지 정리된 사용자 정보]\n" + json.dumps(ctx, ensure_ascii=False, separators=(",", ":")),
+        })
+
+    recent = [
+        {"role": m["role"], "content": m["content"] if "stage" in m else strip_presentation(m.get("content"))}
+        for m in messages[-max_messages:]
+        if m.get("stage") != "LOCAL"  # 라우터가 로컬에서 만든 답(로드맵 요약 등)은 모델에 보내지 않음
+    ]
+    used = sum(estimate_tokens(m["content"]) for m in head + recent)
+    # 예산 초과 시 오래된 메시지부터 버림(마지막 사용자 메시지는 유지)
+    while len(recent) > 1 and used > budget:
+        used -= estimate_tokens(recent.pop(0)["content"])
+
+    stats = {"full": full_tokens, "sent": used, "saved": max(0, full_tokens - used)}
+    return head + recent, stats
+
+
+# ======================
+# Design refs
+# ======================
+
+def content_hash(*parts) -> str:
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def _ref_key(*parts) -> str:
+    return content_hash(*parts)[:12]
+
+
+def _touch_ref(table: dict, key: str, value: dict, max_entries: int):
+    """참조를 넣거나 끝으로 옮기고(dict 순서 = 최근 사용 순), max_entries를 넘는 오래된 것은 버린다."""
+    table[key] = table.pop(key, value)
+    while len(table) > max_entries:
+        del table[next(iter(table))]
+
+
+def design_refs(
+    catalog: dict, career_options, recommended_direction, draft_activities, max_entries=REF_CATALOG_MAX
+) -> dict:
+    """DESIGN 응답이 보여 준 초안을 ref_catalog에 한 번만 넣고, 메시지에 붙일 참조만 반환.
+
+    같은 옵션/활동은 여러 턴에 걸쳐 반복되므로 키는 내용 해시(불변)로 잡는다.
+    catalog는 종류별로 max_entries개까지만 두고 가장 오래 안 보인 참조부터 버린다(LRU).
+    """
+    refs = {}
+    options = []
+    if isinstance(career_options, list):
+        for opt in career_options[:3]:
+            if not isinstance(opt, dict):
+                continue
+            opt = {k: opt.get(k, "") for k in ("title", "fit_reason", "risk", "outlook")}
+            key = _ref_key(*opt.values())
+            _touch_ref(catalog["options"], key, opt, max_entries)
+            options.append(key)
+    if options:
+        refs["options"] = options
+    if recommended_direction:
+        refs["direction"] = recommended_direction
+    acts = []
+    for a in draft_activities[:6]:
+        key = _ref_key(a.id, a.title, a.priority)
+        _touch_ref(catalog["activities"], key, {"id": a.id, "title": a.title, "priority": a.priority}, max_entries)
+        acts.append(key)
+    if acts:
+        refs["activities"] = acts
+    return refs
+
+def design_shown(state) -> bool:
+    """DESIGN 응답(진로 옵션 초안)이 사용자에게 한 번이라도 나갔는지."""
+    return bool(state.get("career_options")) or any(m.get("stage") == "DESIGN" for m in state.messages)
+
+
+# ======================
+# State machine
+# ======================
+
+@dataclass
+class ConsultationState:
+    """UI 없이 쓰는 상담 상태. 필드 이름은 앱의 st.session_state 키와 같다(엔진은 둘 다 받는다)."""
+
+    stage: str = "DISCOVERY"
+    messages: list = field(default_factory=list)
+    discovery: dict = field(default_factory=dict)
+    discovery_turns: int = 0
+    career_options: list = field(default_factory=list)
+    recommended_direction: str = ""
+    career_plan: dict = field(default_factory=dict)
+    activities: list = field(default_factory=list)  # Activity
+    roadmap: list = field(default_factory=list)  # RoadmapEntry
+    activity_status: dict = field(default_factory=dict)
+    ref_catalog: dict = field(default_factory=lambda: {"options": {}, "activities": {}})
+
+    def get(self, key, default=None):
+        """st.session_state.get과 같은 모양(_compact_state가 둘 다 받게)."""
+        return getattr(self, key, default)
+
+    def reset(self):
+        for k, v in vars(ConsultationState()).items():
+            setattr(self, k, v)
+
+    def plan(self) -> dict:
+        """최종 산출물(배치 출력용): 방향, 계획, 활동, 로드맵."""
+        return {
+            "stage": self.stage,
+            "recommended_direction": self.recommended_direction,
+            "career_plan": self.career_plan,
+            "activities": [a.to_dict() for a in self.activities],
+            "roadmap": [r.to_dict() for r in self.roadmap],
+        }
+
+
+@dataclass(slots=True)
+class TurnPlan:
+    """begin_turn 결과: 이번 턴을 어떻게 처리할지."""
+
+    user_input: str
+    prev_stage: str  # 입력을 받기 전 단계(실패 시 되돌릴 값)
+    stage: str  # 이번 턴이 처리되는 단계(확정 의도면 이미 FINAL)
+    mode: str | None  # 모델 호출 모드(DISCOVERY/DESIGN/FINAL/FINAL_PATCH). 로컬 처리면 None
+    prompt: str | None
+    intent: str | None = None  # 로컬에서 판별한 의도(intent_router)
+    record: dict | None = None  # 이번 턴에 기록된 assistant 메시지
+
+
+class ConsultationEngine:
+    """단계 기계. 상태 객체를 받아 제자리에서 바꾼다(엔진 자체는 설정만 갖고 있어 공유해도 된다)."""
+
+    def __init__(
+        self,
+        local_intents: bool = True,
+        patch_mode: bool = True,
+        max_discovery_turns: int = MAX_DISCOVERY_TURNS,
+        context_max_messages: int = CONTEXT_MAX_MESSAGES,
+        context_token_budget: int = CONTEXT_TOKEN_BUDGET,
+    ):
+        self.local_intents = local_intents
+        self.patch_mode = patch_mode
+        self.max_discovery_turns = max_discovery_turns
+        self.context_max_messages = context_max_messages
+        self.context_token_budget = context_token_budget
+
+    def begin_turn(self, state, user_input: str) -> TurnPlan:
+        """사용자 입력을 기록하고 이번 턴의 호출 모드/프롬프트를 정한다.
+
+        로드맵 보기는 여기서 답까지 기록하고(mode None), 초기화는 호출한 쪽이 처리한다(mode None).
+        """
+        prev_stage = state.stage
+        state.messages.append({"role": "user", "content": user_input})
+
+        # 모델 호출 전 로컬 의도 판별: 결과가 정해진 입력은 API를 부르지 않는다
+        intent = route_intent(state.stage, user_input) if self.local_intents else None
+        if intent == CONFIRM and not design_shown(state):
+            # 초안을 아직 못 봤으면 확정이 아니라 설계 요청: 평소(또는 미리 만든) DESIGN 응답으로
+            intent = None
+        if intent in (RESET, SHOW_ROADMAP):
+            plan = TurnPlan(user_input, prev_stage, state.stage, None, None, intent)
+            if intent == SHOW_ROADMAP:
+                plan.record = {
+                    "role": "assistant",
+                    "content": roadmap_markdown(state.roadmap, state.activities),
+                    "stage": "LOCAL",
+                }
+                state.messages.append(plan.record)
+            return plan
+        if intent == CONFIRM:
+            # DESIGN 응답 없이 같은 턴에 바로 FINAL 생성
+            state.stage = "FINAL"
+
+        # discovery 길이 제한을 위한 카운트
+        if state.stage == "DISCOVERY":
+            state.discovery_turns += 1
+
+        # 최종 계획이 이미 있으면 수정 요청은 패치 모드(바뀐 부분만 생성)
+        mode = state.stage
+        if mode == "FINAL" and self.patch_mode and state.roadmap:
+            mode = "FINAL_PATCH"
+        return TurnPlan(user_input, prev_stage, state.stage, mode, STAGE_PROMPTS[mode], intent)
+
+    def context(self, state, stage: str, messages=None):
+        """stage 호출용 모델 입력(정리된 상태 + 최근 메시지, 토큰 예산 내)과 토큰 통계."""
+        return build_context(
+            stage,
+            state,
+            state.messages if messages is None else messages,
+            self.context_max_messages,
+            self.context_token_budget,
+        )
+
+    def rollback(self, state, plan: TurnPlan):
+        """호출이 실패한 턴을 되돌린다(답 없는 사용자 메시지/라우터가 넘긴 단계/discovery 카운트)."""
+        state.messages.pop()
+        state.stage = plan.prev_stage
+        if plan.stage == "DISCOVERY":
+            state.discovery_turns -= 1
+
+    def apply_response(self, state, plan: TurnPlan, data: dict) -> dict:
+        """모델 응답을 상태에 반영하고 기록한 assistant 메시지를 반환.
+
+        메시지에는 본문과 참조만 저장하고 부록(DESIGN 초안)/완료 안내(FINAL)는 표시할 때 조립한다.
+        """
+        record = {
+            "role": "assistant",
+            "content": (data.get("assistant_message") or "").strip(),
+            "stage": plan.stage,
+        }
+        if plan.mode == "FINAL_PATCH":
+            patch = apply_patch(state.activities, state.roadmap, data.get("operations"))
+            record["changes"] = patch.applied
+            if patch.rejected:
+                record["rejected"] = patch.rejected
+            state.activities = patch.activities
+            state.roadmap = patch.roadmap
+            # id가 그대로라 완료 표시/메모는 남고, 지운 활동 것만 정리
+            for aid in patch.removed:
+                state.activity_status.pop(aid, None)
+
+        elif plan.stage == "FINAL":
+            # 수집 시점에 한 번 검증 + 로드맵 키를 정식 id로(렌더링은 id 조회만)
+            activities = parse_activities(data.get("activities", state.activities))
+            roadmap, unresolved, fuzzy = resolve_roadmap(
+                parse_roadmap(data.get("roadmap", state.roadmap)), activities
+            )
+            if unresolved:
+                record["unresolved"] = unresolved
+            if fuzzy:
+                record["fuzzy"] = fuzzy
+            state.career_plan = data.get("career_plan", state.career_plan)
+            state.activities = activities
+            state.roadmap = roadmap
+
+        elif plan.stage == "DISCOVERY":
+            state.discovery = data.get("discovery_summary", state.discovery)
+            if data.get("next_action") == "READY_FOR_DESIGN" or state.discovery_turns >= self.max_discovery_turns:
+                state.stage = "DESIGN"
+
+        elif plan.stage == "DESIGN":
+            drafts = parse_activities(data.get("draft_activities", state.activities))
+            record.update(design_refs(
+                state.ref_catalog,
+                data.get("career_options", []),
+                data.get("recommended_direction", ""),
+                drafts if "draft_activities" in data else [],
+            ))
+            state.career_options = data.get("career_options", state.career_options)
+            state.recommended_direction = data.get("recommended_direction", state.recommended_direction)
+            state.activities = drafts
+            # ✅ DESIGN → FINAL 전환 조건: 모델 신호 + 사용자 확정 발화(예: "이대로 진행해")
+            if data.get("next_action") == "READY_FOR_FINAL" or _CONFIRM_RE.search(plan.user_input or ""):
+                state.stage = "FINAL"
+
+        state.messages.append(record)
+        plan.record = record
+        return record
+
+    def turn(self, state, user_input: str, call) -> TurnPlan:
+        """UI 없이 한 턴을 끝까지: begin_turn → call(plan, context) → apply_response.
+
+        call이 예외를 내면 턴을 되돌리고 그대로 올린다. 초기화 요청은 상태를 비운다.
+        """
+        plan = self.begin_turn(state, user_input)
+        if plan.intent == RESET:
+            state.reset()
+            return plan
+        if plan.mode is None:
+            return plan
+        context, _ = self.context(state, plan.stage)
+        try:
+            data = call(plan, context)
+        except BaseException:
+            self.rollback(state, plan)
+            raise
+        self.apply_response(state, plan, data)
+        return plan
@@ -0,0 +1,304 @@
+# final_engine.py
+# FINAL 단계 병렬 생성: 한 번의 큰 JSON 대신 여러 요청을 동시에 보낸 뒤 병합
+#   1) 계획(career_plan + 요약 메시지)
+#   2) 활동: 우선순위 그룹(핵심/권장/선택)별로 동시에. 병합 중복 제거로 최소 개수에 모자라면 모자란 그룹만 한 번 더
+#   3) 로드맵 배치: 활동 id가 정해진 뒤 id만 배치
+# 전체 시간 ≈ max(1, 2의 각 그룹) + 3 (출력 길이 합이 아니라 가장 느린 샤드에 묶임)
+
+import asyncio
+import datetime
+import json
+
+from model_output import (
+    ACTIVITY_SCHEMA,
+    CAREER_PLAN_SCHEMA,
+    ROADMAP_SCHEMA,
+    AssistantMessageStream,
+    JsonObjectScanner,
+    extract_json,
+    object_schema,
+    parse_activities,
+    parse_roadmap,
+    text_format,
+)
+from telemetry import add_usage
+
+PLAN_SHARD_PROMPT = """
+너는 전문 진로 컨설턴트다.
+현재 단계는 [확정 단계]이며, 너는 그중 '진로 계획' 부분만 작성한다.
+활동 목록과 로드맵은 다른 담당이 만든다. 만들지 마라.
+
+출력은 반드시 JSON 한 덩어리로만 한다.
+{
+  "assistant_message": "최종 요약 메시지",
+  "career_plan": {
+    "direction": "진로 방향",
+    "strategy": [],
+    "short_term_goals": [],
+    "mid_term_goals": []
+  }
+}
+"""
+
+ACTIVITY_SHARD_PROMPT = """
+너는 전문 진로 컨설턴트다.
+현재 단계는 [확정 단계]이며, 너는 우선순위가 '{priority}'인 활동만 {count}개 작성한다.
+
+규칙:
+- 서로 중복되지 않게 한다.
+- id는 "{prefix}-1", "{prefix}-2"처럼 붙인다.
+- links에는 실제로 참고할 수 있는 http(s) 링크만 넣는다(없으면 빈 배열).
+
+출력은 반드시 JSON 한 덩어리로만 한다.
+{{
+  "activities": [
+    {{
+      "id": "{prefix}-1",
+      "title": "활동",
+      "description": "내용",
+      "priority": "{priority}",
+      "links": []
+    }}
+  ]
+}}
+"""
+
+# 다시 요청할 때 활동 샤드 프롬프트 뒤에 붙인다
+ACTIVITY_EXCLUDE_NOTE = """
+아래 활동은 이미 있다. 제목이나 내용이 겹치지 않는 새 활동만 작성한다.
+{titles}
+"""
+
+ROADMAP_SHARD_PROMPT = """
+너는 전문 진로 컨설턴트다.
+현재 단계는 [확정 단계]이며, 너는 이미 정해진 활동을 로드맵에 배치만 한다.
+
+규칙:
+- {start_year}년부터 연도별 상/하반기(h1/h2)로 나눈다.
+- h1/h2에는 아래 활동 목록의 id만 넣는다. 새 활동을 만들지 마라.
+- 모든 활동을 최소 한 번 배치한다.
+
+활동 목록:
+{activities}
+
+출력은 반드시 JSON 한 덩어리로만 한다.
+{{
+  "roadmap": [
+    {{"year": {start_year}, "h1": [], "h2": []}}
+  ]
+}}
+"""
+
+PLAN_SHARD_SCHEMA = object_schema(assistant_message={"type": "string"}, career_plan=CAREER_PLAN_SCHEMA)
+ACTIVITY_SHARD_SCHEMA = object_schema(activities={"type": "array", "items": ACTIVITY_SCHEMA})
+ROADMAP_SHARD_SCHEMA = object_schema(roadmap=ROADMAP_SCHEMA)
+
+# FINAL 규칙(engine.STAGE_PROMPTS["FINAL"])의 최소 활동 수
+MIN_ACTIVITIES = 10
+# (우선순위, 개수, id 접두사) — 합계가 MIN_ACTIVITIES를 넘도록
+ACTIVITY_GROUPS = (
+    ("핵심", 4, "core"),
+    ("권장", 4, "rec"),
+    ("선택", 3, "opt"),
+)
+
+
+class ShardError(ValueError):
+    """샤드 결과를 합쳐도 FINAL 규칙을 채우지 못함(폴백 대상)."""
+
+
+async def _gather_or_cancel(*coros) -> list:
+    """asyncio.gather와 같지만, 하나가 실패하면 나머지 샤드를 취소하고 끝날 때까지 기다린 뒤 그 오류를 올린다
+    (실패한 턴의 샤드가 토큰을 계속 쓰지 않게)."""
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _shard(
+    client, model, name, schema, system_prompt, messages, on_message=None, usage=None, options=None
+) -> dict:
+    request = dict(
+        model=model,
+        input=[{"role": "system", "content": system_prompt}, *messages],
+        text={"verbosity": "low", "format": text_format(name, schema)},
+        **(options or {}),
+    )
+    if on_message is None:
+        resp = await client.responses.create(**request)
+        if usage is not None:
+            add_usage(usage, getattr(resp, "usage", None))
+        return extract_json(resp.output_text)
+
+    parser = AssistantMessageStream()
+    scanner = JsonObjectScanner()
+    shown = ""
+    async for event in await client.responses.create(**request, stream=True):
+        etype = getattr(event, "type", "")
+        if etype == "response.output_text.delta":
+            scanner.feed(event.delta)
+            text = parser.feed(event.delta)
+            if text != shown:
+                shown = text
+                on_message(text)
+        elif etype == "response.completed" and usage is not None:
+            add_usage(usage, getattr(event.response, "usage", None))
+        elif etype == "response.failed":
+            err = getattr(event.response, "error", None)
+            raise RuntimeError(getattr(err, "message", None) or "모델 응답 실패")
+        elif etype == "error":
+            raise RuntimeError(getattr(event, "message", None) or "스트리밍 오류")
+    if scanner.result is None:
+        raise ValueError("JSON 파싱 실패")
+    return scanner.result
+
+
+def merge_activities(groups) -> list:
+    """그룹별 활동을 검증·병합하며 id/제목 중복 제거. id가 겹치면 새 id를 붙인다.
+
+    캐시에 그대로 저장되므로 dict 목록으로 반환한다.
+    """
+    out = []
+    seen_ids = set()
+    seen_titles = set()
+    for group in groups:
+        for a in parse_activities(group):
+            title_key = a.title.casefold()
+            if title_key and title_key in seen_titles:
+                continue
+            aid = a.id
+            if aid in seen_ids:
+                n = 2
+                while f"{aid}-{n}" in seen_ids:
+                    n += 1
+                aid = f"{aid}-{n}"
+            a.id = aid
+            seen_ids.add(aid)
+            if title_key:
+                seen_titles.add(title_key)
+            out.append(a.to_dict())
+    return out
+
+
+def merge_roadmap(raw) -> list:
+    """반기 안의 중복 키만 정리. 키 해석(id/제목 → 정식 id)과 미해석 보고는 앱이 수집할 때 한 번
+    (model_output.resolve_roadmap)."""
+    out = []
+    for r in parse_roadmap(raw):
+        r.h1 = tuple(dict.fromkeys(r.h1))
+        r.h2 = tuple(dict.fromkeys(r.h2))
+        out.append(r.to_dict())
+    return out
+
+
+async def generate_final(client, model, messages, on_message=None, usage=None, options=None) -> dict:
+    """FINAL 응답과 같은 모양의 dict(assistant_message, career_plan, activities, roadmap)를 반환.
+
+    usage(dict)를 넘기면 모든 샤드의 토큰 사용량을 합산해 채운다.
+    options는 모든 샤드 요청에 합칠 필드(reasoning, max_output_tokens 등 — model_routes.ModelRoute).
+    """
+    plan_task = _shard(
+        client,
+        model,
+        "final_plan",
+        PLAN_SHARD_SCHEMA,
+        PLAN_SHARD_PROMPT,
+        messages,
+        on_message=on_message,
+        usage=usage,
+        options=options,
+    )
+    group_tasks = [
+        _shard(
+            client,
+            model,
+            f"final_activities_{prefix}",
+            ACTIVITY_SHARD_SCHEMA,
+            ACTIVITY_SHARD_PROMPT.format(priority=priority, count=count, prefix=prefix),
+            messages,
+            usage=usage,
+            options=options,
+        )
+        for priority, count, prefix in ACTIVITY_GROUPS
+    ]
+    plan, *groups = await _gather_or_cancel(plan_task, *group_tasks)
+
+    activities = merge_activities([g.get("activities") for g in groups])
+    if len(activities) < MIN_ACTIVITIES:
+        activities = await _refill_activities(client, model, messages, activities, usage=usage, options=options)
+    compact = json.dumps(
+        [{"id": a["id"], "title": a["title"], "priority": a["priority"]} for a in activities],
+        ensure_ascii=False,
+    )
+    roadmap_prompt = ROADMAP_SHARD_PROMPT.format(
+        start_year=datetime.date.today().year,
+        activities=compact,
+    )
+    placed = await _shard(
+        client, model, "final_roadmap", ROADMAP_SHARD_SCHEMA, roadmap_prompt, messages, usage=usage, options=options
+    )
+
+    return {
+        "assistant_message": plan.get("assistant_message", ""),
+        "career_plan": plan.get("career_plan", {}),
+        "activities": activities,
+        "roadmap": merge_roadmap(placed.get("roadmap")),
+    }
+
+
+async def _refill_activities(client, model, messages, activities, usage=None, options=None) -> list:
+    """중복 제거로 MIN_ACTIVITIES에 모자랄 때: 요청한 개수보다 적게 남은 그룹만 모자란 만큼 한 번 더 요청.
+
+    그래도 모자라면 ShardError(규칙을 어긴 계획을 로드맵 샤드에 넘기지 않는다).
+    """
+    have = {priority: 0 for priority, _, _ in ACTIVITY_GROUPS}
+    for a in activities:
+        have[a["priority"]] = have.get(a["priority"], 0) + 1
+    short = [(priority, count - have[priority], prefix) for priority, count, prefix in ACTIVITY_GROUPS]
+    short = [g for g in short if g[1] > 0]
+    # 그룹별로는 채웠는데 모자라면(개수 설정이 규칙보다 작을 때) 마지막 그룹에 몰아서
+    missing = MIN_ACTIVITIES - len(activities)
+    if sum(g[1] for g in short) < missing:
+        priority, _, prefix = ACTIVITY_GROUPS[-1]
+        short = [g for g in short if g[0] != priority] + [(priority, missing, prefix)]
+    exclude = ACTIVITY_EXCLUDE_NOTE.format(titles="\n".join(f"- {a['title']}" for a in activities))
+    extra = await _gather_or_cancel(
+        *(
+            _shard(
+                client,
+                model,
+                f"final_activities_{prefix}",
+                ACTIVITY_SHARD_SCHEMA,
+                ACTIVITY_SHARD_PROMPT.format(priority=priority, count=count, prefix=f"{prefix}-more") + exclude,
+                messages,
+                usage=usage,
+                options=options,
+            )
+            for priority, count, prefix in short
+        )
+    )
+    activities = merge_activities([activities, *(g.get("activities") for g in extra)])
+    if len(activities) < MIN_ACTIVITIES:
+        raise ShardError(f"활동이 {len(activities)}개뿐(최소 {MIN_ACTIVITIES}개)")
+    return activities
+
+
+def run_final(async_client_factory, model, messages, on_message=None, usage=None, options=None, timeout=None) -> dict:
+    """동기 코드(Streamlit 스크립트)에서 호출. 요청마다 새 이벤트 루프 + 비동기 클라이언트를 쓴다.
+
+    timeout(초)을 주면 샤드 전체가 그 안에 끝나야 한다(넘기면 남은 요청을 취소하고 TimeoutError).
+    """
+
+    async def _run():
+        async with async_client_factory() as client:
+            return await asyncio.wait_for(
+                generate_final(client, model, messages, on_message=on_message, usage=usage, options=options),
+                timeout,
+            )
+
+    return asyncio.run(_run())
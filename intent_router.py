@@ -0,0 +1,64 @@
+# intent_router.py
+# 모델 호출 전 로컬 의도 판별: 결과가 정해진 입력은 API를 부르지 않고 처리한다
+# - CONFIRM: DESIGN에서 "좋아, 이대로 진행해" 같은 확정 → DESIGN 응답 없이 같은 턴에 바로 FINAL 생성
+#   (초안을 한 번도 보여 주기 전이면 엔진이 무시하고 DESIGN 응답을 먼저 만든다)
+# - RESET: "처음부터 다시" / "초기화" → 세션 초기화
+# - SHOW_ROADMAP: "로드맵 보여줘" → 저장된 로드맵을 로컬에서 요약
+# 입력 전체가 해당 의도일 때만 가로챈다(새 정보가 섞이면 None → 평소처럼 모델 호출)
+
+import re
+
+CONFIRM = "CONFIRM"
+RESET = "RESET"
+SHOW_ROADMAP = "SHOW_ROADMAP"
+
+# 괄호/대괄호 안 덧붙임("(웃음)", "[메모]")은 의도 판별에서 뺀다
+_ASIDE_RE = re.compile(r"\([^()]*\)|\[[^\[\]]*\]")
+_TAIL = r"[\s.!~ㅎㅋ]*$"
+
+_CONFIRM_RE = re.compile(
+    # 맞장구 반복("네네네", "응 응")은 한 글자씩 되풀이로만 센다: 되풀이 안에 "네+"를 두면 긴 입력에서 역추적이 폭발
+    r"^\s*((좋아(요)?|좋습니다|네|넵|예|응|그래(요)?|오케이|ok(ay)?)[\s,.!~]*)*"
+    r"(이대로\s*)?"
+    r"(진행|계속|확정|결정|최종(으로)?(\s*진행)?|다음\s*단계(로)?|좋아(요)?|괜찮아(요)?|go|고고)"
+    r"\s*(해|해줘|해\s*주세요|하자|할게요?|합시다|가자|가요|갈게요?)?" + _TAIL,
+    flags=re.IGNORECASE,
+)
+_RESET_RE = re.compile(
+    r"^\s*(처음부터\s*다시(\s*(할래|하자|할게요?|해\s*줘|해\s*주세요|시작))?|"
+    r"(전체\s*)?초기화(\s*(해|해줘|해\s*주세요|할래))?|리셋|reset|새\s*상담(\s*시작)?)" + _TAIL,
+    flags=re.IGNORECASE,
+)
+# "다시"는 보기 동사와 함께일 때만("로드맵 다시 보여줘"). "로드맵 다시"는 다시 짜 달라는 요청이라 모델로
+_SHOW_ROADMAP_RE = re.compile(
+    r"^\s*(로드맵|연도별\s*계획|일정표)\s*(을|좀|을\s*좀)?\s*"
+    r"((다시\s*)?(보여\s*(줘|주세요|줄래)|볼래|볼게요?|보기|확인(할래|해\s*줘)?))?[\s.!?~]*$",
+)
+
+
+def route(stage: str, text: str):
+    """로컬에서 처리할 의도(CONFIRM/RESET/SHOW_ROADMAP) 또는 None(모델 호출)."""
+    text = _ASIDE_RE.sub(" ", text or "").strip()
+    if not text:
+        return None
+    if _RESET_RE.match(text):
+        return RESET
+    if _SHOW_ROADMAP_RE.match(text):
+        return SHOW_ROADMAP
+    if stage == "DESIGN" and _CONFIRM_RE.match(text):
+        return CONFIRM
+    return None
+
+
+def roadmap_markdown(roadmap: list, activities: list) -> str:
+    """SHOW_ROADMAP 답변: 연도별 상/하반기 활동 제목(로드맵 키는 정식 id)."""
+    if not roadmap:
+        return "아직 로드맵이 없어요. 진로 방향을 확정하면 최종 단계에서 만들어 드릴게요."
+    titles = {a.id: a.title for a in activities}
+    lines = ["지금 로드맵이에요. 자세한 내용은 **로드맵** 탭에서 볼 수 있어요."]
+    for r in roadmap:
+        lines.append(f"\n**{r.year}년**")
+        for label, keys in (("상반기", r.h1), ("하반기", r.h2)):
+            names = [titles[k] for k in keys if k in titles]
+            lines.append(f"- {label}: {', '.join(names) if names else '배치된 활동 없음'}")
+    return "\n".join(lines)
@@ -0,0 +1,161 @@
+# llm_cache.py
+# LLM 응답 캐시: (API 키 해시, 모델, 단계 프롬프트, 정규화된 메시지) 해시를 키로 사용
+# - 캐시는 프로세스 전체 공유라 키마다 나눈다(잘못된 키로 남의 응답을 요금 없이 받지 않게)
+# - 메모리 LRU + (선택) 디스크 계층, TTL/크기 제한
+# - 같은 키로 진행 중인 요청은 하나만 실제 호출(중복 제출 방지)
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+_WS_RE = re.compile(r"\s+")
+
+
+def cache_key(owner: str, model: str, system_prompt: str, messages, previous_response_id=None) -> str:
+    """공백 차이는 무시하도록 메시지를 정규화한 뒤 sha256. owner는 API 키 해시(llm_clients.key_hash)."""
+    normalized = [
+        [m.get("role"), _WS_RE.sub(" ", str(m.get("content") or "")).strip()]
+        for m in messages
+    ]
+    payload = json.dumps(
+        [owner, model, system_prompt.strip(), normalized, previous_response_id],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """메모리 LRU(+선택적 디스크) 캐시. 값은 JSON 직렬화 가능한 dict."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0, disk_dir=None, max_disk_entries: int = 2000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_entries = max_disk_entries
+        self._mem = OrderedDict()  # key -> (created, value)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "deduped": 0}
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def _fresh(self, created: float) -> bool:
+        return (time.time() - created) < self.ttl
+
+    def _lookup(self, key: str):
+        """(value, "memory"|"disk") 또는 (None, None)."""
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit and self._fresh(hit[0]):
+                self._mem.move_to_end(key)
+                self.stats["hits"] += 1
+                return hit[1], "memory"
+            if hit:
+                del self._mem[key]
+        value = self._disk_get(key)
+        if value is None:
+            return None, None
+        with self._lock:
+            self.stats["disk_hits"] += 1
+            self._mem_put(key, value)
+        return value, "disk"
+
+    def get(self, key: str):
+        return self._lookup(key)[0]
+
+    def put(self, key: str, value: dict):
+        with self._lock:
+            self._mem_put(key, value)
+        self._disk_put(key, value)
+
+    def get_or_call(self, key: str, fn):
+        """캐시에 있으면 반환, 같은 키 요청이 진행 중이면 그 결과를 기다림, 없으면 fn() 호출.
+
+        반환: (value, source) — source는 "memory" | "disk" | "inflight" | "call"
+        """
+        value, source = self._lookup(key)
+        if source:
+            return value, source
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._inflight[key] = _InFlight()
+                self.stats["misses"] += 1
+            else:
+                self.stats["deduped"] += 1
+
+        if not owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, "inflight"
+
+        try:
+            flight.value = fn()
+            self.put(key, flight.value)
+            return flight.value, "call"
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _mem_put(self, key: str, value: dict):
+        self._mem[key] = (time.time(), value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _disk_get(self, key: str):
+        if not self.disk_dir:
+            return None
+        path = self.disk_dir / f"{key}.json"
+        try:
+            record = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not self._fresh(record.get("created", 0)):
+            path.unlink(missing_ok=True)
+            return None
+        return record.get("value")
+
+    def _disk_put(self, key: str, value: dict):
+        if not self.disk_dir:
+            return
+        record = json.dumps({"created": time.time(), "value": value}, ensure_ascii=False)
+        # 임시 파일에 쓰고 rename → 읽는 쪽이 반쯤 쓰인 파일을 보지 않음
+        fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(record)
+            os.replace(tmp, self.disk_dir / f"{key}.json")
+        except OSError:
+            Path(tmp).unlink(missing_ok=True)
+            return
+        self._disk_prune()
+
+    def _disk_prune(self):
+        files = list(self.disk_dir.glob("*.json"))
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=lambda p: p.stat().st_mtime)
+        for p in files[: len(files) - self.max_disk_entries]:
+            p.unlink(missing_ok=True)
@@ -0,0 +1,199 @@
+# llm_calls.py
+# 단계 응답 모델 호출(UI 비의존): Responses 요청 + 스트리밍 파싱 + 단계별 라우팅/폴백 + 계측
+# 앱(app.py)은 여기에 캐시/게이트웨이/화면 갱신을 얹고, 배치 CLI(batch.py)는 그대로 쓴다
+
+import time
+
+import openai
+
+from final_engine import run_final
+from llm_clients import new_async_client
+from model_output import STAGE_SCHEMAS, AssistantMessageStream, JsonObjectScanner, extract_json, text_format
+from model_routes import DEFAULT_MODEL, STAGE_ROUTES, LatencyBudgetExceeded, call_with_fallback, estimate_cost
+from telemetry import usage_dict
+
+
+def stage_format(stage: str) -> dict:
+    return text_format(stage, STAGE_SCHEMAS[stage])
+
+
+def llm_call(
+    client,
+    system_prompt,
+    messages,
+    on_message=None,
+    previous_response_id=None,
+    meta=None,
+    output_format=None,
+    route=None,
+    *,
+    telemetry,
+):
+    """on_message가 주어지면 스트리밍 모드: assistant_message를 받는 대로 콜백으로 넘긴다.
+
+    구조화 필드(discovery_summary, draft_activities, roadmap 등)는 스트림이 끝난 뒤
+    전체 JSON을 파싱해서 돌려준다.
+    previous_response_id가 있으면 서버에 저장된 대화에 이어서 messages만 보낸다
+    (시스템 프롬프트는 체인의 첫 요청에 이미 들어 있음).
+    meta(dict)를 넘기면 response_id와 usage(토큰 사용량)를 채워준다.
+    시간은 llm.network(요청~마지막 이벤트, 파싱/표시 제외)와 llm.parse(JSON 추출)로 나눠 기록한다.
+    output_format은 Structured Outputs 스키마(text.format)로, 모델 JSON이 단계 스키마를 따르게 한다.
+    route(ModelRoute)를 주면 그 모델/추론 강도/최대 출력 토큰을 쓰고, 스트림이 지연 예산을 넘기면 끊는다.
+    telemetry(Telemetry)에 구간 시간을 기록한다.
+    """
+    request = dict(
+        model=route.model if route else DEFAULT_MODEL,
+        input=[
+            {"role": "system", "content": system_prompt},
+            *messages,
+        ],
+        text={"verbosity": "low"},
+        **(route.request_options() if route else {}),
+    )
+    if output_format:
+        request["text"]["format"] = output_format
+    if previous_response_id:
+        request["input"] = list(messages)
+        request["previous_response_id"] = previous_response_id
+    meta = meta if meta is not None else {}
+    tel = telemetry
+
+    if on_message is None:
+        start = time.perf_counter()
+        resp = client.responses.create(**request)
+        received = time.perf_counter()
+        meta["response_id"] = getattr(resp, "id", None)
+        meta["usage"] = usage_dict(getattr(resp, "usage", None))
+        data = extract_json(resp.output_text)
+        tel.record("llm.network", (received - start) * 1000)
+        tel.record("llm.parse", (time.perf_counter() - received) * 1000)
+        return data
+
+    parser = AssistantMessageStream()
+    scanner = JsonObjectScanner()
+    shown = ""
+    parse_s = ui_s = 0.0
+    start = time.perf_counter()
+    # 중간에 그만둘 때(예산 초과/실패 이벤트)도 응답을 바로 닫아 커넥션을 돌려준다
+    with client.responses.create(**request, stream=True) as stream:
+        for event in stream:
+            if route and time.perf_counter() - start > route.latency_budget:
+                raise LatencyBudgetExceeded(route.latency_budget)
+            etype = getattr(event, "type", "")
+            if etype == "response.output_text.delta":
+                t0 = time.perf_counter()
+                scanner.feed(event.delta)
+                text = parser.feed(event.delta)
+                t1 = time.perf_counter()
+                parse_s += t1 - t0
+                if text != shown:
+                    shown = text
+                    on_message(text)
+                    ui_s += time.perf_counter() - t1
+            elif etype in ("response.created", "response.completed"):
+                meta["response_id"] = getattr(event.response, "id", None)
+                if etype == "response.completed":
+                    meta["usage"] = usage_dict(getattr(event.response, "usage", None))
+            elif etype == "response.failed":
+                err = getattr(event.response, "error", None)
+                raise RuntimeError(getattr(err, "message", None) or "모델 응답 실패")
+            elif etype == "error":
+                raise RuntimeError(getattr(event, "message", None) or "스트리밍 오류")
+    tel.record("llm.network", (time.perf_counter() - start - parse_s - ui_s) * 1000)
+    tel.record("llm.parse", parse_s * 1000)
+    tel.record("llm.stream_ui", ui_s * 1000)
+    if scanner.result is None:
+        raise ValueError("JSON 파싱 실패")
+    return scanner.result
+
+
+def record_model_call(telemetry, stage: str, meta: dict, on_failure=None):
+    """call_with_fallback의 record 콜백: 시도마다 단계·모델별 지연/추정 비용/실패/폴백을 계측기에.
+
+    on_failure(게이트웨이 record_failure)는 예산 초과 시도마다 부른다. 재시도할 오류는 gateway.retry가
+    이미 세므로 여기서는 세지 않는다.
+    """
+
+    def record(route, ms, error, fallback):
+        if isinstance(error, LatencyBudgetExceeded) and on_failure is not None:
+            on_failure()
+        # 실패한 시도의 usage가 다음(폴백) 시도에 섞이지 않게 꺼낸다
+        usage = meta.pop("usage", None) if error else meta.get("usage")
+        telemetry.model_call(
+            stage,
+            route.model,
+            ms,
+            usage=usage,
+            cost=estimate_cost(route.model, usage),
+            ok=error is None,
+            fallback=fallback,
+        )
+
+    return record
+
+
+def _with_retry(gateway, fn):
+    """시도 하나를 게이트웨이 재시도로 감싼다(게이트웨이가 없으면 한 번만)."""
+    return gateway.retry(fn) if gateway is not None else fn()
+
+
+def routed_llm_call(client, stage: str, system_prompt, messages, meta: dict, telemetry, gateway=None, **kwargs):
+    """STAGE_ROUTES[stage] 설정으로 llm_call. 예산 초과/오류면 폴백 모델로 한 번 더.
+
+    gateway(LLMGateway)를 주면 모델마다 재시도를 다 쓴 뒤 폴백하고, 예산 초과도 차단기에 센다.
+    이때 바깥 gateway.call은 retry=False로 부른다(재시도가 겹치지 않게).
+    """
+
+    def once(route):
+        try:
+            return llm_call(
+                client.with_options(timeout=route.latency_budget),
+                system_prompt,
+                messages,
+                meta=meta,
+                output_format=stage_format(stage),
+                route=route,
+                telemetry=telemetry,
+                **kwargs,
+            )
+        except openai.APITimeoutError as e:
+            # 요청 타임아웃이 곧 예산: 같은 모델로 재시도하지 않고 폴백으로
+            raise LatencyBudgetExceeded(route.latency_budget) from e
+
+    on_failure = gateway.record_failure if gateway is not None else None
+    return call_with_fallback(
+        STAGE_ROUTES[stage],
+        lambda route: _with_retry(gateway, lambda: once(route)),
+        record_model_call(telemetry, stage, meta, on_failure),
+    )
+
+
+def routed_final_call(api_key, messages, meta: dict, telemetry, on_message=None, gateway=None):
+    """STAGE_ROUTES["FINAL"] 설정으로 샤드 병렬 생성(final_engine). meta["usage"]에 샤드 합계.
+
+    gateway는 routed_llm_call과 같다(샤드 실행 전체가 시도 하나).
+    """
+
+    def once(route):
+        meta["usage"] = usage = {}
+        try:
+            # 샤드 요청들은 이벤트 루프 안에서 겹치므로 네트워크/파싱을 나누지 않고 전체를 잰다
+            with telemetry.span("llm.final"):
+                return run_final(
+                    lambda: new_async_client(api_key),
+                    route.model,
+                    messages,
+                    on_message=on_message,
+                    usage=usage,
+                    options=route.request_options(),
+                    timeout=route.latency_budget,
+                )
+        except (TimeoutError, openai.APITimeoutError) as e:
+            raise LatencyBudgetExceeded(route.latency_budget) from e
+
+    on_failure = gateway.record_failure if gateway is not None else None
+    return call_with_fallback(
+        STAGE_ROUTES["FINAL"],
+        lambda route: _with_retry(gateway, lambda: once(route)),
+        record_model_call(telemetry, "FINAL", meta, on_failure),
+    )
@@ -0,0 +1,205 @@
+# llm_clients.py
+# OpenAI 클라이언트 풀: API 키 해시별로 클라이언트(=HTTP 커넥션 풀)를 재사용
+# - keep-alive 커넥션 제한/타임아웃 조정
+# - 오래 안 쓴 클라이언트는 닫고 제거(개수 초과로 닫을 때는 요청 중이거나 방금 꺼내 간 클라이언트는 건너뜀)
+# - 요청 수/새 TCP 연결 수를 세서 커넥션 재사용률을 보여줌
+
+import hashlib
+import threading
+import time
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY = 90.0
+# FINAL 생성은 수십 초 걸릴 수 있어 read는 넉넉히, 연결은 짧게
+REQUEST_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+# 재시도는 llm_gateway가 (지터 + 회로 차단과 함께) 맡는다: SDK 자체 재시도는 끈다
+SDK_MAX_RETRIES = 0
+# 개수 초과로 닫을 수 있는 최소 유휴 시간(초): get()으로 꺼내 간 뒤 첫 요청을 보내기 전인 클라이언트를 닫지 않게
+OVERFLOW_MIN_IDLE = 120.0
+
+
+def key_hash(api_key: str) -> str:
+    """API 키를 대신하는 짧은 해시(키 원문을 보관/키로 쓰지 않기 위해)."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class _TrackedStream(httpx.SyncByteStream):
+    """응답 본문 스트림: 닫힐 때(다 읽었거나 중간에 버렸을 때) 한 번 on_close."""
+
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            if hasattr(self._stream, "close"):
+                self._stream.close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                on_close()
+
+
+class _TrackedTransport(httpx.BaseTransport):
+    """요청을 보낸 때부터 응답 본문이 닫힐 때까지(스트리밍 포함)를 진행 중인 요청으로 센다."""
+
+    def __init__(self, transport: httpx.BaseTransport, on_start, on_end):
+        self._transport = transport
+        self._on_start = on_start
+        self._on_end = on_end
+
+    def handle_request(self, request):
+        self._on_start()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self._on_end()
+            raise
+        response.stream = _TrackedStream(response.stream, self._on_end)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class _Entry:
+    __slots__ = ("client", "last_used", "in_flight")
+
+    def __init__(self, last_used: float):
+        self.client = None
+        self.last_used = last_used
+        self.in_flight = 0  # 응답 본문이 아직 안 닫힌 요청 수
+
+
+class ClientRegistry:
+    """API 키별 OpenAI 클라이언트 레지스트리(프로세스 전체 공유).
+
+    키 원문은 보관하지 않고 해시로만 찾는다.
+    idle_ttl 넘게 안 쓴 클라이언트는 닫는다. max_clients를 넘으면 가장 오래 안 쓴 것부터 닫되,
+    요청이 진행 중이거나 OVERFLOW_MIN_IDLE 안에 꺼내 간 클라이언트는 건너뛴다(그동안은 잠시 넘을 수 있음).
+    """
+
+    def __init__(self, idle_ttl: float = 15 * 60, max_clients: int = 64, min_idle: float = OVERFLOW_MIN_IDLE):
+        self.idle_ttl = idle_ttl
+        self.max_clients = max_clients
+        self.min_idle = min_idle
+        self._clients = {}  # key_hash -> _Entry
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "evicted": 0, "requests": 0, "connections": 0}
+
+    def get(self, api_key: str) -> OpenAI:
+        kh = key_hash(api_key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._clients.get(kh)
+            if entry is None:
+                entry = self._clients[kh] = _Entry(now)
+                entry.client = self._create(api_key, entry)
+                self._stats["created"] += 1
+            entry.last_used = now
+            expired = self._pop_idle(now, keep=kh)
+        for client in expired:
+            client.close()
+        return entry.client
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(
+                self._stats,
+                clients=len(self._clients),
+                in_flight=sum(e.in_flight for e in self._clients.values()),
+            )
+        reused = max(0, out["requests"] - out["connections"])
+        out["reuse_ratio"] = (reused / out["requests"]) if out["requests"] else 0.0
+        return out
+
+    def close_all(self):
+        with self._lock:
+            clients = [e.client for e in self._clients.values()]
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    def _pop_idle(self, now: float, keep: str) -> list:
+        """idle_ttl 넘게 안 쓴 클라이언트 + 개수 초과분(가장 오래 안 쓴 것부터)을 꺼냄.
+
+        개수 초과로는 진행 중인 요청이 없고 min_idle 넘게 안 쓴 것만 꺼낸다(다른 세션 스레드가
+        방금 꺼내 가 요청 중인 클라이언트를 닫지 않게).
+        """
+        order = sorted(self._clients.items(), key=lambda kv: kv[1].last_used)
+        overflow = len(order) - self.max_clients
+        expired = []
+        for kh, entry in order:
+            if kh == keep:
+                continue
+            idle = now - entry.last_used
+            if idle > self.idle_ttl:
+                pass
+            elif overflow > 0 and entry.in_flight == 0 and idle >= self.min_idle:
+                overflow -= 1
+            else:
+                continue
+            del self._clients[kh]
+            expired.append(entry.client)
+        self._stats["evicted"] += len(expired)
+        return expired
+
+    def _create(self, api_key: str, entry: _Entry) -> OpenAI:
+        def on_start():
+            with self._lock:
+                entry.in_flight += 1
+
+        def on_end():
+            with self._lock:
+                entry.in_flight -= 1
+
+        transport = httpx.HTTPTransport(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        http_client = httpx.Client(
+            transport=_TrackedTransport(transport, on_start, on_end),
+            timeout=REQUEST_TIMEOUT,
+            event_hooks={"request": [self._on_request]},
+        )
+        return OpenAI(api_key=api_key, http_client=http_client, timeout=REQUEST_TIMEOUT, max_retries=SDK_MAX_RETRIES)
+
+    def _on_request(self, request):
+        with self._lock:
+            self._stats["requests"] += 1
+        # httpcore trace: 새 TCP 연결이 맺어질 때만 connect_tcp 이벤트가 온다
+        request.extensions["trace"] = self._trace
+
+    def _trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self._stats["connections"] += 1
+
+
+def new_async_client(api_key: str) -> AsyncOpenAI:
+    """비동기 클라이언트(FINAL 병렬 생성용).
+
+    httpx.AsyncClient의 커넥션은 이벤트 루프에 묶이므로 풀에 두지 않고
+    한 번의 실행(asyncio.run) 동안만 쓰고 닫는다. 샤드끼리는 같은 풀을 공유한다.
+    """
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=REQUEST_TIMEOUT,
+    )
+    return AsyncOpenAI(
+        api_key=api_key, http_client=http_client, timeout=REQUEST_TIMEOUT, max_retries=SDK_MAX_RETRIES
+    )
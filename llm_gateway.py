@@ -0,0 +1,219 @@
+# llm_gateway.py
+# LLM 호출 게이트웨이(프로세스 전체 공유): 모든 세션 스레드의 모델 호출이 여기를 거친다
+# - 동시 호출 수 제한 + 도착 순서대로(공정 큐) 슬롯 배정, 대기 순번/예상 시간 알림
+# - 재시도 가능한 오류(429/타임아웃/연결/5xx)는 지터를 준 지수 백오프로 재시도
+#   (재시도 중에도 슬롯을 쥐고 있어 장애 때 동시 요청이 늘어나지 않음)
+# - 연속 실패가 쌓이면 회로 차단: 쿨다운 동안은 바로 실패, 이후 한 건만 시험 호출
+
+import random
+import threading
+import time
+from collections import deque
+
+import openai
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class GatewayError(RuntimeError):
+    """게이트웨이가 호출을 보내지 않고 거절한 경우."""
+
+
+class CircuitOpenError(GatewayError):
+    def __init__(self, retry_in: float):
+        super().__init__(f"모델 서버 응답이 계속 실패해 잠시 요청을 멈췄어요. {retry_in:.0f}초 뒤 다시 시도해 주세요.")
+        self.retry_in = retry_in
+
+
+class GatewayBusyError(GatewayError):
+    def __init__(self):
+        super().__init__("대기 중인 요청이 있어 백그라운드 호출을 건너뜀")
+
+
+def _retry_after(error) -> float | None:
+    """429/503 응답의 Retry-After(초)."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class LLMGateway:
+    """동시성 제한 + 공정 큐 + 재시도 + 회로 차단기.
+
+    call()을 부른 스레드에서 fn을 실행한다. on_wait(position, eta)는 대기하는 동안
+    같은 스레드에서 주기적으로 불리므로 Streamlit 요소를 갱신해도 된다.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 30.0,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._cond = threading.Condition()
+        self._waiting = deque()  # 대기 티켓(도착 순)
+        self._active = 0
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._avg_call = 5.0  # 호출 시간 이동 평균(ETA 계산용)
+        self._stats = {"calls": 0, "retries": 0, "failures": 0, "rejected": 0, "queued": 0, "max_queue": 0}
+
+    def call(self, fn, on_wait=None, background: bool = False, retry: bool = True):
+        """fn()을 슬롯을 얻은 뒤 실행하고 결과를 반환.
+
+        background=True(추측 생성 등)면 줄을 서지 않는다: 대기 중인 요청이 있거나 빈 슬롯이
+        없으면 GatewayBusyError로 바로 포기해 사용자 요청 앞을 막지 않는다.
+        retry=False면 fn을 한 번만 부른다. fn이 안에서 시도마다 self.retry로 감쌀 때
+        (단계 폴백: 같은 모델 재시도를 다 쓴 뒤 폴백 모델로) 재시도가 겹치지 않게 쓴다.
+        """
+        self._check_breaker()
+        try:
+            self._acquire(on_wait, background)
+        except BaseException:
+            with self._cond:
+                self._probing = False
+            raise
+        started = time.monotonic()
+        try:
+            return self.retry(fn) if retry else fn()
+        finally:
+            self._release(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(
+                self._stats,
+                active=self._active,
+                waiting=len(self._waiting),
+                breaker=self._breaker_state(time.monotonic()),
+                avg_call_s=round(self._avg_call, 2),
+            )
+
+    # ---- 슬롯 ----
+
+    def _acquire(self, on_wait, background):
+        ticket = object()
+        with self._cond:
+            if background:
+                if self._waiting or self._active >= self.max_concurrent:
+                    self._stats["rejected"] += 1
+                    raise GatewayBusyError()
+                self._active += 1
+                return
+            self._waiting.append(ticket)
+            if self._active >= self.max_concurrent or self._waiting[0] is not ticket:
+                self._stats["queued"] += 1
+                self._stats["max_queue"] = max(self._stats["max_queue"], len(self._waiting))
+            try:
+                while self._waiting[0] is not ticket or self._active >= self.max_concurrent:
+                    if on_wait is not None:
+                        position = self._waiting.index(ticket) + 1
+                        # 내 앞(대기 + 실행 중)이 빠져 슬롯이 나기까지: 슬롯 수만큼 병렬로 빠진다
+                        ahead = position - 1 + self._active
+                        eta = self._avg_call * max(1, ahead - self.max_concurrent + 1) / self.max_concurrent
+                        self._cond.release()
+                        try:
+                            on_wait(position, eta)
+                        finally:
+                            self._cond.acquire()
+                    self._cond.wait(timeout=0.5)
+            except BaseException:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+                raise
+            self._waiting.popleft()
+            self._active += 1
+            self._cond.notify_all()
+
+    def _release(self, elapsed: float):
+        with self._cond:
+            self._active -= 1
+            self._avg_call = 0.8 * self._avg_call + 0.2 * elapsed
+            self._cond.notify_all()
+
+    # ---- 재시도 ----
+
+    def retry(self, fn):
+        """fn()을 재시도 가능한 오류에 한해 백오프하며 다시 부르고, 결과를 차단기에 반영.
+
+        슬롯은 잡지 않는다(call 안에서, 또는 call(retry=False)로 잡은 슬롯 안에서 부른다).
+        """
+        attempt = 0
+        while True:
+            with self._cond:
+                self._stats["calls"] += 1
+            try:
+                result = fn()
+            except RETRYABLE_ERRORS as e:
+                self.record_failure()
+                if attempt >= self.max_retries or self._breaker_state(time.monotonic()) == "open":
+                    raise
+                attempt += 1
+                with self._cond:
+                    self._stats["retries"] += 1
+                # full jitter: 동시에 실패한 요청들이 같은 순간에 다시 몰리지 않게
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                time.sleep(max(delay, _retry_after(e) or 0.0))
+                continue
+            except BaseException:
+                # 잘못된 요청(400/401/404)이나 파싱 실패는 서버 장애가 아님: 차단기에 반영하지 않음
+                with self._cond:
+                    self._probing = False
+                raise
+            self._record_success()
+            return result
+
+    # ---- 회로 차단기 ----
+
+    def _breaker_state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at < self.breaker_cooldown:
+            return "open"
+        return "half_open"
+
+    def _check_breaker(self):
+        with self._cond:
+            now = time.monotonic()
+            state = self._breaker_state(now)
+            if state == "closed":
+                return
+            if state == "half_open" and not self._probing:
+                self._probing = True  # 쿨다운이 끝나면 한 건만 통과시켜 회복 여부를 본다
+                return
+            self._stats["rejected"] += 1
+            retry_in = self.breaker_cooldown - (now - self._opened_at) if state == "open" else 1.0
+        raise CircuitOpenError(max(1.0, retry_in))
+
+    def record_failure(self):
+        """실패 한 번을 차단기에 반영. 게이트웨이 밖에서 삼킨 실패(폴백 전 시도의 예산 초과 등)도 여기로."""
+        with self._cond:
+            self._stats["failures"] += 1
+            self._failures += 1
+            if self._probing or self._failures >= self.breaker_threshold:
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def _record_success(self):
+        with self._cond:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
@@ -0,0 +1,595 @@
+# model_output.py
+# 모델 출력(JSON) 파싱과 UI용 정규화 — Streamlit에 의존하지 않음
+
+import difflib
+import json
+import re
+import unicodedata
+import uuid
+from dataclasses import dataclass, field, replace
+
+
+_STRUCT_RE = re.compile(r'[{}"]')
+_STRING_RE = re.compile(r'["\\]')
+_DECODER = json.JSONDecoder()
+
+
+def _match_brace(text: str, pos: int, depth: int, in_string: bool):
+    """pos부터 훑어 depth가 0이 되는 '}' 다음 위치를 찾는다(문자열/이스케이프 구분).
+
+    반환: (end, pos, depth, in_string) — 끝까지 못 찾으면 end는 None이고
+    나머지는 이어서 훑을 상태(청크가 더 오면 pos부터 계속).
+    """
+    n = len(text)
+    while True:
+        if in_string:
+            m = _STRING_RE.search(text, pos)
+            if not m:
+                return None, n, depth, True
+            if m.group() == "\\":
+                if m.end() >= n:
+                    return None, m.start(), depth, True  # 이스케이프 대상 글자가 아직 안 옴
+                pos = m.end() + 1
+                continue
+            in_string = False
+            pos = m.end()
+            continue
+        m = _STRUCT_RE.search(text, pos)
+        if not m:
+            return None, n, depth, False
+        c = m.group()
+        pos = m.end()
+        if c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos, pos, 0, False
+
+
+class JsonObjectScanner:
+    """스트림 청크에서 첫 번째로 완성되는 최상위 JSON 객체를 한 번의 훑기로 찾는 증분 스캐너.
+
+    - 문자열 안의 중괄호/따옴표와 이스케이프를 구분한다.
+    - 객체 앞의 산문, ```json 펜스는 버린다. 균형은 맞지만 JSON이 아닌 {…}(산문 속 중괄호)는
+      통째로 건너뛰고 그 뒤의 '{'부터 다시 찾는다.
+    - 청크는 들어온 것만 훑는다. 후보 객체의 훑은 조각은 목록에 모아 두고 닫힐 때 한 번만 합친다
+      (버퍼에 이어 붙이면 청크마다 전체를 복사해 출력 길이의 제곱으로 느려짐).
+    """
+
+    def __init__(self):
+        self.parts = []  # 후보 객체('{'부터)의 이미 훑은 조각
+        self.pending = ""  # 아직 훑지 않은 꼬리(청크 끝에 걸린 이스케이프)
+        self.depth = 0
+        self.in_string = False
+        self.started = False  # 후보 객체 안을 훑는 중
+        self.result = None
+
+    def feed(self, chunk: str):
+        """완성된 객체(dict)를 찾으면 반환, 아직이면 None."""
+        if self.result is None and chunk:
+            self._scan(self.pending + chunk)
+        return self.result
+
+    def _scan(self, text: str):
+        pos = start = 0
+        while True:
+            if not self.started:
+                start = text.find("{", pos)
+                if start < 0:
+                    # 객체 시작 전 산문은 더 볼 필요 없음
+                    self.pending = ""
+                    return
+                pos = start + 1
+                self.parts = []
+                self.depth = 1
+                self.in_string = False
+                self.started = True
+            end, pos, self.depth, self.in_string = _match_brace(text, pos, self.depth, self.in_string)
+            if end is None:
+                self.parts.append(text[start:pos])
+                self.pending = text[pos:]
+                return
+            try:
+                self.result = json.loads("".join(self.parts) + text[start:end])
+                return
+            except ValueError:
+                self.started = False
+                pos = end
+
+
+def extract_json(text: str) -> dict:
+    """텍스트에서 첫 번째 완성된 최상위 JSON 객체를 찾는다.
+
+    후보 '{'마다 C 디코더(raw_decode)로 바로 파싱하고, 실패한 후보는 괄호 균형만 따라
+    통째로 건너뛴다. 끝까지 닫히지 않으면(잘린 출력) ValueError.
+    """
+    text = text or ""
+    i = text.find("{")
+    while i >= 0:
+        try:
+            return _DECODER.raw_decode(text, i)[0]
+        except ValueError:
+            pass
+        end = _match_brace(text, i + 1, 1, False)[0]
+        if end is None:
+            break
+        i = text.find("{", end)
+    raise ValueError("JSON 파싱 실패")
+
+
+class AssistantMessageStream:
+    """부분 JSON 스트림에서 assistant_message 문자열 값만 점진적으로 디코딩.
+
+    feed()는 지금까지 디코딩된 assistant_message 전체를 돌려준다(아직 없으면 "").
+    청크는 들어온 것만 본다(키 탐색은 경계에 걸친 키 조각만, 디코딩은 끝나지 않은 이스케이프만 이어서).
+    잘못된 \\u 이스케이프를 만나면 거기서 멈춘다(값은 스트림이 끝난 뒤 전체 파싱 결과를 쓴다).
+    """
+
+    _KEY = '"assistant_message"'
+    _KEY_RE = re.compile(r'"assistant_message"\s*:\s*"')
+    # 키는 다 왔지만 값의 여는 따옴표가 아직 안 온 꼬리(공백/줄바꿈 길이와 무관)
+    _KEY_OPEN_RE = re.compile(r'"assistant_message"\s*(?::\s*)?\Z')
+    _HEX4_RE = re.compile(r"[0-9a-fA-F]{4}\Z")
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self):
+        self.pending = ""  # 아직 처리하지 않은 꼬리(청크 경계에 걸친 키/이스케이프)
+        self.found = False  # assistant_message 값 안을 읽는 중
+        self.done = False
+        self.text = ""
+        self._chars = []
+
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return self.text
+        text = self.pending + (chunk or "")
+        if not self.found:
+            m = self._KEY_RE.search(text)
+            if not m:
+                # 키가 청크 경계에 걸쳤을 수 있으니 키(와 뒤따른 공백/콜론)나 키 조각만 남긴다
+                start = text.rfind(self._KEY)
+                if start >= 0 and self._KEY_OPEN_RE.match(text, start):
+                    self.pending = text[start:]
+                else:
+                    self.pending = text[-len(self._KEY):]
+                return ""
+            self.found = True
+            text = text[m.end():]
+        before = len(self._chars)
+        self.pending = text[self._decode(text):]
+        if len(self._chars) != before:
+            self.text = "".join(self._chars)
+        return self.text
+
+    def _decode(self, buf: str) -> int:
+        """buf를 디코딩해 _chars에 더하고 멈춘 위치를 반환(값이 끝나면 done)."""
+        i, n = 0, len(buf)
+        while i < n:
+            c = buf[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c != "\\":
+                self._chars.append(c)
+                i += 1
+                continue
+            # 이스케이프: 뒤따르는 글자가 아직 안 왔으면 다음 청크를 기다림
+            if i + 1 >= n:
+                break
+            e = buf[i + 1]
+            if e != "u":
+                self._chars.append(self._ESCAPES.get(e, e))
+                i += 2
+                continue
+            if i + 6 > n:
+                break
+            code = self._hex4(buf[i + 2:i + 6])
+            if code is None:
+                self.done = True
+                break
+            if 0xD800 <= code < 0xDC00:
+                # 서로게이트 쌍(이모지 등)은 뒷부분까지 와야 한 글자로 합칠 수 있음
+                tail = buf[i + 6:i + 12]
+                if len(tail) < 6 and "\\u".startswith(tail[:2]):
+                    break
+                low = self._hex4(tail[2:]) if tail[:2] == "\\u" else None
+                if low is not None and 0xDC00 <= low < 0xE000:
+                    code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                    i += 6
+            self._chars.append(chr(code))
+            i += 6
+        return i
+
+    @classmethod
+    def _hex4(cls, digits: str):
+        """\\u 뒤 네 자리 → 코드 포인트(16진수가 아니면 None)."""
+        return int(digits, 16) if cls._HEX4_RE.match(digits) else None
+
+
+PRIORITIES = ("핵심", "권장", "선택")
+
+
+@dataclass(slots=True)
+class Activity:
+    """검증된 활동 한 건. 렌더링은 이 객체를 그대로 쓴다(재정규화 없음)."""
+
+    id: str
+    title: str = ""
+    description: str = ""
+    priority: str = "권장"
+    links: tuple = ()  # http(s) 링크만
+
+    @classmethod
+    def from_raw(cls, raw):
+        """모델/저장소에서 온 dict를 검증해 Activity로. 쓸 수 없으면 None."""
+        if isinstance(raw, cls):
+            return raw
+        if not isinstance(raw, dict):
+            return None
+        priority = str(raw.get("priority") or "").strip()
+        return cls(
+            id=str(raw.get("id") or uuid.uuid4()),
+            title=str(raw.get("title") or "").strip(),
+            description=str(raw.get("description") or "").strip(),
+            priority=priority if priority in PRIORITIES else "권장",
+            links=_links(raw.get("links")),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "priority": self.priority,
+            "links": list(self.links),
+        }
+
+
+@dataclass(slots=True)
+class RoadmapEntry:
+    """검증된 로드맵 연도 한 건. h1/h2는 활동 키 — 수집 시점에 resolve_roadmap으로 정식 id가 된다."""
+
+    year: int
+    h1: tuple = ()
+    h2: tuple = ()
+
+    @classmethod
+    def from_raw(cls, raw):
+        if isinstance(raw, cls):
+            return raw
+        if not isinstance(raw, dict):
+            return None
+        year = raw.get("year")
+        # year가 문자열로 오면 int 변환 시도
+        if isinstance(year, str) and year.strip().isdigit():
+            year = int(year)
+        if not isinstance(year, int) or isinstance(year, bool):
+            return None
+        return cls(year=year, h1=_keys(raw.get("h1")), h2=_keys(raw.get("h2")))
+
+    def to_dict(self) -> dict:
+        return {"year": self.year, "h1": list(self.h1), "h2": list(self.h2)}
+
+
+def _keys(raw) -> tuple:
+    if not isinstance(raw, list):
+        return ()
+    return tuple(str(k).strip() for k in raw if isinstance(k, (str, int)) and str(k).strip())
+
+
+def _links(raw) -> tuple:
+    return tuple(l for l in (raw if isinstance(raw, list) else []) if isinstance(l, str) and l.startswith("http"))
+
+
+def parse_activities(raw) -> list:
+    """activities/draft_activities를 한 번 검증해 Activity 목록으로."""
+    if not isinstance(raw, list):
+        return []
+    return [a for a in map(Activity.from_raw, raw) if a is not None]
+
+
+def parse_roadmap(raw) -> list:
+    """로드맵을 한 번 검증해 연도순 RoadmapEntry 목록으로(연도가 없는 항목은 버림)."""
+    if not isinstance(raw, list):
+        return []
+    return sorted((r for r in map(RoadmapEntry.from_raw, raw) if r is not None), key=lambda r: r.year)
+
+
+# 제목 퍼지 매칭 최소 유사도(difflib ratio). 정규화 후에도 다를 때만 쓴다
+FUZZY_CUTOFF = 0.8
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def normalize_key(text) -> str:
+    """비교용 키: NFKC + casefold, 공백/문장부호 제거("데이터 분석 ・ 프로젝트" == "데이터분석프로젝트")."""
+    return _NON_WORD_RE.sub("", unicodedata.normalize("NFKC", str(text or "")).casefold())
+
+
+class ActivityIndex:
+    """활동 id/제목 색인. 모델이 준 키(id, 제목, 약간 틀린 제목)를 정식 id로 바꾼다.
+
+    우선순위: id 그대로 → 정규화한 id → 정규화한 제목 → 제목 퍼지 매칭. 겹치면 먼저 나온 활동.
+    fuzzy=False면 퍼지 매칭 없이 정확히 같은 키만(지우기/고치기처럼 틀리면 되돌릴 수 없는 연산용).
+    """
+
+    def __init__(self, activities):
+        self.ids = {a.id for a in activities}
+        self._exact = {}
+        self._titles = {}
+        for a in activities:
+            self._exact.setdefault(normalize_key(a.id), a.id)
+        for a in activities:
+            title = normalize_key(a.title)
+            if title:
+                self._exact.setdefault(title, a.id)
+                self._titles.setdefault(title, a.id)
+
+    def resolve(self, key, fuzzy: bool = True):
+        """정식 id(못 찾으면 None)."""
+        if key in self.ids:
+            return key
+        norm = normalize_key(key)
+        if not norm:
+            return None
+        if norm in self._exact:
+            return self._exact[norm]
+        if not fuzzy:
+            return None
+        match = difflib.get_close_matches(norm, self._titles, n=1, cutoff=FUZZY_CUTOFF)
+        return self._titles[match[0]] if match else None
+
+
+def resolve_roadmap(roadmap: list, activities: list):
+    """로드맵 키를 정식 id로 바꾼 새 RoadmapEntry 목록, 해석하지 못한 키 목록,
+    퍼지 매칭으로 바꾼 키 목록("키 → 활동 제목", 조용히 다른 활동에 붙지 않았는지 보이게).
+
+    수집 시점(FINAL 응답/저장소 로드)에 한 번만 부른다. 이후 렌더링은 id 조회만 한다.
+    반기 안에서 같은 활동을 가리키는 키는 하나로 합친다.
+    """
+    index = ActivityIndex(activities)
+    titles = {a.id: a.title for a in activities}
+    out, unresolved, fuzzy = [], [], []
+    for r in roadmap:
+        halves = []
+        for keys in (r.h1, r.h2):
+            ids = []
+            for key in keys:
+                aid = index.resolve(key, fuzzy=False)
+                if aid is None:
+                    aid = index.resolve(key)
+                    if aid is not None:
+                        fuzzy.append(f"{key} → {titles[aid]}")
+                if aid is None:
+                    unresolved.append(key)
+                elif aid not in ids:
+                    ids.append(aid)
+            halves.append(tuple(ids))
+        out.append(RoadmapEntry(year=r.year, h1=halves[0], h2=halves[1]))
+    return out, list(dict.fromkeys(unresolved)), list(dict.fromkeys(fuzzy))
+
+
+def to_jsonable(obj):
+    """json.dumps(default=...)용: 검증된 레코드를 dict로."""
+    if isinstance(obj, (Activity, RoadmapEntry)):
+        return obj.to_dict()
+    raise TypeError(f"JSON으로 바꿀 수 없는 값: {type(obj).__name__}")
+
+
+# ======================
+# FINAL 수정 패치: 계획 전체를 다시 만들지 않고 바뀐 부분만 적용
+# ======================
+
+PATCH_OPS = ("add", "update", "remove", "move")
+HALVES = ("h1", "h2")
+MAX_PATCH_OPS = 20
+
+
+@dataclass(slots=True)
+class PatchResult:
+    """apply_patch 결과. activities/roadmap은 새 목록(입력은 건드리지 않음)."""
+
+    activities: list
+    roadmap: list
+    applied: list = field(default_factory=list)  # 반영한 변경(사람이 읽는 한 줄씩)
+    rejected: list = field(default_factory=list)  # 거절한 연산과 이유
+    removed: list = field(default_factory=list)  # 지운 활동 id(완료 표시 정리용)
+
+
+def apply_patch(activities: list, roadmap: list, operations) -> PatchResult:
+    """모델이 낸 패치 연산(add/update/remove/move)을 검증해 현재 활동/로드맵에 적용.
+
+    빈 문자열/빈 목록/year 0은 "바꾸지 않음". 잘못된 연산은 건너뛰고 이유를 rejected에 남긴다.
+    기존 Activity는 replace로 새 객체를 만들어 바꾼다(이전 목록과의 비교가 깨지지 않게).
+    """
+    acts = {a.id: a for a in activities}
+    placement = {r.year: {"h1": list(r.h1), "h2": list(r.h2)} for r in roadmap}
+    result = PatchResult(activities=[], roadmap=[])
+
+    def unplace(aid):
+        for halves in placement.values():
+            for h in HALVES:
+                halves[h] = [k for k in halves[h] if k != aid]
+
+    def place(aid, year, half):
+        keys = placement.setdefault(year, {"h1": [], "h2": []})[half]
+        if aid not in keys:
+            keys.append(aid)
+
+    ops = operations if isinstance(operations, list) else []
+    for op in ops[MAX_PATCH_OPS:]:
+        result.rejected.append(f"{op.get('op') if isinstance(op, dict) else op}: 한 번에 {MAX_PATCH_OPS}개까지만 반영")
+    for op in ops[:MAX_PATCH_OPS]:
+        if not isinstance(op, dict):
+            continue
+        kind = str(op.get("op") or "")
+        aid = str(op.get("id") or "").strip()
+        if kind != "add" and aid not in acts:
+            # 기존 활동을 가리키는 연산: id 대신 제목을 줬으면 정식 id로. 지우기/고치기/옮기기라
+            # 비슷한 제목(퍼지 매칭)은 받지 않는다(다른 활동과 완료 표시/메모를 지울 수 있음)
+            aid = ActivityIndex(list(acts.values())).resolve(aid, fuzzy=False) or aid
+        year, half = op.get("year"), op.get("half")
+        target = (year, half) if isinstance(year, int) and not isinstance(year, bool) and year > 0 and half in HALVES else None
+        current = acts.get(aid)
+        label = current.title if current else aid
+
+        if kind == "add":
+            title = str(op.get("title") or "").strip()
+            if not title:
+                result.rejected.append(f"추가 {aid or '(id 없음)'}: 제목이 없음")
+                continue
+            if any(a.title.casefold() == title.casefold() for a in acts.values()):
+                result.rejected.append(f"추가 {title}: 같은 제목의 활동이 이미 있음")
+                continue
+            aid = aid or uuid.uuid4().hex[:8]
+            base, n = aid, 2
+            while aid in acts:
+                aid, n = f"{base}-{n}", n + 1
+            acts[aid] = Activity.from_raw({**op, "id": aid, "title": title})
+            if target:
+                place(aid, *target)
+            result.applied.append(f"추가: {title}" + (f" ({year} {'상반기' if half == 'h1' else '하반기'})" if target else ""))
+        elif kind in ("update", "remove", "move") and current is None:
+            result.rejected.append(f"{kind} {aid or '(id 없음)'}: 없는 활동")
+        elif kind == "update":
+            changes = {}
+            for name in ("title", "description"):
+                value = str(op.get(name) or "").strip()
+                if value and value != getattr(current, name):
+                    changes[name] = value
+            title = changes.get("title", "").casefold()
+            if title and any(k != aid and a.title.casefold() == title for k, a in acts.items()):
+                result.rejected.append(f"수정 {label}: 같은 제목의 활동이 이미 있음")
+                continue
+            priority = str(op.get("priority") or "").strip()
+            if priority in PRIORITIES and priority != current.priority:
+                changes["priority"] = priority
+            links = _links(op.get("links"))
+            if links and links != current.links:
+                changes["links"] = links
+            if target:
+                unplace(aid)
+                place(aid, *target)
+            if not changes and not target:
+                result.rejected.append(f"수정 {label}: 바뀐 내용이 없음")
+                continue
+            acts[aid] = replace(current, **changes)
+            result.applied.append(f"수정: {changes.get('title', label)}")
+        elif kind == "remove":
+            del acts[aid]
+            unplace(aid)
+            result.removed.append(aid)
+            result.applied.append(f"삭제: {label}")
+        elif kind == "move":
+            if not target:
+                result.rejected.append(f"이동 {label}: 옮길 연도/반기가 없음")
+                continue
+            unplace(aid)
+            place(aid, *target)
+            result.applied.append(f"이동: {label} → {year} {'상반기' if half == 'h1' else '하반기'}")
+        else:
+            result.rejected.append(f"{kind or '(연산 없음)'}: 알 수 없는 연산")
+
+    original_years = {r.year for r in roadmap}
+    result.activities = list(acts.values())
+    result.roadmap = sorted(
+        (
+            RoadmapEntry(year=year, h1=tuple(h["h1"]), h2=tuple(h["h2"]))
+            for year, h in placement.items()
+            if year in original_years or h["h1"] or h["h2"]
+        ),
+        key=lambda r: r.year,
+    )
+    return result
+
+
+# ======================
+# Structured Outputs 스키마 (strict: 모든 필드 필수, 추가 필드 금지)
+# ======================
+
+def object_schema(**props) -> dict:
+    """모든 필드가 필수인 strict 객체 스키마."""
+    return {"type": "object", "properties": props, "required": list(props), "additionalProperties": False}
+
+
+_STR = {"type": "string"}
+_STR_LIST = {"type": "array", "items": _STR}
+
+ACTIVITY_SCHEMA = object_schema(
+    id=_STR,
+    title=_STR,
+    description=_STR,
+    priority={"type": "string", "enum": list(PRIORITIES)},
+    links=_STR_LIST,
+)
+DRAFT_ACTIVITY_SCHEMA = object_schema(
+    id=_STR,
+    title=_STR,
+    description=_STR,
+    priority={"type": "string", "enum": list(PRIORITIES)},
+)
+ROADMAP_SCHEMA = {
+    "type": "array",
+    "items": object_schema(year={"type": "integer"}, h1=_STR_LIST, h2=_STR_LIST),
+}
+CAREER_PLAN_SCHEMA = object_schema(
+    direction=_STR,
+    strategy=_STR_LIST,
+    short_term_goals=_STR_LIST,
+    mid_term_goals=_STR_LIST,
+)
+
+STAGE_SCHEMAS = {
+    "DISCOVERY": object_schema(
+        assistant_message=_STR,
+        discovery_summary=object_schema(
+            interests=_STR_LIST,
+            strengths=_STR_LIST,
+            values=_STR_LIST,
+            constraints=_STR_LIST,
+            uncertain_points=_STR_LIST,
+        ),
+        next_action={"type": "string", "enum": ["ASK_MORE", "READY_FOR_DESIGN"]},
+    ),
+    "DESIGN": object_schema(
+        assistant_message=_STR,
+        career_options={
+            "type": "array",
+            "items": object_schema(title=_STR, fit_reason=_STR, risk=_STR, outlook=_STR),
+        },
+        recommended_direction=_STR,
+        draft_activities={"type": "array", "items": DRAFT_ACTIVITY_SCHEMA},
+        next_action={"type": "string", "enum": ["REFINE", "READY_FOR_FINAL"]},
+    ),
+    "FINAL": object_schema(
+        assistant_message=_STR,
+        career_plan=CAREER_PLAN_SCHEMA,
+        activities={"type": "array", "items": ACTIVITY_SCHEMA},
+        roadmap=ROADMAP_SCHEMA,
+    ),
+    # FINAL 수정 요청: 바뀐 부분만(빈 값 = 그대로, year 0/half "" = 배치 안 바꿈)
+    "FINAL_PATCH": object_schema(
+        assistant_message=_STR,
+        operations={
+            "type": "array",
+            "items": object_schema(
+                op={"type": "string", "enum": list(PATCH_OPS)},
+                id=_STR,
+                title=_STR,
+                description=_STR,
+                priority={"type": "string", "enum": [*PRIORITIES, ""]},
+                links=_STR_LIST,
+                year={"type": "integer"},
+                half={"type": "string", "enum": [*HALVES, ""]},
+            ),
+        },
+    ),
+}
+
+
+def text_format(name: str, schema: dict) -> dict:
+    """Responses API text.format 값(Structured Outputs)."""
+    return {"type": "json_schema", "name": name.lower(), "schema": schema, "strict": True}
@@ -0,0 +1,111 @@
+# model_routes.py
+# 단계별 모델 라우팅: 단계(DISCOVERY/DESIGN/FINAL/FINAL_PATCH)마다 모델·추론 강도·최대 출력 토큰·지연 예산
+# - 예산(초)을 넘기거나 오류가 나면 route.fallback(더 빠른 모델)로 한 번 더 시도
+# - 요청 자체가 잘못된 4xx(잘못된 요청/인증/권한/없는 응답)는 모델을 바꿔도 같으므로 그대로 올린다
+# - 재시도할 오류(429/연결/5xx)는 시도마다 게이트웨이(llm_gateway.py) 재시도를 다 쓴 뒤에 폴백한다
+#   (llm_calls.py가 시도 하나를 gateway.retry로 감싼다. 바깥 gateway.call은 retry=False로 슬롯만 잡는다)
+# - 시도마다 record(route, ms, error, fallback)로 알려 단계·모델별 지연/비용을 계측할 수 있게 한다
+
+import time
+from dataclasses import dataclass
+
+import openai
+
+# USD / 100만 토큰 (입력, 출력) — 라우팅 표 조정용 추정 비용
+MODEL_PRICES = {
+    "gpt-5": (1.25, 10.0),
+    "gpt-5-mini": (0.25, 2.0),
+    "gpt-5-nano": (0.05, 0.4),
+}
+
+DEFAULT_MODEL = "gpt-5-mini"
+FALLBACK_MODEL = "gpt-5-nano"
+
+NON_FALLBACK_ERRORS = (
+    openai.BadRequestError,
+    openai.AuthenticationError,
+    openai.PermissionDeniedError,
+    openai.NotFoundError,
+)
+
+
+class LatencyBudgetExceeded(TimeoutError):
+    """호출이 route.latency_budget 안에 끝나지 않음(폴백 대상, 게이트웨이는 재시도하지 않음)."""
+
+    def __init__(self, budget: float):
+        super().__init__(f"지연 예산 {budget:g}초 초과")
+        self.budget = budget
+
+
+@dataclass(frozen=True, slots=True)
+class ModelRoute:
+    """단계 하나의 호출 설정. fallback은 예산 초과/오류 때 쓸 (더 빠른) 설정."""
+
+    model: str
+    reasoning_effort: str | None = None  # minimal | low | medium | high (None이면 모델 기본값)
+    max_output_tokens: int | None = None
+    latency_budget: float = 60.0  # 초: 호출 하나(FINAL은 샤드 실행 전체)가 끝나야 하는 시간
+    fallback: "ModelRoute | None" = None
+
+    def request_options(self) -> dict:
+        """model 외에 Responses API 요청에 합칠 필드(reasoning, max_output_tokens)."""
+        options = {}
+        if self.reasoning_effort:
+            options["reasoning"] = {"effort": self.reasoning_effort}
+        if self.max_output_tokens:
+            options["max_output_tokens"] = self.max_output_tokens
+        return options
+
+    def cache_tag(self) -> str:
+        """응답 캐시 키에 넣을 설정 요약(설정이 바뀌면 다른 응답)."""
+        return f"{self.model}/{self.reasoning_effort}/{self.max_output_tokens}"
+
+
+def estimate_cost(model: str, usage) -> float:
+    """usage({input_tokens, output_tokens})의 추정 비용(USD). 가격표에 없는 모델은 0."""
+    price = MODEL_PRICES.get(model)
+    if not price or not usage:
+        return 0.0
+    return (usage.get("input_tokens", 0) * price[0] + usage.get("output_tokens", 0) * price[1]) / 1_000_000
+
+
+def call_with_fallback(route: ModelRoute, attempt, record=None):
+    """attempt(route)를 실행하고, 예산 초과/오류면 fallback 설정으로 다시 시도해 결과를 반환."""
+    current, is_fallback = route, False
+    while True:
+        start = time.perf_counter()
+        try:
+            result = attempt(current)
+        except Exception as e:
+            if record is not None:
+                record(current, (time.perf_counter() - start) * 1000, e, is_fallback)
+            if isinstance(e, NON_FALLBACK_ERRORS) or current.fallback is None:
+                raise
+            current, is_fallback = current.fallback, True
+            continue
+        if record is not None:
+            record(current, (time.perf_counter() - start) * 1000, None, is_fallback)
+        return result
+
+
+# 단계별 라우팅 표: 모델, 추론 강도, 최대 출력 토큰, 지연 예산(초)
+# 예산을 넘기거나 오류가 나면 fallback(더 빠른 모델)으로 한 번 더. 앱 성능 패널의 단계·모델별 표를 보고 조정
+# (FINAL의 max_output_tokens는 샤드 요청 하나당, 지연 예산은 샤드 실행 전체)
+STAGE_ROUTES = {
+    "DISCOVERY": ModelRoute(
+        DEFAULT_MODEL, "minimal", 2000, 20.0,
+        fallback=ModelRoute(FALLBACK_MODEL, "minimal", 2000, 20.0),
+    ),
+    "DESIGN": ModelRoute(
+        DEFAULT_MODEL, "low", 6000, 45.0,
+        fallback=ModelRoute(FALLBACK_MODEL, "minimal", 6000, 45.0),
+    ),
+    "FINAL": ModelRoute(
+        DEFAULT_MODEL, "low", 6000, 90.0,
+        fallback=ModelRoute(FALLBACK_MODEL, "minimal", 6000, 90.0),
+    ),
+    "FINAL_PATCH": ModelRoute(
+        DEFAULT_MODEL, "low", 2000, 30.0,
+        fallback=ModelRoute(FALLBACK_MODEL, "minimal", 2000, 30.0),
+    ),
+}
@@ -0,0 +1,79 @@
+# speculative.py
+# 단계 전환 직후 다음 단계 응답을 백그라운드에서 미리 생성
+# - DISCOVERY→DESIGN, DESIGN→FINAL 전환 시 현재 상태(discovery/career_options)로 초안 생성 시작
+# - 다음 사용자 입력이 단순 동의(“좋아”, “진행해” 등)면 미리 만든 결과를 그대로 사용
+# - 새 정보가 담긴 입력이면 버린다(낭비로 기록)
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 추측 생성에 넣는 가상의 사용자 발화(실제 입력이 이와 같은 뜻일 때만 결과를 씀)
+SPECULATIVE_USER_MESSAGE = "좋아요, 이대로 다음 단계로 진행해 주세요."
+
+# "네네네"는 뒤쪽 되풀이가 한 글자씩 센다(되풀이 안에 "네+"를 두면 긴 입력에서 역추적이 폭발)
+_ACK_RE = re.compile(
+    r"^\s*("
+    r"네|넵|예|응+|어+|웅|그래(요)?|좋아(요)?|좋습니다|좋네(요)?|오케이|ok(ay)?|go|고고|ㅇㅇ|ㅇㅋ|"
+    r"(이대로\s*)?(진행|계속)(해|해줘|해\s*주세요|하자|할게요?)?|"
+    r"만들어\s*(줘|주세요)|부탁(해|해요|합니다)|다음(\s*단계)?(로)?(\s*가자)?"
+    r")([\s,.!~]*(네|좋아(요)?|진행해(\s*주세요)?|부탁해(요)?))*[\s.!~ㅎㅋ]*$",
+    flags=re.IGNORECASE,
+)
+
+
+def is_acknowledgement(text: str) -> bool:
+    """새 정보 없이 '그대로 진행'만 뜻하는 짧은 입력인지."""
+    return bool(_ACK_RE.match(text or ""))
+
+
+class SpeculativeExecutor:
+    """프로세스 공유 스레드 풀 + 적중/낭비 통계.
+
+    세션에는 start()가 돌려준 spec(dict)만 보관한다. 백그라운드 함수에서는 Streamlit API를 쓰지 않는다.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative")
+        self._lock = threading.Lock()
+        self.stats = {"started": 0, "hits": 0, "wasted": 0, "failed": 0}
+
+    def start(self, stage: str, base_messages: int, fn) -> dict:
+        """stage 응답을 미리 생성. base_messages는 시작 시점의 메시지 수."""
+        with self._lock:
+            self.stats["started"] += 1
+        return {"stage": stage, "base_messages": base_messages, "future": self._pool.submit(fn)}
+
+    def resolve(self, spec: dict, stage: str, base_messages: int, user_input: str):
+        """쓸 수 있으면 결과(dict), 아니면 None. 아직 생성 중이면 끝날 때까지 기다린다."""
+        fut = spec["future"]
+        valid = (
+            spec["stage"] == stage
+            and spec["base_messages"] == base_messages
+            and is_acknowledgement(user_input)
+        )
+        if not valid:
+            self.discard(spec)
+            return None
+        try:
+            data = fut.result()
+        except Exception:
+            with self._lock:
+                self.stats["failed"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        return data
+
+    def discard(self, spec: dict):
+        spec["future"].cancel()
+        with self._lock:
+            self.stats["wasted"] += 1
+
+    def rates(self) -> dict:
+        with self._lock:
+            out = dict(self.stats)
+        done = out["hits"] + out["wasted"] + out["failed"]
+        out["hit_rate"] = (out["hits"] / done) if done else 0.0
+        out["waste_rate"] = (out["wasted"] / done) if done else 0.0
+        return out
@@ -0,0 +1,200 @@
+# storage.py
+# 세션별 상태 저장소: SQLite(WAL) 한 파일에 session_id 단위로 저장
+# - messages는 행 단위 append
+# - 구조화 필드(activities, roadmap, activity_status 등)는 필드 단위 upsert
+
+import atexit
+import json
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DB_PATH = Path(".jinsul_state.db")
+
+# messages를 제외하고 필드 단위로 저장하는 상태 키
+STATE_FIELDS = (
+    "stage",
+    "discovery",
+    "discovery_turns",
+    "career_options",
+    "recommended_direction",
+    "career_plan",
+    "activities",
+    "roadmap",
+    "activity_status",
+    "roadmap_open",
+    "ref_catalog",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS fields (
+    session_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (session_id, name)
+);
+"""
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+class SessionStore:
+    """session_id별 상태를 SQLite에 저장. 스레드마다 커넥션을 따로 연다."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str) -> dict:
+        """저장된 필드 + messages(순서대로)를 dict로 반환. 없으면 빈 dict."""
+        conn = self._conn()
+        data = {
+            name: json.loads(value)
+            for name, value in conn.execute(
+                "SELECT name, value FROM fields WHERE session_id = ?", (session_id,)
+            )
+        }
+        rows = conn.execute(
+            "SELECT data FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+        if rows or data:
+            data["messages"] = [json.loads(r[0]) for r in rows]
+        return data
+
+    def save(self, session_id: str, new_messages=(), start_seq: int = 0, fields=None, truncate=False):
+        """한 트랜잭션으로 delta만 기록.
+
+        new_messages: start_seq부터 이어 붙일 메시지
+        fields: {name: 이미 직렬화된 JSON 문자열} (바뀐 필드만)
+        truncate: True면 start_seq 이후의 기존 메시지를 먼저 지움(히스토리가 줄어든 경우)
+        """
+        conn = self._conn()
+        with conn:
+            if truncate:
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND seq >= ?", (session_id, start_seq)
+                )
+            if new_messages:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO messages (session_id, seq, data) VALUES (?, ?, ?)",
+                    [(session_id, start_seq + i, _dumps(m)) for i, m in enumerate(new_messages)],
+                )
+            if fields:
+                conn.executemany(
+                    "INSERT INTO fields (session_id, name, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(session_id, name) DO UPDATE SET value = excluded.value",
+                    [(session_id, name, value) for name, value in fields.items()],
+                )
+
+    def delete(self, session_id: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM fields WHERE session_id = ?", (session_id,))
+
+
+_STOP = object()
+
+
+class WriteBehindPersister:
+    """필드 편집(체크박스/메모)을 백그라운드 스레드에서 모아 쓰는 write-behind 저장기.
+
+    - submit()은 큐에 넣기만 하므로 렌더 경로가 디스크를 기다리지 않는다.
+    - 같은 (session_id, 필드)의 연속 편집은 마지막 값만 남긴다(coalescing).
+    - 마지막 편집 후 debounce초 동안 조용하면 쓰고, 아무리 늦어도 가장 오래된
+      편집 후 max_delay초 안에는 쓴다.
+    - 한 번의 flush는 SQLite 트랜잭션 하나라서 원자적으로 반영된다.
+    - 프로세스 종료 시(atexit) 남은 편집을 flush한다.
+    """
+
+    def __init__(self, store: SessionStore, debounce: float = 0.5, max_delay: float = 2.0, max_queue: int = 1000):
+        self.store = store
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._closed = False
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, session_id: str, name: str, value: str):
+        """value는 이미 직렬화된 JSON 문자열. 큐가 가득 차면 워커가 비울 때까지만 대기."""
+        self._queue.put((session_id, name, value))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """지금까지 submit된 편집을 모두 쓰고 반환."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout=10)
+
+    def _write(self, pending: dict) -> bool:
+        """성공하면 pending을 비운다. 실패하면 그대로 두고 다음 주기에 재시도."""
+        by_session = {}
+        for (session_id, name), value in pending.items():
+            by_session.setdefault(session_id, {})[name] = value
+        try:
+            for session_id, fields in by_session.items():
+                self.store.save(session_id, fields=fields)
+        except sqlite3.Error:
+            return False
+        pending.clear()
+        return True
+
+    def _run(self):
+        pending = {}
+        first = last = 0.0
+        while True:
+            timeout = None
+            if pending:
+                now = time.monotonic()
+                deadline = min(last + self.debounce, first + self.max_delay)
+                if now < deadline:
+                    timeout = deadline - now
+                elif not self._write(pending):
+                    first = last = now
+                    timeout = self.max_delay
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                self._write(pending)
+                return
+            if isinstance(item, threading.Event):
+                self._write(pending)
+                item.set()
+                continue
+            session_id, name, value = item
+            now = time.monotonic()
+            if not pending:
+                first = now
+            last = now
+            pending[(session_id, name)] = value
@@ -0,0 +1,141 @@
+# telemetry.py
+# 핫패스 계측: 구간(span) 시간과 턴별 지연/토큰을 구조화 이벤트(JSONL)로 남기고 p50/p95로 요약
+# - 프로세스 전체 공유(스레드 안전). 요약용 표본은 이름/단계별 최근 max_samples개만 유지
+# - path를 주면 이벤트를 한 줄에 하나씩 JSON으로 append, 없으면 메모리 요약만
+# - set_context()로 현재 스레드(=세션 스크립트 스레드)에 session/stage를 붙여 두면 이후 이벤트에 함께 기록
+
+import atexit
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "total_tokens")
+
+
+def usage_dict(usage) -> dict:
+    """Responses 결과의 usage 객체(또는 dict)를 {input/output/total_tokens}로."""
+    if usage is None:
+        return {}
+    get = usage.get if isinstance(usage, dict) else (lambda k: getattr(usage, k, None))
+    return {k: int(get(k) or 0) for k in USAGE_FIELDS}
+
+
+def add_usage(total: dict, usage) -> dict:
+    """여러 응답(FINAL 샤드 등)의 usage를 total에 더한다."""
+    for k, v in usage_dict(usage).items():
+        total[k] = total.get(k, 0) + v
+    return total
+
+
+def percentile(values, q: float) -> float:
+    """최근접 순위 백분위수(q는 0~1)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+class Telemetry:
+    """구간 시간/턴 지표 수집기. 기록은 잠금 한 번 + (선택) 한 줄 쓰기라 핫패스에 둬도 된다."""
+
+    def __init__(self, path=None, max_samples: int = 2000):
+        self.path = Path(path) if path else None
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._spans = defaultdict(lambda: deque(maxlen=self.max_samples))  # name -> ms
+        self._turns = defaultdict(lambda: deque(maxlen=self.max_samples))  # stage -> (ms, in, out)
+        self._calls = defaultdict(lambda: deque(maxlen=self.max_samples))  # (stage, model) -> (ms, cost, ok, fallback)
+        self._file = None
+        if self.path:
+            self._file = self.path.open("a", encoding="utf-8", buffering=1)
+            atexit.register(self.close)
+
+    def set_context(self, **attrs):
+        """현재 스레드에서 이후 기록되는 이벤트에 붙일 속성(session, stage 등)."""
+        ctx = getattr(self._local, "ctx", None)
+        if ctx is None:
+            ctx = self._local.ctx = {}
+        ctx.update(attrs)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000, **attrs)
+
+    def record(self, name: str, ms: float, **attrs):
+        """밖에서 잰 구간 시간(ms)을 기록(스트림에서 네트워크/파싱을 나눠 잰 경우 등)."""
+        with self._lock:
+            self._spans[name].append(ms)
+        self._emit("span", name=name, ms=round(ms, 2), **attrs)
+
+    def turn(self, stage: str, ms: float, usage=None, **attrs):
+        """대화 한 턴(입력 → 응답 표시 → 저장)의 지연과 토큰 사용량."""
+        usage = usage_dict(usage)
+        with self._lock:
+            self._turns[stage].append((ms, usage.get("input_tokens", 0), usage.get("output_tokens", 0)))
+        self._emit("turn", stage=stage, ms=round(ms, 2), **usage, **attrs)
+
+    def model_call(self, stage: str, model: str, ms: float, usage=None, cost: float = 0.0, ok=True, fallback=False):
+        """모델 호출 시도 한 번(단계 라우팅 표 조정용): 지연, 추정 비용(USD), 성공 여부, 폴백 여부."""
+        usage = usage_dict(usage)
+        with self._lock:
+            self._calls[(stage, model)].append((ms, cost, ok, fallback))
+        self._emit(
+            "llm_call", stage=stage, model=model, ms=round(ms, 2), cost_usd=round(cost, 6), ok=ok, fallback=fallback,
+            **usage,
+        )
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = {k: list(v) for k, v in self._spans.items()}
+            turns = {k: list(v) for k, v in self._turns.items()}
+            calls = {k: list(v) for k, v in self._calls.items()}
+        out = {"spans": {}, "turns": {}, "models": {}}
+        for name, values in sorted(spans.items()):
+            out["spans"][name] = {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 0.5), 1),
+                "p95_ms": round(percentile(values, 0.95), 1),
+            }
+        for stage, rows in turns.items():
+            ms = [r[0] for r in rows]
+            out["turns"][stage] = {
+                "count": len(rows),
+                "p50_ms": round(percentile(ms, 0.5), 1),
+                "p95_ms": round(percentile(ms, 0.95), 1),
+                "input_tokens_per_turn": round(sum(r[1] for r in rows) / len(rows), 1),
+                "output_tokens_per_turn": round(sum(r[2] for r in rows) / len(rows), 1),
+            }
+        for (stage, model), rows in sorted(calls.items()):
+            ms = [r[0] for r in rows]
+            out["models"][f"{stage}/{model}"] = {
+                "count": len(rows),
+                "p50_ms": round(percentile(ms, 0.5), 1),
+                "p95_ms": round(percentile(ms, 0.95), 1),
+                "error_rate": round(sum(not r[2] for r in rows) / len(rows), 3),
+                "fallback_rate": round(sum(r[3] for r in rows) / len(rows), 3),
+                "cost_usd_per_call": round(sum(r[1] for r in rows) / len(rows), 6),
+            }
+        return out
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _emit(self, kind: str, **fields):
+        if self._file is None:
+            return
+        ctx = getattr(self._local, "ctx", None) or {}
+        line = json.dumps({"ts": round(time.time(), 3), "kind": kind, **ctx, **fields}, ensure_ascii=False)
+        with self._lock:
+            if self._file:
+                self._file.write(line + "\n")
@@ -0,0 +1,8 @@
+# tests/conftest.py
+# 저장소 루트의 모듈(storage.py, llm_gateway.py …)을 패키지 없이 import할 수 있게 경로를 잡는다
+# 실행: python -m pytest -q
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,131 @@
+# tests/test_final_engine.py
+# FINAL 샤드 생성: 활동 병합(id/제목 중복), 최소 활동 수 보충/ShardError, 샤드 하나 실패 시 나머지 취소
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import final_engine
+from final_engine import MIN_ACTIVITIES, ShardError, generate_final, merge_activities
+
+
+def _activities(prefix, titles, priority):
+    return [{"id": f"{prefix}-{i}", "title": t, "priority": priority} for i, t in enumerate(titles, 1)]
+
+
+class FakeAsyncClient:
+    """responses.create를 흉내 낸다. 샤드 이름(text.format.name)별로 outputs[name]을 차례로 돌려준다.
+
+    값이 예외면 올리고, 호출 가능한 값이면 await해서 결과를 쓴다.
+    """
+
+    def __init__(self, outputs):
+        self.outputs = {name: list(values) for name, values in outputs.items()}
+        self.requests = []
+        self.responses = SimpleNamespace(create=self._create)
+
+    async def _create(self, **request):
+        name = request["text"]["format"]["name"]
+        self.requests.append((name, request))
+        value = self.outputs[name].pop(0)
+        if isinstance(value, BaseException):
+            raise value
+        if callable(value):
+            value = await value()
+        return SimpleNamespace(output_text=json.dumps(value, ensure_ascii=False), usage=None)
+
+
+def _outputs(core, rec, opt, **extra):
+    out = {
+        "final_plan": [{"assistant_message": "계획", "career_plan": {}}],
+        "final_activities_core": [{"activities": core}],
+        "final_activities_rec": [{"activities": rec}],
+        "final_activities_opt": [{"activities": opt}],
+        "final_roadmap": [{"roadmap": [{"year": 2026, "h1": ["core-1", "core-1"], "h2": []}]}],
+    }
+    for name, values in extra.items():
+        out[name] = out.get(name, []) + values
+    return out
+
+
+def test_merge_activities_drops_duplicate_titles_and_renames_colliding_ids():
+    merged = merge_activities([
+        [{"id": "a", "title": "SQL 공부", "priority": "핵심"}, {"id": "b", "title": "토익"}],
+        [{"id": "a", "title": "포트폴리오"}, {"id": "c", "title": "sql 공부"}],
+        "모델이 준 잘못된 값",
+    ])
+    assert [(a["id"], a["title"]) for a in merged] == [("a", "SQL 공부"), ("b", "토익"), ("a-2", "포트폴리오")]
+
+
+def test_generate_final_merges_shards_and_dedupes_roadmap_keys():
+    client = FakeAsyncClient(_outputs(
+        _activities("core", "ABCD", "핵심"),
+        _activities("rec", "EFGH", "권장"),
+        _activities("opt", "IJK", "선택"),
+    ))
+    usage = {}
+    result = asyncio.run(generate_final(client, "m", [], usage=usage, options={"max_output_tokens": 100}))
+
+    assert result["assistant_message"] == "계획"
+    assert len(result["activities"]) == 11
+    assert result["roadmap"][0]["h1"] == ["core-1"]
+    assert all(req["max_output_tokens"] == 100 for _, req in client.requests)
+    assert [name for name, _ in client.requests].count("final_roadmap") == 1
+
+
+def test_generate_final_refills_short_groups_once():
+    # 그룹 사이 제목 중복으로 9개만 남는다 → 모자란 그룹(권장)만 다시 요청
+    client = FakeAsyncClient(_outputs(
+        _activities("core", "ABCD", "핵심"),
+        _activities("rec", "ABEF", "권장"),
+        _activities("opt", "GHI", "선택"),
+        final_activities_rec=[{"activities": _activities("rec-more", "XY", "권장")}],
+    ))
+    result = asyncio.run(generate_final(client, "m", []))
+
+    assert len(result["activities"]) == MIN_ACTIVITIES + 1
+    refill = [req for name, req in client.requests if name == "final_activities_rec"][1]
+    assert "- A" in refill["input"][0]["content"]  # 이미 있는 제목은 제외하라고 알려 준다
+    assert [name for name, _ in client.requests].count("final_activities_core") == 1
+
+
+def test_generate_final_raises_shard_error_when_still_short():
+    client = FakeAsyncClient(_outputs(
+        _activities("core", "ABCD", "핵심"),
+        _activities("rec", "ABEF", "권장"),
+        _activities("opt", "GHI", "선택"),
+        final_activities_rec=[{"activities": _activities("rec-more", "AB", "권장")}],
+    ))
+    with pytest.raises(ShardError):
+        asyncio.run(generate_final(client, "m", []))
+    assert "final_roadmap" not in [name for name, _ in client.requests]
+
+
+def test_failed_shard_cancels_siblings():
+    finished, cancelled = [], []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        finished.append(1)
+        return {"activities": []}
+
+    async def fail_soon():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("shard failed")
+
+    client = FakeAsyncClient({
+        "final_plan": [fail_soon],
+        "final_activities_core": [slow],
+        "final_activities_rec": [slow],
+        "final_activities_opt": [slow],
+    })
+    with pytest.raises(RuntimeError, match="shard failed"):
+        asyncio.run(asyncio.wait_for(generate_final(client, "m", []), 2))
+    assert finished == []
+    assert len(cancelled) == len(final_engine.ACTIVITY_GROUPS)
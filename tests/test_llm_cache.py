@@ -0,0 +1,113 @@
+# tests/test_llm_cache.py
+# ResponseCache: 적중/LRU/TTL/디스크 계층, 같은 키 동시 요청 합치기(성공/실패)
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import llm_cache
+from llm_cache import ResponseCache, cache_key
+
+
+def test_cache_key_ignores_whitespace_but_not_owner():
+    a = cache_key("owner-a", "m", "prompt", [{"role": "user", "content": "안녕  하세요\n"}])
+    b = cache_key("owner-a", "m", "prompt ", [{"role": "user", "content": "안녕 하세요"}])
+    c = cache_key("owner-b", "m", "prompt", [{"role": "user", "content": "안녕 하세요"}])
+    assert a == b
+    assert a != c
+
+
+def test_get_or_call_hits_memory_after_first_call():
+    cache = ResponseCache()
+    calls = []
+    assert cache.get_or_call("k", lambda: calls.append(1) or {"v": 1}) == ({"v": 1}, "call")
+    assert cache.get_or_call("k", lambda: calls.append(1) or {"v": 2}) == ({"v": 1}, "memory")
+    assert len(calls) == 1
+
+
+def test_lru_evicts_oldest_entry():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", {"v": "a"})
+    cache.put("b", {"v": "b"})
+    cache.get("a")  # a를 최근으로
+    cache.put("c", {"v": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": "a"}
+
+
+def test_expired_entry_is_called_again(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    cache = ResponseCache(ttl=10)
+    cache.get_or_call("k", lambda: {"v": 1})
+    now[0] += 11
+    assert cache.get_or_call("k", lambda: {"v": 2}) == ({"v": 2}, "call")
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    ResponseCache(disk_dir=tmp_path).put("k", {"v": 1})
+    assert ResponseCache(disk_dir=tmp_path).get_or_call("k", lambda: {"v": 2}) == ({"v": 1}, "disk")
+
+
+def test_concurrent_same_key_calls_share_one_result():
+    cache = ResponseCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"v": 1}
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_call("k", slow)))
+    owner.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_call("k", slow)))
+    waiter.start()
+    while cache.stats["deduped"] == 0:
+        threading.Event().wait(0.01)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+
+    assert len(calls) == 1
+    assert sorted(source for _, source in results) == ["call", "inflight"]
+    assert all(value == {"v": 1} for value, _ in results)
+
+
+def test_failed_call_reaches_waiters_and_is_not_cached():
+    cache = ResponseCache()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    errors = []
+
+    def run():
+        try:
+            cache.get_or_call("k", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    owner = threading.Thread(target=run)
+    owner.start()
+    assert started.wait(5)
+    waiter = threading.Thread(target=run)
+    waiter.start()
+    while cache.stats["deduped"] == 0:
+        threading.Event().wait(0.01)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+
+    assert errors == ["upstream down", "upstream down"]
+    assert cache.get("k") is None
+    with pytest.raises(ValueError):
+        cache.get_or_call("k", lambda: (_ for _ in ()).throw(ValueError("again")))
+    assert cache.get_or_call("k", lambda: {"v": 1}) == ({"v": 1}, "call")
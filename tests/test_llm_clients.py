@@ -0,0 +1,90 @@
+# tests/test_llm_clients.py
+# ClientRegistry: 진행 중 요청 세기(스트리밍 포함), TTL/개수 초과 정리(요청 중·방금 쓴 클라이언트는 남김)
+
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import llm_clients
+from llm_clients import ClientRegistry, _TrackedTransport, key_hash
+
+
+def test_tracked_transport_counts_until_body_is_closed():
+    counts = {"start": 0, "end": 0}
+    # 바이트 content는 만들 때 이미 다 읽혀 닫히므로, 실제 전송처럼 아직 안 읽은 스트림으로
+    inner = httpx.MockTransport(lambda request: httpx.Response(200, content=iter([b"x" * 5, b"y" * 5])))
+    transport = _TrackedTransport(
+        inner,
+        on_start=lambda: counts.__setitem__("start", counts["start"] + 1),
+        on_end=lambda: counts.__setitem__("end", counts["end"] + 1),
+    )
+    with httpx.Client(transport=transport) as client:
+        with client.stream("GET", "http://test/") as response:
+            assert counts == {"start": 1, "end": 0}  # 본문을 읽는 동안은 진행 중
+            response.read()
+        assert counts == {"start": 1, "end": 1}
+        client.get("http://test/")
+    assert counts == {"start": 2, "end": 2}
+
+
+def test_tracked_transport_ends_on_transport_error():
+    ended = []
+
+    def boom(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    transport = _TrackedTransport(httpx.MockTransport(boom), on_start=lambda: None, on_end=lambda: ended.append(1))
+    with httpx.Client(transport=transport) as client, pytest.raises(httpx.ConnectError):
+        client.get("http://test/")
+    assert ended == [1]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_clients, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_same_key_reuses_client(clock):
+    registry = ClientRegistry()
+    try:
+        assert registry.get("sk-a") is registry.get("sk-a")
+        assert registry.get("sk-b") is not registry.get("sk-a")
+        assert registry.stats()["created"] == 2
+    finally:
+        registry.close_all()
+
+
+def test_overflow_skips_busy_and_recent_clients(clock):
+    registry = ClientRegistry(idle_ttl=900, max_clients=1, min_idle=60)
+    try:
+        registry.get("sk-a")
+        clock[0] += 10
+        registry.get("sk-b")  # a는 방금 썼으니 닫지 않는다(잠시 2개)
+        assert registry.stats()["clients"] == 2
+
+        registry._clients[key_hash("sk-a")].in_flight = 1
+        clock[0] += 100
+        registry.get("sk-c")  # a는 요청 중, b는 min_idle 넘음 → b만 닫는다
+        assert set(registry._clients) == {key_hash("sk-a"), key_hash("sk-c")}
+
+        registry._clients[key_hash("sk-a")].in_flight = 0
+        clock[0] += 100
+        registry.get("sk-c")
+        assert set(registry._clients) == {key_hash("sk-c")}
+        assert registry.stats()["evicted"] == 2
+    finally:
+        registry.close_all()
+
+
+def test_idle_ttl_evicts_even_when_under_limit(clock):
+    registry = ClientRegistry(idle_ttl=60, max_clients=10)
+    try:
+        registry.get("sk-a")
+        clock[0] += 61
+        registry.get("sk-b")
+        assert set(registry._clients) == {key_hash("sk-b")}
+    finally:
+        registry.close_all()
@@ -0,0 +1,166 @@
+# tests/test_llm_gateway.py
+# LLMGateway: 재시도, 차단기(열림 → 반열림 시험 호출 하나 → 닫힘/다시 열림), 백그라운드 거절
+
+import threading
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import llm_gateway
+from llm_gateway import CircuitOpenError, GatewayBusyError, LLMGateway
+
+
+def _conn_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", "http://test/v1/responses"))
+
+
+class Flaky:
+    """처음 failures번은 연결 오류, 그다음부터 "ok"."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise _conn_error()
+        return "ok"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """게이트웨이의 시계만 바꾼다(백오프 대기 없음, 쿨다운은 now[0]을 늘려 넘긴다)."""
+    now = [100.0]
+    monkeypatch.setattr(llm_gateway, "time", SimpleNamespace(monotonic=lambda: now[0], sleep=lambda s: None))
+    return now
+
+
+def _gateway(**kwargs):
+    return LLMGateway(base_delay=0, max_delay=0, **kwargs)
+
+
+def test_retries_retryable_errors_then_succeeds(clock):
+    gw = _gateway(max_retries=3)
+    fn = Flaky(2)
+    assert gw.call(fn) == "ok"
+    assert fn.calls == 3
+    stats = gw.stats()
+    assert stats["retries"] == 2
+    assert stats["breaker"] == "closed"  # 성공하면 실패 수를 되돌린다
+
+
+def test_gives_up_after_max_retries(clock):
+    gw = _gateway(max_retries=2, breaker_threshold=100)
+    fn = Flaky(10)
+    with pytest.raises(openai.APIConnectionError):
+        gw.call(fn)
+    assert fn.calls == 3
+
+
+def test_retry_false_calls_once(clock):
+    gw = _gateway(max_retries=3, breaker_threshold=100)
+    fn = Flaky(10)
+    with pytest.raises(openai.APIConnectionError):
+        gw.call(fn, retry=False)
+    assert fn.calls == 1
+
+
+def test_non_retryable_error_is_not_retried_or_counted(clock):
+    gw = _gateway(max_retries=3, breaker_threshold=1)
+    calls = []
+
+    def bad():
+        calls.append(1)
+        raise ValueError("JSON 파싱 실패")
+
+    with pytest.raises(ValueError):
+        gw.call(bad)
+    assert len(calls) == 1
+    assert gw.stats()["failures"] == 0
+    assert gw.stats()["breaker"] == "closed"
+
+
+def test_breaker_opens_and_rejects_without_calling(clock):
+    gw = _gateway(max_retries=0, breaker_threshold=2, breaker_cooldown=30)
+    for _ in range(2):
+        with pytest.raises(openai.APIConnectionError):
+            gw.call(Flaky(1))
+    assert gw.stats()["breaker"] == "open"
+
+    fn = Flaky(0)
+    with pytest.raises(CircuitOpenError):
+        gw.call(fn)
+    assert fn.calls == 0
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(clock):
+    gw = _gateway(max_retries=0, breaker_threshold=1, breaker_cooldown=30)
+    with pytest.raises(openai.APIConnectionError):
+        gw.call(Flaky(1))
+    clock[0] += 31
+    assert gw.stats()["breaker"] == "half_open"
+
+    probe_started, release = threading.Event(), threading.Event()
+
+    def probe():
+        probe_started.set()
+        release.wait(5)
+        return "ok"
+
+    result = []
+    t = threading.Thread(target=lambda: result.append(gw.call(probe)))
+    t.start()
+    assert probe_started.wait(5)
+    # 시험 호출이 도는 동안 다른 호출은 거절
+    with pytest.raises(CircuitOpenError):
+        gw.call(Flaky(0))
+    release.set()
+    t.join(5)
+
+    assert result == ["ok"]
+    assert gw.stats()["breaker"] == "closed"
+    assert gw.call(Flaky(0)) == "ok"
+
+
+def test_half_open_probe_failure_reopens(clock):
+    gw = _gateway(max_retries=3, breaker_threshold=1, breaker_cooldown=30)
+    with pytest.raises(openai.APIConnectionError):
+        gw.call(Flaky(10))
+    clock[0] += 31
+
+    fn = Flaky(10)
+    with pytest.raises(openai.APIConnectionError):
+        gw.call(fn)
+    assert fn.calls == 1  # 시험 호출은 재시도하지 않는다(차단기가 다시 열림)
+    assert gw.stats()["breaker"] == "open"
+
+
+def test_record_failure_counts_toward_breaker(clock):
+    gw = _gateway(breaker_threshold=2)
+    gw.record_failure()
+    gw.record_failure()
+    with pytest.raises(CircuitOpenError):
+        gw.call(Flaky(0))
+
+
+def test_background_call_is_rejected_when_slots_are_full(clock):
+    gw = _gateway(max_concurrent=1)
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+        return "ok"
+
+    t = threading.Thread(target=lambda: gw.call(hold))
+    t.start()
+    assert started.wait(5)
+    with pytest.raises(GatewayBusyError):
+        gw.call(Flaky(0), background=True)
+    release.set()
+    t.join(5)
+    assert gw.call(Flaky(0), background=True) == "ok"
+    assert gw.stats()["rejected"] == 1
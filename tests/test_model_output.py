@@ -0,0 +1,149 @@
+# tests/test_model_output.py
+# 모델 출력 처리: JSON 추출/스트림 디코딩, ActivityIndex 퍼지 컷오프, resolve_roadmap, apply_patch 연산 검증
+
+import json
+import random
+
+import pytest
+
+from model_output import (
+    FUZZY_CUTOFF,
+    MAX_PATCH_OPS,
+    Activity,
+    ActivityIndex,
+    AssistantMessageStream,
+    JsonObjectScanner,
+    RoadmapEntry,
+    apply_patch,
+    extract_json,
+    resolve_roadmap,
+)
+
+ACTIVITIES = [
+    Activity(id="a1", title="정보처리기사 필기"),
+    Activity(id="a2", title="데이터 분석 프로젝트"),
+    Activity(id="a3", title="오픈소스 기여"),
+]
+ROADMAP = [RoadmapEntry(year=2026, h1=("a1",), h2=("a2",))]
+
+
+# ---- JSON 추출 / 스트림 ----
+
+def test_extract_json_skips_braces_in_prose():
+    text = '좋아요 {참고}.\n{"a": {"b": 1}}\n추가로 {궁금한 점}'
+    assert extract_json(text) == {"a": {"b": 1}}
+
+
+def test_extract_json_rejects_truncated_output():
+    with pytest.raises(ValueError):
+        extract_json('{"a": [1, 2')
+
+
+def test_scanner_matches_extract_json_across_chunkings():
+    text = '```json\n{"msg": "중괄호 } 와 \\" 따옴표", "n": [1, {"x": "\\\\"}]}\n```'
+    rnd = random.Random(0)
+    for _ in range(200):
+        scanner, i = JsonObjectScanner(), 0
+        while i < len(text):
+            k = rnd.randint(1, 5)
+            scanner.feed(text[i:i + k])
+            i += k
+        assert scanner.result == extract_json(text)
+
+
+@pytest.mark.parametrize("sep", ["", " ", "\n", "\n    ", " " * 40])
+def test_assistant_message_stream_tolerates_whitespace_around_key(sep):
+    msg = "안녕 \"따옴표\"\n😀"
+    doc = "{" + sep + '"assistant_message"' + sep + ":" + sep + json.dumps(msg) + sep + "}"
+    parser, out = AssistantMessageStream(), ""
+    for ch in doc:  # 한 글자씩: 키가 어디서 잘려도 찾아야 한다
+        out = parser.feed(ch)
+    assert out == msg
+    assert parser.done
+
+
+def test_assistant_message_stream_stops_on_bad_escape():
+    parser, out = AssistantMessageStream(), ""
+    for ch in '{"assistant_message": "abc\\uZZZZdef"}':
+        out = parser.feed(ch)
+    assert out == "abc"
+
+
+# ---- ActivityIndex ----
+
+def test_index_resolves_id_normalized_title_and_close_title():
+    index = ActivityIndex(ACTIVITIES)
+    assert index.resolve("a2") == "a2"
+    assert index.resolve(" 데이터분석 프로젝트!") == "a2"
+    assert index.resolve("데이터 분석 프로젝트들") == "a2"  # 퍼지(컷오프 이상)
+
+
+def test_index_fuzzy_cutoff_and_exact_only_mode():
+    assert FUZZY_CUTOFF == 0.8
+    index = ActivityIndex([Activity(id="x1", title="abcdefghij")])
+    assert index.resolve("abcdefghXY") == "x1"  # 유사도 0.8: 컷오프 이상
+    assert index.resolve("abcdefgXYZ") is None  # 유사도 0.7: 컷오프 미만
+
+    index = ActivityIndex(ACTIVITIES)
+    assert index.resolve("전혀 다른 활동") is None
+    assert index.resolve("데이터 분석 프로젝트들", fuzzy=False) is None
+    assert index.resolve("") is None
+
+
+def test_resolve_roadmap_reports_unresolved_and_fuzzy_keys():
+    roadmap = [RoadmapEntry(year=2026, h1=("a1", "정보처리기사 필기", "없는 활동"), h2=("데이터 분석 프로젝트들",))]
+    out, unresolved, fuzzy = resolve_roadmap(roadmap, ACTIVITIES)
+    assert out[0].h1 == ("a1",)  # 같은 활동을 가리키는 키는 하나로
+    assert out[0].h2 == ("a2",)
+    assert unresolved == ["없는 활동"]
+    assert fuzzy == ["데이터 분석 프로젝트들 → 데이터 분석 프로젝트"]
+
+
+# ---- apply_patch ----
+
+def test_patch_applies_add_update_move_remove():
+    ops = [
+        {"op": "add", "id": "a4", "title": "인턴십 지원", "year": 2026, "half": "h2"},
+        {"op": "update", "id": "a2", "description": "팀 프로젝트로"},
+        {"op": "move", "id": "a1", "year": 2027, "half": "h1"},
+        {"op": "remove", "id": "오픈소스 기여"},  # 정확한 제목은 id로 바꿔 준다
+    ]
+    result = apply_patch(ACTIVITIES, ROADMAP, ops)
+    assert result.rejected == []
+    assert [a.id for a in result.activities] == ["a1", "a2", "a4"]
+    assert result.removed == ["a3"]
+    assert [(r.year, r.h1, r.h2) for r in result.roadmap] == [(2026, (), ("a2", "a4")), (2027, ("a1",), ())]
+    # 입력 목록은 그대로
+    assert [a.id for a in ACTIVITIES] == ["a1", "a2", "a3"]
+    assert ACTIVITIES[1].description == ""
+
+
+def test_patch_rejects_invalid_operations():
+    ops = [
+        {"op": "add", "title": ""},
+        {"op": "add", "title": "정보처리기사 필기"},
+        {"op": "update", "id": "a2", "title": "오픈소스 기여"},
+        {"op": "update", "id": "a2"},
+        {"op": "remove", "id": "정보처리기사 필기 시험"},  # 비슷한 제목(퍼지)은 받지 않는다
+        {"op": "move", "id": "a1"},
+        {"op": "move", "id": "a1", "year": True, "half": "h1"},
+        {"op": "rename", "id": "a1"},
+    ]
+    result = apply_patch(ACTIVITIES, ROADMAP, ops)
+    assert result.applied == []
+    assert len(result.rejected) == len(ops)
+    assert [a.id for a in result.activities] == ["a1", "a2", "a3"]
+    assert [(r.year, r.h1, r.h2) for r in result.roadmap] == [(2026, ("a1",), ("a2",))]
+
+
+def test_patch_caps_number_of_operations():
+    ops = [{"op": "update", "id": "a1", "description": f"설명 {i}"} for i in range(MAX_PATCH_OPS + 3)]
+    result = apply_patch(ACTIVITIES, ROADMAP, ops)
+    assert len(result.applied) == MAX_PATCH_OPS
+    assert len(result.rejected) == 3
+
+
+def test_patch_ignores_non_list_operations():
+    result = apply_patch(ACTIVITIES, ROADMAP, {"op": "remove", "id": "a1"})
+    assert result.applied == [] and result.rejected == []
+    assert [a.id for a in result.activities] == ["a1", "a2", "a3"]
@@ -0,0 +1,63 @@
+# tests/test_model_routes.py
+# call_with_fallback: 폴백 대상 오류(예산 초과/연결 오류)와 폴백하지 않는 오류, 시도별 기록
+
+import httpx
+import openai
+import pytest
+
+from model_routes import STAGE_ROUTES, LatencyBudgetExceeded, ModelRoute, call_with_fallback, estimate_cost
+
+ROUTE = ModelRoute("main", "low", 100, 10.0, fallback=ModelRoute("small", "minimal", 100, 10.0))
+
+
+def _run(errors):
+    """errors[model]이 있으면 그 오류를 내는 attempt로 실행하고 (결과 또는 예외, 기록)을 반환."""
+    records = []
+
+    def attempt(route):
+        if route.model in errors:
+            raise errors[route.model]
+        return f"ok:{route.model}"
+
+    def record(route, ms, error, is_fallback):
+        records.append((route.model, type(error).__name__ if error else None, is_fallback))
+
+    try:
+        return call_with_fallback(ROUTE, attempt, record), records
+    except Exception as e:
+        return e, records
+
+
+def test_success_does_not_fall_back():
+    assert _run({}) == ("ok:main", [("main", None, False)])
+
+
+@pytest.mark.parametrize("error", [
+    LatencyBudgetExceeded(10.0),
+    openai.APIConnectionError(request=httpx.Request("POST", "http://test/v1/responses")),
+])
+def test_retryable_or_slow_call_falls_back(error):
+    result, records = _run({"main": error})
+    assert result == "ok:small"
+    assert records == [("main", type(error).__name__, False), ("small", None, True)]
+
+
+def test_bad_request_does_not_fall_back():
+    request = httpx.Request("POST", "http://test/v1/responses")
+    error = openai.BadRequestError("bad", response=httpx.Response(400, request=request), body=None)
+    result, records = _run({"main": error})
+    assert result is error
+    assert records == [("main", "BadRequestError", False)]
+
+
+def test_fallback_failure_is_raised():
+    result, records = _run({"main": LatencyBudgetExceeded(10.0), "small": RuntimeError("down")})
+    assert isinstance(result, RuntimeError)
+    assert [r[0] for r in records] == ["main", "small"]
+
+
+def test_every_stage_has_a_faster_fallback_and_prices():
+    for route in STAGE_ROUTES.values():
+        assert route.fallback is not None and route.fallback.fallback is None
+        assert estimate_cost(route.model, {"input_tokens": 1000, "output_tokens": 1000}) > 0
+    assert estimate_cost("unknown", {"input_tokens": 1000}) == 0.0
@@ -0,0 +1,109 @@
+# tests/test_storage.py
+# SessionStore(필드/메시지 delta 저장) + WriteBehindPersister(디바운스, 합치기, 실패 후 재시도)
+
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from storage import SessionStore, WriteBehindPersister
+
+
+class SpyStore:
+    """save 호출을 기록하는 저장소. fail_times만큼은 sqlite3 오류를 낸다."""
+
+    def __init__(self, fail_times=0):
+        self.saves = []
+        self.fail_times = fail_times
+        self.lock = threading.Lock()
+
+    def save(self, session_id, fields=None, **kwargs):
+        with self.lock:
+            if self.fail_times:
+                self.fail_times -= 1
+                raise sqlite3.OperationalError("database is locked")
+            self.saves.append((session_id, dict(fields or {})))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(tmp_path / "state.db")
+
+
+def test_store_round_trip_and_truncate(store):
+    store.save("s1", new_messages=[{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}],
+               fields={"stage": json.dumps("DESIGN")})
+    store.save("s1", new_messages=[{"role": "user", "content": "c"}], start_seq=1, truncate=True)
+
+    data = store.load("s1")
+    assert data["stage"] == "DESIGN"
+    assert [m["content"] for m in data["messages"]] == ["a", "c"]
+    assert store.load("other") == {}
+
+    store.delete("s1")
+    assert store.load("s1") == {}
+
+
+def test_persister_coalesces_edits_to_last_value():
+    spy = SpyStore()
+    p = WriteBehindPersister(spy, debounce=10, max_delay=10)
+    try:
+        for value in ("1", "2", "3"):
+            p.submit("s1", "activity_status", value)
+        p.submit("s2", "roadmap_open", "true")
+        assert p.flush()
+    finally:
+        p.close()
+    assert sorted(spy.saves) == [("s1", {"activity_status": "3"}), ("s2", {"roadmap_open": "true"})]
+
+
+def test_persister_waits_for_quiet_period():
+    spy = SpyStore()
+    p = WriteBehindPersister(spy, debounce=0.3, max_delay=5)
+    try:
+        p.submit("s1", "activity_status", "1")
+        time.sleep(0.1)
+        assert spy.saves == []  # 디바운스 전에는 쓰지 않는다
+        deadline = time.monotonic() + 3
+        while not spy.saves and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert spy.saves == [("s1", {"activity_status": "1"})]
+    finally:
+        p.close()
+
+
+def test_persister_writes_by_max_delay_under_continuous_edits():
+    spy = SpyStore()
+    p = WriteBehindPersister(spy, debounce=0.2, max_delay=0.4)
+    try:
+        start = time.monotonic()
+        # 디바운스보다 짧은 간격으로 계속 편집해도 max_delay 안에 한 번은 쓴다
+        while not spy.saves and time.monotonic() - start < 3:
+            p.submit("s1", "activity_status", str(time.monotonic()))
+            time.sleep(0.05)
+        assert spy.saves
+        assert time.monotonic() - start < 1.5
+    finally:
+        p.close()
+
+
+def test_persister_keeps_pending_after_write_failure():
+    spy = SpyStore(fail_times=1)
+    p = WriteBehindPersister(spy, debounce=10, max_delay=10)
+    try:
+        p.submit("s1", "activity_status", "1")
+        assert p.flush()
+        assert spy.saves == []  # 첫 쓰기는 실패: 버리지 않고 남겨 둔다
+        assert p.flush()
+        assert spy.saves == [("s1", {"activity_status": "1"})]
+    finally:
+        p.close()
+
+
+def test_persister_close_flushes_pending(store):
+    p = WriteBehindPersister(store, debounce=10, max_delay=10)
+    p.submit("s1", "activity_status", json.dumps({"a1": {"done": True, "memo": ""}}))
+    p.close()
+    assert store.load("s1")["activity_status"] == {"a1": {"done": True, "memo": ""}}